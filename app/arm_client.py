@@ -0,0 +1,397 @@
+"""Pooled, keep-alive HTTP client for Azure Resource Manager and Resource Graph."""
+import http.client
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+
+
+DEFAULT_ENDPOINT = "https://management.azure.com"
+TRANSIENT_STATUSES = (408, 429, 500, 502, 503, 504)
+
+# Fetch a new token when a cached one has less than this many seconds left
+TOKEN_MIN_LIFETIME = 300
+
+
+class ArmError(Exception):
+    def __init__(self, status, message, code=''):
+        super().__init__(f"{status} {code}: {message}" if code else f"{status}: {message}")
+        self.status = status
+        self.code = code
+
+
+def get_arm_token(resource=DEFAULT_ENDPOINT + "/", refresh=False):
+    """Return an ARM access token for the signed-in Azure CLI account
+
+    ARI_ARM_TOKEN overrides the CLI, e.g. when talking to a mock server.
+    Inside a job the token is cached in the job's private work directory
+    (ARI_JOB_DIR) until shortly before it expires, so every step of the job
+    shares one ``az account get-access-token`` call.
+    """
+    token = os.environ.get("ARI_ARM_TOKEN")
+    if token:
+        return token
+    cache_file = os.path.join(os.environ["ARI_JOB_DIR"], "arm_token.json") if os.environ.get("ARI_JOB_DIR") else None
+    if cache_file and not refresh:
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached['resource'] == resource and cached['expires_on'] - time.time() > TOKEN_MIN_LIFETIME:
+                return cached['accessToken']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    result = subprocess.run(
+        ["az", "account", "get-access-token", "--resource", resource, "--output", "json"],
+        capture_output=True,
+        text=True,
+        timeout=60
+    )
+    if result.returncode != 0:
+        raise ArmError(401, f"could not get an access token from the Azure CLI: {result.stderr.strip()}")
+    issued = json.loads(result.stdout)
+    if cache_file:
+        try:
+            expires_on = int(issued.get('expires_on') or 0) or time.time() + TOKEN_MIN_LIFETIME * 2
+            fd = os.open(cache_file + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'resource': resource, 'accessToken': issued['accessToken'], 'expires_on': expires_on}, f)
+            os.replace(cache_file + ".tmp", cache_file)
+        except (OSError, ValueError):
+            pass
+    return issued['accessToken']
+
+
+def parse_quota_reset(value):
+    """Parse x-ms-user-quota-resets-after (hh:mm:ss) into seconds"""
+    try:
+        hours, minutes, seconds = value.split(':')
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+class RateGovernor:
+    """Pace concurrent requests to stay just under the server's quota
+
+    Resource Graph reports the requests left in the current quota window
+    (x-ms-user-quota-remaining) and when the window resets
+    (x-ms-user-quota-resets-after). The governor spreads the remaining
+    budget, minus ``reserve`` requests, evenly over the rest of the window
+    instead of bursting into throttling, and a 429 Retry-After pauses every
+    caller sharing the governor. ``metrics`` reports the achieved request
+    rate.
+    """
+
+    def __init__(self, reserve=1, rate_window_seconds=60, clock=time.monotonic):
+        self.reserve = reserve
+        self.rate_window_seconds = rate_window_seconds
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.remaining = None
+        self.resets_at = None
+        self.blocked_until = 0
+        self.last_grant = 0
+        self.started = clock()
+        self.grants = deque()
+        self.total_requests = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+
+    def next_slot(self, now):
+        """Return when the next request may be sent, given the quota state"""
+        if now < self.blocked_until:
+            return self.blocked_until
+        if self.remaining is None or self.resets_at is None or now >= self.resets_at:
+            return now
+        budget = self.remaining - self.reserve
+        if budget <= 0:
+            return self.resets_at
+        return max(now, self.last_grant + (self.resets_at - now) / budget)
+
+    def acquire(self):
+        """Block until a request may be sent and account for it"""
+        with self.condition:
+            while True:
+                now = self.clock()
+                slot = self.next_slot(now)
+                if slot <= now:
+                    break
+                self.waited_seconds += slot - now
+                self.condition.wait(timeout=slot - now)
+            if self.remaining is not None and self.resets_at is not None and now < self.resets_at:
+                self.remaining -= 1
+            elif self.resets_at is not None and now >= self.resets_at:
+                self.remaining = self.resets_at = None
+            self.last_grant = now
+            self.total_requests += 1
+            self.grants.append(now)
+            while self.grants and self.grants[0] < now - self.rate_window_seconds:
+                self.grants.popleft()
+
+    def update(self, status, headers):
+        """Learn the quota state from a response"""
+        headers = headers or {}
+        with self.condition:
+            now = self.clock()
+            remaining = headers.get('x-ms-user-quota-remaining', '')
+            reset_seconds = parse_quota_reset(headers.get('x-ms-user-quota-resets-after'))
+            if remaining.isdigit() and reset_seconds is not None:
+                resets_at = now + reset_seconds
+                if self.resets_at is not None and abs(resets_at - self.resets_at) < 1 and self.remaining is not None:
+                    # Same window: responses of earlier concurrent requests lag behind
+                    self.remaining = min(self.remaining, int(remaining))
+                else:
+                    self.remaining = int(remaining)
+                self.resets_at = resets_at
+            if status == 429:
+                self.throttled += 1
+                retry_after = headers.get('retry-after', '')
+                if retry_after.isdigit():
+                    self.block(float(retry_after), now)
+            self.condition.notify_all()
+
+    def block(self, seconds, now=None):
+        """Pause every caller for ``seconds``"""
+        with self.condition:
+            now = self.clock() if now is None else now
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.condition.notify_all()
+
+    def metrics(self):
+        with self.condition:
+            now = self.clock()
+            elapsed = max(now - self.started, 1e-6)
+            window = min(self.rate_window_seconds, elapsed)
+            return {
+                'requests': self.total_requests,
+                'throttled': self.throttled,
+                'waited_seconds': round(self.waited_seconds, 2),
+                'achieved_rate_per_second': round(self.total_requests / elapsed, 3),
+                'recent_rate_per_second': round(sum(1 for t in self.grants if t >= now - window) / window, 3),
+                'quota_remaining': self.remaining
+            }
+
+
+class ArmClient:
+    """Thread-safe ARM client with a bounded pool of keep-alive connections
+
+    The access token is fetched once per client (one client per job) and
+    refreshed once if the server rejects it as expired, and up to ``pool_size`` connections to the endpoint are reused across
+    requests and threads. Throttled and transient failures are retried with
+    exponential backoff that honours Retry-After; with a ``governor`` every
+    request is paced against the server's quota and a backoff pauses all
+    threads sharing the client. ``endpoint`` (or ARI_ARM_ENDPOINT) points
+    the client at a mock server.
+    """
+
+    def __init__(self, endpoint=None, token=None, pool_size=8, timeout=60, max_retries=5,
+                 retry_delay=1.0, max_retry_delay=30.0, governor=None):
+        endpoint = endpoint or os.environ.get("ARI_ARM_ENDPOINT") or DEFAULT_ENDPOINT
+        parts = urlsplit(endpoint)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.governor = governor
+        self.pool = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(pool_size)
+        self.token_value = token
+        self.refreshable = token is None and not os.environ.get("ARI_ARM_TOKEN")
+        self.token_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.request_count = 0
+        self.retry_count = 0
+
+    @property
+    def token(self):
+        with self.token_lock:
+            if self.token_value is None:
+                self.token_value = get_arm_token()
+            return self.token_value
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            return self.pool.get_nowait()
+        except queue.Empty:
+            conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            return conn_class(self.host, timeout=self.timeout)
+
+    def release(self, conn, reuse=True):
+        if reuse:
+            self.pool.put(conn)
+        else:
+            conn.close()
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def send(self, method, url, body, headers):
+        """Send one request over a pooled connection; return (status, headers, body)"""
+        conn = self.acquire()
+        try:
+            conn.request(method, url, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.release(conn, reuse=False)
+            raise
+        self.release(conn, reuse=not response.will_close)
+        with self.stats_lock:
+            self.request_count += 1
+        return response.status, {k.lower(): v for k, v in response.getheaders()}, data
+
+    def retry_wait(self, attempt, status, headers):
+        """Seconds to wait before retrying a transient failure"""
+        retry_after = (headers or {}).get('retry-after', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), self.max_retry_delay)
+        return min(self.retry_delay * (2 ** attempt), self.max_retry_delay)
+
+    def request(self, method, path, body=None, query=None):
+        """Send a JSON request to the endpoint and return (headers, parsed body)
+
+        ``path`` is relative to the endpoint (e.g. "/subscriptions") or an
+        absolute nextLink URL from a previous response.
+        """
+        if path.startswith('http'):
+            parts = urlsplit(path)
+            url = parts.path + ('?' + parts.query if parts.query else '')
+        else:
+            url = self.base_path + path
+            if query:
+                url += '?' + urlencode(query)
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        refreshed = False
+        attempt = 0
+        while True:
+            token = self.token
+            headers = {'Authorization': f"Bearer {token}", 'Accept': 'application/json'}
+            if payload is not None:
+                headers['Content-Type'] = 'application/json'
+            status, response_headers = None, None
+            if self.governor:
+                self.governor.acquire()
+            try:
+                status, response_headers, data = self.send(method, url, payload, headers)
+                if self.governor:
+                    self.governor.update(status, response_headers)
+                if status < 300:
+                    return response_headers, json.loads(data) if data else None
+                if status == 401 and self.refreshable and not refreshed:
+                    # The job outlived its token: fetch a new one and retry at once
+                    refreshed = True
+                    with self.token_lock:
+                        if self.token_value == token:  # Not already renewed by another thread
+                            self.token_value = get_arm_token(refresh=True)
+                    continue
+                if status not in TRANSIENT_STATUSES:
+                    raise self.error(status, data)
+                error = self.error(status, data)
+            except (OSError, http.client.HTTPException) as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            with self.stats_lock:
+                self.retry_count += 1
+            wait = self.retry_wait(attempt, status, response_headers)
+            if self.governor:
+                # Back off every request sharing the quota, not just this one
+                self.governor.block(wait)
+            else:
+                time.sleep(wait)
+            attempt += 1
+
+    @staticmethod
+    def error(status, data):
+        try:
+            details = json.loads(data).get('error', {})
+            return ArmError(status, details.get('message', ''), details.get('code', ''))
+        except (ValueError, AttributeError):
+            return ArmError(status, data[:300].decode('utf-8', errors='replace'))
+
+    def get(self, path, query=None):
+        return self.request('GET', path, query=query)[1]
+
+    def post(self, path, body, query=None):
+        return self.request('POST', path, body=body, query=query)[1]
+
+
+def iter_pages(client, path, query=None):
+    """Yield the items of a paged ARM list, following nextLink"""
+    page = client.get(path, query)
+    while True:
+        yield from page.get('value', [])
+        next_link = page.get('nextLink')
+        if not next_link:
+            return
+        page = client.get(next_link)
+
+
+def list_subscriptions(client, api_version="2022-12-01"):
+    """Return the enabled subscriptions visible to the signed-in account"""
+    return [s for s in iter_pages(client, "/subscriptions", {"api-version": api_version})
+            if s.get('state', 'Enabled') == 'Enabled']
+
+
+def get_account(client, subscription_id, api_version="2022-12-01"):
+    """Return a subscription in the shape of ``az account show``"""
+    subscription = client.get(f"/subscriptions/{subscription_id}", {"api-version": api_version})
+    return {
+        'id': subscription.get('subscriptionId', subscription_id),
+        'name': subscription.get('displayName', ''),
+        'state': subscription.get('state', ''),
+        'tenantId': subscription.get('tenantId', '')
+    }
+
+
+def iter_resource_groups(client, subscription_id, api_version="2021-04-01"):
+    """Yield the resource groups of a subscription as ``az group list`` does"""
+    return iter_pages(client, f"/subscriptions/{subscription_id}/resourcegroups", {"api-version": api_version})
+
+
+def iter_resources(client, subscription_id, expand=None, api_version="2021-04-01"):
+    """Yield the resources of a subscription as ``az resource list`` does
+
+    ``expand`` (e.g. "createdTime,changedTime") adds those fields to every
+    record; it is off by default because ``az resource list`` does not ask
+    for them and resources-detailed.json keeps that shape.
+    """
+    query = {"api-version": api_version}
+    if expand:
+        query["$expand"] = expand
+    for resource in iter_pages(client, f"/subscriptions/{subscription_id}/resources", query):
+        # az derives resourceGroup from the id; the REST API does not return it
+        parts = resource.get('id', '').split('/')
+        if len(parts) > 4 and parts[3].lower() == 'resourcegroups':
+            resource.setdefault('resourceGroup', parts[4])
+        yield resource
+
+
+def default_subscription_id():
+    """Return the subscription selected with ``az account set`` (or at login)
+
+    Reads the Azure CLI profile directly instead of running ``az account show``.
+    """
+    config_dir = os.environ.get("AZURE_CONFIG_DIR") or os.path.join(os.path.expanduser("~"), ".azure")
+    try:
+        with open(os.path.join(config_dir, "azureProfile.json"), encoding="utf-8-sig") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for subscription in profile.get('subscriptions', []):
+        if subscription.get('isDefault'):
+            return subscription.get('id')
+    return None
@@ -0,0 +1,171 @@
+"""Content-addressed, reference-counted store for run artifacts."""
+import json
+import os
+import threading
+
+from .run_manifest import matches_manifest, read_manifest
+
+
+class ArtifactStore:
+    """Deduplicated blob directory shared by all runs
+
+    Blobs are named after the SHA-256 of their content
+    (``<root>/<aa>/<sha256>``). A run's manifest.json is its list of
+    references: artifacts moved into the store are marked
+    ``"stored": "blob"`` there, and ``refcounts.json`` counts how many
+    manifest entries point at each blob so a blob can be deleted once the
+    last run referencing it is removed.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.refcounts_path = os.path.join(root, 'refcounts.json')
+        self.lock = threading.Lock()
+        self.refcounts = None
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def load_refcounts(self):
+        if self.refcounts is None:
+            try:
+                with open(self.refcounts_path) as f:
+                    self.refcounts = json.load(f)
+            except (OSError, ValueError):
+                self.refcounts = {}
+        return self.refcounts
+
+    def save_refcounts(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.refcounts_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.refcounts, f)
+        os.replace(tmp_path, self.refcounts_path)
+
+    def mark_manifest(self, manifest):
+        """Flag every hashed artifact of a manifest as held in the store"""
+        for artifact in manifest['artifacts']:
+            if artifact.get('sha256'):
+                artifact['stored'] = 'blob'
+        return manifest
+
+    def ingest_run(self, output_dir, manifest):
+        """Move the files of a marked manifest into the store
+
+        A file whose content is already stored (same size and SHA-256) is
+        simply deleted; a damaged or partial blob is replaced. The
+        manifest must be written before this runs: until a file is moved,
+        downloads still find it in the run folder. A file that disappeared
+        in the meantime and has no blob is flagged ``"stored": "missing"``
+        and not referenced; the caller should rewrite the manifest. Returns
+        the number of bytes that did not have to be kept because the blob
+        already existed.
+        """
+        saved_bytes = 0
+        with self.lock:
+            refcounts = self.load_refcounts()
+            for artifact in manifest['artifacts']:
+                if artifact.get('stored') != 'blob':
+                    continue
+                digest = artifact['sha256']
+                run_path = os.path.join(output_dir, artifact['path'])
+                blob = self.blob_path(digest)
+                if matches_manifest(blob, artifact):
+                    try:
+                        os.remove(run_path)
+                        saved_bytes += artifact['size']
+                    except FileNotFoundError:
+                        pass
+                elif not os.path.exists(run_path):
+                    artifact['stored'] = 'missing'
+                    continue
+                else:
+                    os.makedirs(os.path.dirname(blob), exist_ok=True)
+                    os.replace(run_path, blob)
+                refcounts[digest] = refcounts.get(digest, 0) + 1
+            self.save_refcounts()
+        self.remove_empty_dirs(os.path.join(output_dir, manifest['run_id']))
+        return saved_bytes
+
+    def release(self, manifest):
+        """Drop a run's references; delete blobs nobody references any more
+
+        Returns the number of bytes freed.
+        """
+        freed_bytes = 0
+        with self.lock:
+            refcounts = self.load_refcounts()
+            for artifact in manifest['artifacts']:
+                if artifact.get('stored') != 'blob':
+                    continue
+                digest = artifact['sha256']
+                count = refcounts.get(digest, 0) - 1
+                if count > 0:
+                    refcounts[digest] = count
+                    continue
+                refcounts.pop(digest, None)
+                try:
+                    os.remove(self.blob_path(digest))
+                    freed_bytes += artifact['size']
+                except FileNotFoundError:
+                    pass
+            self.save_refcounts()
+        return freed_bytes
+
+    def sweep(self, output_dir):
+        """Rebuild the refcounts from the manifests that exist; delete orphan blobs
+
+        Runs removed without ``release`` (share cleanup, manual deletes) leave
+        their blobs referenced forever; this reconciles the store with what
+        is actually on disk. Returns (blobs deleted, bytes freed).
+        """
+        with self.lock:
+            refcounts = {}
+            try:
+                run_ids = [entry.name for entry in os.scandir(output_dir) if entry.is_dir()]
+            except FileNotFoundError:
+                run_ids = []
+            for run_id in run_ids:
+                manifest = read_manifest(output_dir, run_id)
+                for artifact in (manifest or {}).get('artifacts', []):
+                    if artifact.get('stored') == 'blob':
+                        refcounts[artifact['sha256']] = refcounts.get(artifact['sha256'], 0) + 1
+            deleted = freed_bytes = 0
+            for dirpath, _, filenames in os.walk(self.root):
+                if dirpath == self.root:
+                    continue
+                for fname in filenames:
+                    if fname in refcounts:
+                        continue
+                    path = os.path.join(dirpath, fname)
+                    try:
+                        size = os.path.getsize(path)
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    deleted += 1
+                    freed_bytes += size
+            self.refcounts = refcounts
+            self.save_refcounts()
+        return deleted, freed_bytes
+
+    def remove_empty_dirs(self, top):
+        for dirpath, _, _ in sorted(os.walk(top), key=lambda entry: len(entry[0]), reverse=True):
+            if dirpath != top:
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+
+
+def get_artifact_store(output_dir):
+    """Return the store selected by ARI_ARTIFACT_STORE ('cas'), or None
+
+    The default ('folders') keeps full copies in every run folder.
+    """
+    mode = os.environ.get("ARI_ARTIFACT_STORE", "folders").strip().lower()
+    if mode != 'cas':
+        return None
+    root = os.environ.get("ARI_ARTIFACT_DIR") or os.path.join(output_dir, '.artifacts')
+    print(f"Using content-addressed artifact store at: {root}")
+    return ArtifactStore(root)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Single-fetch Azure CLI resource inventory.
+
+Fetches the account, the resource groups and the resources once each (the
+three calls run concurrently over one pooled ARM client, with one access
+token per job) and renders every output of the CLI inventory locally from
+that one result:
+
+    azure-resource-inventory.txt    account, resource group and resource tables
+    resources-detailed.json         resources, as ``az resource list`` returns them
+    resource-groups.json            resource groups, as ``az group list`` returns them
+    resources.csv                   Name, Type, ResourceGroup, Location (tab-separated)
+    resources-with-headers.csv      the same with a header row
+
+    python3 /app/app/cli_inventory.py --out DIR [--subscription ID]
+    python3 /app/app/cli_inventory.py --out DIR --all-subscriptions [--workers 4]
+    python3 /app/app/cli_inventory.py --check [--subscription ID]
+
+--all-subscriptions enumerates the enabled subscriptions once, inventories
+them concurrently on a bounded worker pool into ``subscriptions/<id>/``
+shards with the files above, and merges the shards into the same files at
+the top of DIR. The merged CSVs gain a SubscriptionId column.
+
+--check is the pre-flight account check: it prints the selected
+subscription like ``az account show`` and fails when the signed-in account
+cannot read it. With --shell it prints CURRENT_SUBSCRIPTION,
+CURRENT_SUBSCRIPTION_NAME and CURRENT_TENANT assignments for ``eval``
+instead, so scripts need no JSON parser. --endpoint (or ARI_ARM_ENDPOINT) and ARI_ARM_TOKEN point the
+client at a local fake ARM server.
+"""
+import argparse
+import csv
+import json
+import http.client
+import os
+import shlex
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    from .arm_client import (ArmClient, ArmError, default_subscription_id, get_account,
+                             iter_resource_groups, iter_resources, list_subscriptions)
+    from .json_stream import iter_json
+except ImportError:  # Run as a standalone script
+    from arm_client import (ArmClient, ArmError, default_subscription_id, get_account,
+                            iter_resource_groups, iter_resources, list_subscriptions)
+    from json_stream import iter_json
+
+
+RESOURCES_FILE = 'resources-detailed.json'
+GROUPS_FILE = 'resource-groups.json'
+TEXT_FILE = 'azure-resource-inventory.txt'
+CSV_FILE = 'resources.csv'
+HEADERED_CSV_FILE = 'resources-with-headers.csv'
+SHARDS_DIR = 'subscriptions'
+
+# (header, dotted path) as shown by the az CLI table output
+GROUP_TABLE = [('Name', 'name'), ('Location', 'location'), ('Status', 'properties.provisioningState')]
+RESOURCE_TABLE = [('Name', 'name'), ('ResourceGroup', 'resourceGroup'), ('Location', 'location'), ('Type', 'type')]
+CSV_COLUMNS = [('Name', 'name'), ('Type', 'type'), ('ResourceGroup', 'resourceGroup'), ('Location', 'location')]
+
+# Failures of one fetch; anything else is a bug and should surface
+FETCH_ERRORS = (ArmError, OSError, ValueError, http.client.HTTPException)
+
+
+def write_json_array(items, path):
+    """Write an iterable as a JSON array, one element at a time"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as out:
+        out.write('[')
+        first = True
+        for item in items:
+            out.write(('\n  ' if first else ',\n  ') + json.dumps(item))
+            first = False
+        out.write('\n]\n')
+    os.replace(path + '.tmp', path)
+
+
+def fetch_inventory(client, output_dir, subscription_id):
+    """Fetch the account, groups and resources once each; return the account"""
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        account = pool.submit(get_account, client, subscription_id)
+        groups = pool.submit(write_json_array, iter_resource_groups(client, subscription_id),
+                             os.path.join(output_dir, GROUPS_FILE))
+        resources = pool.submit(write_json_array, iter_resources(client, subscription_id),
+                                os.path.join(output_dir, RESOURCES_FILE))
+        groups.result()
+        resources.result()
+        return account.result()
+
+
+def field(item, path):
+    for key in path.split('.'):
+        if not isinstance(item, dict):
+            return ''
+        item = item.get(key)
+    return '' if item is None else str(item)
+
+
+def format_table(rows, columns):
+    """Render rows of strings like the az CLI table output"""
+    widths = [max([len(header)] + [len(row[i]) for row in rows]) for i, (header, _) in enumerate(columns)]
+    lines = ['  '.join(header.ljust(width) for (header, _), width in zip(columns, widths)).rstrip(),
+             '  '.join('-' * width for width in widths)]
+    lines.extend('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip() for row in rows)
+    return '\n'.join(lines) + '\n'
+
+
+def render_inventory(output_dir, account):
+    """Render the text report and CSVs from the fetched JSON files
+
+    Resources are streamed from resources-detailed.json; only the few table
+    and CSV fields of each resource are kept in memory. Returns the number
+    of (groups, resources).
+    """
+    groups = [[field(group, path) for _, path in GROUP_TABLE]
+              for group in iter_json(os.path.join(output_dir, GROUPS_FILE))]
+    table_rows = []
+    with open(os.path.join(output_dir, CSV_FILE), 'w', newline='', encoding='utf-8') as plain, \
+            open(os.path.join(output_dir, HEADERED_CSV_FILE), 'w', newline='', encoding='utf-8') as headered:
+        plain_writer = csv.writer(plain, delimiter='\t', lineterminator='\n')
+        headered_writer = csv.writer(headered, delimiter='\t', lineterminator='\n')
+        headered_writer.writerow([header for header, _ in CSV_COLUMNS])
+        for resource in iter_json(os.path.join(output_dir, RESOURCES_FILE)):
+            row = [field(resource, path) for _, path in CSV_COLUMNS]
+            plain_writer.writerow(row)
+            headered_writer.writerow(row)
+            table_rows.append([field(resource, path) for _, path in RESOURCE_TABLE])
+
+    with open(os.path.join(output_dir, TEXT_FILE), 'w', encoding='utf-8') as f:
+        f.write('Account Information:\n')
+        f.write(json.dumps(account, indent=2) + '\n\n')
+        f.write('Resource Groups:\n')
+        f.write(format_table(groups, GROUP_TABLE) + '\n')
+        f.write('All Resources:\n')
+        f.write(format_table(table_rows, RESOURCE_TABLE) + '\n')
+    return len(groups), len(table_rows)
+
+
+def inventory_subscription(client, output_dir, subscription_id):
+    """Fetch and render one subscription; return (account, groups, resources)"""
+    os.makedirs(output_dir, exist_ok=True)
+    account = fetch_inventory(client, output_dir, subscription_id)
+    return (account,) + render_inventory(output_dir, account)
+
+
+def inventory_all_subscriptions(client, output_dir, workers=4):
+    """Inventory every enabled subscription concurrently, then merge the shards
+
+    Returns (shards, failures): shards is a list of (subscription,
+    groups, resources) in enumeration order, failures maps a subscription
+    id to its error.
+    """
+    subscriptions = [{'id': s['subscriptionId'], 'name': s.get('displayName', '')} for s in list_subscriptions(client)]
+    print(f"Inventorying {len(subscriptions)} subscription(s) with {workers} worker(s)...", flush=True)
+    results, failures = {}, {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(inventory_subscription, client, os.path.join(output_dir, SHARDS_DIR, sub['id']), sub['id']): sub
+            for sub in subscriptions
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            sub = futures[future]
+            try:
+                _, group_count, resource_count = future.result()
+            except FETCH_ERRORS as e:
+                failures[sub['id']] = str(e)
+                shutil.rmtree(os.path.join(output_dir, SHARDS_DIR, sub['id']), ignore_errors=True)
+                print(f"  [{done}/{len(subscriptions)}] {sub.get('name', '')} ({sub['id']}): FAILED - {e}", flush=True)
+                continue
+            results[sub['id']] = (group_count, resource_count)
+            print(f"  [{done}/{len(subscriptions)}] {sub.get('name', '')} ({sub['id']}): "
+                  f"{group_count} group(s), {resource_count} resource(s)", flush=True)
+    shards = [(sub,) + results[sub['id']] for sub in subscriptions if sub['id'] in results]
+    merge_shards(output_dir, shards, failures)
+    return shards, failures
+
+
+def merge_shards(output_dir, shards, failures):
+    """Write the tenant-wide JSON, CSVs and summary report from the shards"""
+    shard_dirs = [os.path.join(output_dir, SHARDS_DIR, sub['id']) for sub, _, _ in shards]
+    for name in (GROUPS_FILE, RESOURCES_FILE):
+        write_json_array((item for d in shard_dirs for item in iter_json(os.path.join(d, name))),
+                         os.path.join(output_dir, name))
+
+    with open(os.path.join(output_dir, CSV_FILE), 'w', newline='', encoding='utf-8') as plain, \
+            open(os.path.join(output_dir, HEADERED_CSV_FILE), 'w', newline='', encoding='utf-8') as headered:
+        plain_writer = csv.writer(plain, delimiter='\t', lineterminator='\n')
+        headered_writer = csv.writer(headered, delimiter='\t', lineterminator='\n')
+        headered_writer.writerow([header for header, _ in CSV_COLUMNS] + ['SubscriptionId'])
+        for (sub, _, _), shard_dir in zip(shards, shard_dirs):
+            with open(os.path.join(shard_dir, CSV_FILE), newline='', encoding='utf-8') as f:
+                for row in csv.reader(f, delimiter='\t'):
+                    plain_writer.writerow(row + [sub['id']])
+                    headered_writer.writerow(row + [sub['id']])
+
+    columns = [('Subscription', ''), ('SubscriptionId', ''), ('ResourceGroups', ''), ('Resources', '')]
+    rows = [[sub.get('name', ''), sub['id'], str(groups), str(resources)] for sub, groups, resources in shards]
+    with open(os.path.join(output_dir, TEXT_FILE), 'w', encoding='utf-8') as f:
+        f.write(f"All Subscriptions: {len(shards)} inventoried, {len(failures)} failed\n\n")
+        f.write(format_table(rows, columns) + '\n')
+        if failures:
+            f.write('Failed Subscriptions:\n')
+            for subscription_id, error in sorted(failures.items()):
+                f.write(f"{subscription_id}: {error}\n")
+            f.write('\n')
+        f.write(f"Per-subscription reports are in {SHARDS_DIR}/<subscription id>/\n")
+
+
+def shell_assignments(account):
+    """``az account show`` fields as quoted shell variable assignments"""
+    return '\n'.join(f"{name}={shlex.quote(account.get(key, ''))}" for name, key in (
+        ('CURRENT_SUBSCRIPTION', 'id'), ('CURRENT_SUBSCRIPTION_NAME', 'name'), ('CURRENT_TENANT', 'tenantId')))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inventory Azure resources with one fetch per resource list")
+    parser.add_argument('--out', default=None, help="Output directory")
+    parser.add_argument('--subscription', default=None, help="Subscription id (default: the current az account)")
+    parser.add_argument('--all-subscriptions', action='store_true',
+                        help="Inventory every enabled subscription concurrently and merge the results")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ARI_CLI_INVENTORY_WORKERS', '4')),
+                        help="Subscriptions inventoried at once with --all-subscriptions")
+    parser.add_argument('--check', action='store_true', help="Only verify the signed-in account can read the subscription")
+    parser.add_argument('--shell', action='store_true', help="With --check, print shell variable assignments")
+    parser.add_argument('--endpoint', default=None, help="ARM endpoint override, e.g. a fake server")
+    args = parser.parse_args(argv)
+    if not args.check and not args.out:
+        parser.error("--out is required")
+
+    workers = max(1, args.workers)
+    client = ArmClient(endpoint=args.endpoint, pool_size=3 * workers if args.all_subscriptions else 3)
+    started = time.time()
+    try:
+        if args.all_subscriptions:
+            os.makedirs(args.out, exist_ok=True)
+            shards, failures = inventory_all_subscriptions(client, args.out, workers)
+            print(f"Inventoried {len(shards)} subscription(s) with {sum(r for _, _, r in shards)} resource(s) "
+                  f"in {time.time() - started:.1f}s ({len(failures)} failed)", flush=True)
+            return 0 if shards or not failures else 1
+
+        subscription_id = args.subscription or default_subscription_id()
+        if not subscription_id:
+            subscriptions = list_subscriptions(client)
+            if not subscriptions:
+                print("ERROR: The signed-in account has no enabled subscriptions", flush=True)
+                return 1
+            subscription_id = subscriptions[0]['subscriptionId']
+        if args.check:
+            account = get_account(client, subscription_id)
+            if args.shell:
+                print(shell_assignments(account), flush=True)
+            else:
+                print(json.dumps(account, indent=2), flush=True)
+            return 0
+
+        os.makedirs(args.out, exist_ok=True)
+        print('Fetching resource groups and resources...', flush=True)
+        account = fetch_inventory(client, args.out, subscription_id)
+        fetched = time.time()
+        group_count, resource_count = render_inventory(args.out, account)
+    except FETCH_ERRORS as e:
+        print(f"ERROR: {'Account check' if args.check else 'CLI resource inventory'} failed: {e}", flush=True)
+        return 1
+    finally:
+        client.close()
+    print(f"Fetched {group_count} resource group(s) and {resource_count} resource(s) in "
+          f"{fetched - started:.1f}s, rendered reports in {time.time() - fetched:.1f}s", flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Parallel Azure File Share cleanup over the Azure Files REST API.
+
+Replaces powershell/clear-azure-fileshare.ps1 in the pre-run cleanup step.
+The share is listed level by level and everything that is not protected is
+deleted on a bounded pool of worker threads: files first, then directories
+deepest first. Throttled and transient failures are retried with
+exponential backoff (honouring Retry-After).
+
+Runs as a standalone script (stdlib only) so it does not start the web app:
+
+    python3 /app/app/fileshare_cleanup.py [--keep PATH] [--keep-newer-than EPOCH] [--endpoint URL]
+
+Account, key and share come from AZURE_STORAGE_ACCOUNT, AZURE_STORAGE_KEY
+and AZURE_FILE_SHARE. --endpoint (or AZURE_FILE_ENDPOINT) points the engine
+at a local stand-in such as http://127.0.0.1:10004/devstoreaccount1.
+
+Other jobs may be writing to the share while it is cleaned: anything last
+written at or after --keep-newer-than (ARI_CLEANUP_KEEP_NEWER_THAN, the
+start of the oldest running job) is preserved, as is the content-addressed
+artifact store (.artifacts or the basename of ARI_ARTIFACT_DIR). Run
+folders are deleted together with their manifest.json without releasing
+their blobs; the web runner sweeps the store after the job
+(ArtifactStore.sweep), which frees blobs no surviving manifest references.
+"""
+import argparse
+import base64
+import fnmatch
+import hashlib
+import hmac
+import http.client
+import os
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import formatdate
+from urllib.parse import quote, urlsplit
+
+
+API_VERSION = "2021-06-08"
+
+# Protected folders and files - never deleted, at any depth
+PROTECTED_FOLDERS = ('.jobs', '.snapshots', '.artifacts', '$logs', 'system volume information')
+PROTECTED_PATTERNS = ('*.lock', '*.tmp', '.gitkeep')
+
+# Directories recreated after cleanup because the app expects them
+DIRECTORIES_TO_RECREATE = ('AzureResourceInventory',)
+
+TRANSIENT_STATUSES = (408, 429, 500, 502, 503, 504)
+
+
+def log(message, level='INFO'):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{timestamp}] [{level}] {message}", flush=True)
+
+
+def protected_folders():
+    """PROTECTED_FOLDERS plus the configured artifact store directory"""
+    folders = set(PROTECTED_FOLDERS)
+    artifact_dir = os.environ.get('ARI_ARTIFACT_DIR', '').rstrip('/\\')
+    if artifact_dir:
+        folders.add(os.path.basename(artifact_dir).lower())
+    return folders
+
+
+def is_protected(name, is_directory):
+    normalized = name.lower()
+    if is_directory:
+        return normalized in protected_folders()
+    return any(fnmatch.fnmatchcase(normalized, pattern) for pattern in PROTECTED_PATTERNS)
+
+
+def parse_file_time(value):
+    """Parse an Azure Files timestamp (2024-01-02T03:04:05.1234567Z) into epoch seconds"""
+    try:
+        return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class StorageError(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(f"{status} {code}: {message}")
+        self.status = status
+        self.code = code
+
+
+class FileShareClient:
+    """Minimal Azure Files REST client authenticated with a Shared Key
+
+    Each worker thread keeps its own keep-alive connection to the endpoint.
+    """
+
+    def __init__(self, account, key, share, endpoint=None, max_retries=5, retry_delay=1.0, max_retry_delay=16.0):
+        self.account = account
+        self.key = base64.b64decode(key)
+        self.share = share
+        endpoint = endpoint or f"https://{account}.file.core.windows.net"
+        parts = urlsplit(endpoint)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.base_path = parts.path.rstrip('/')
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.transient_errors = 0
+
+    def connection(self, reset=False):
+        conn = getattr(self.local, 'conn', None)
+        if reset and conn is not None:
+            conn.close()
+            conn = None
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self.local.conn = conn_class(self.host, timeout=60)
+        return conn
+
+    def sign(self, method, path, query, headers):
+        canonical_headers = ''.join(
+            f"{name}:{headers[name]}\n" for name in sorted(headers) if name.startswith('x-ms-')
+        )
+        canonical_resource = f"/{self.account}{path}" + ''.join(
+            f"\n{name}:{query[name]}" for name in sorted(query)
+        )
+        content_length = headers.get('content-length', '')
+        string_to_sign = '\n'.join([
+            method, '', '', '' if content_length == '0' else content_length, '', headers.get('content-type', ''),
+            '', '', '', '', '', headers.get('range', ''),
+        ]) + '\n' + canonical_headers + canonical_resource
+        digest = hmac.new(self.key, string_to_sign.encode('utf-8'), hashlib.sha256).digest()
+        return f"SharedKey {self.account}:{base64.b64encode(digest).decode()}"
+
+    def request(self, method, path='', query=None, extra_headers=None):
+        """Send a request for a path inside the share; return (status, body)
+
+        Transient failures (throttling, 5xx, dropped connections) are
+        retried; any other non-2xx answer raises StorageError.
+        """
+        query = query or {}
+        full_path = f"{self.base_path}/{quote(self.share)}"
+        if path:
+            full_path += '/' + quote(path)
+        url = full_path
+        if query:
+            url += '?' + '&'.join(f"{name}={quote(str(value), safe='')}" for name, value in query.items())
+        delay = self.retry_delay
+        for attempt in range(self.max_retries + 1):
+            headers = {
+                'x-ms-date': formatdate(usegmt=True),
+                'x-ms-version': API_VERSION,
+                'content-length': '0'
+            }
+            headers.update(extra_headers or {})
+            headers['authorization'] = self.sign(method, full_path, query, headers)
+            retry_after = None
+            try:
+                conn = self.connection()
+                conn.request(method, url, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                status = response.status
+                if status < 300:
+                    return status, body
+                if status not in TRANSIENT_STATUSES:
+                    raise StorageError(status, response.getheader('x-ms-error-code', ''), body[:300].decode(errors='replace'))
+                retry_after = response.getheader('Retry-After')
+                error = StorageError(status, response.getheader('x-ms-error-code', ''), 'throttled or unavailable')
+            except (OSError, http.client.HTTPException) as e:
+                self.connection(reset=True)
+                error = e
+            with self.stats_lock:
+                self.transient_errors += 1
+            if attempt == self.max_retries:
+                raise error
+            wait = float(retry_after) if retry_after and retry_after.isdigit() else delay
+            time.sleep(min(wait, self.max_retry_delay))
+            delay = min(delay * 2, self.max_retry_delay)
+
+    def share_exists(self):
+        try:
+            self.request('GET', query={'restype': 'share'})
+            return True
+        except StorageError as e:
+            if e.status == 404:
+                return False
+            raise
+
+    def list_directory(self, path=''):
+        """Return (files, directories) directly inside a directory
+
+        Both are lists of (name, last write time as epoch seconds or None).
+        """
+        files, directories = [], []
+        marker = None
+        while True:
+            query = {'restype': 'directory', 'comp': 'list', 'include': 'Timestamps'}
+            if marker:
+                query['marker'] = marker
+            _, body = self.request('GET', path, query)
+            root = ET.fromstring(body)
+            for entry in root.iter('File'):
+                files.append((entry.findtext('Name'), parse_file_time(entry.findtext('Properties/LastWriteTime'))))
+            for entry in root.iter('Directory'):
+                directories.append((entry.findtext('Name'), parse_file_time(entry.findtext('Properties/LastWriteTime'))))
+            marker = root.findtext('NextMarker')
+            if not marker:
+                return files, directories
+
+    def delete_file(self, path):
+        """Delete a file; a file that is already gone counts as deleted"""
+        try:
+            self.request('DELETE', path)
+        except StorageError as e:
+            if e.status != 404:
+                raise
+
+    def delete_directory(self, path):
+        try:
+            self.request('DELETE', path, {'restype': 'directory'})
+        except StorageError as e:
+            if e.status != 404:
+                raise
+
+    def create_directory(self, path):
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.0000000Z')
+        try:
+            self.request('PUT', path, {'restype': 'directory'}, {
+                'x-ms-file-attributes': 'Directory',
+                'x-ms-file-creation-time': now,
+                'x-ms-file-last-write-time': now,
+                'x-ms-file-permission': 'inherit'
+            })
+            return True
+        except StorageError as e:
+            if e.status == 409:
+                return False
+            raise
+
+
+class CleanupEngine:
+    """Delete everything in a share except protected and kept paths"""
+
+    def __init__(self, client, keep=(), max_workers=16, recreate=DIRECTORIES_TO_RECREATE, keep_newer_than=None):
+        self.client = client
+        self.keep = {path.strip('/').lower() for path in keep if path.strip('/')}
+        self.keep_newer_than = keep_newer_than
+        self.max_workers = max_workers
+        self.recreate = recreate
+        self.stats = {'files_found': 0, 'directories_found': 0, 'deleted': 0, 'protected': 0, 'failed': 0}
+
+    def is_kept(self, path, last_write=None):
+        if self.keep_newer_than is not None and last_write is not None and last_write >= self.keep_newer_than:
+            return True  # Possibly written by a job that is still running
+        lowered = path.lower()
+        return any(lowered == keep or lowered.startswith(keep + '/') for keep in self.keep)
+
+    def scan(self, pool):
+        """List the share level by level; return deletable files and directories
+
+        Directories are returned with their depth; a directory that holds a
+        protected or kept item is itself retained.
+        """
+        files, directories, retained = [], [], set()
+        level = ['']
+        depth = 0
+        while level:
+            next_level = []
+            for directory, (names, subdirs) in zip(level, pool.map(self.client.list_directory, level)):
+                for name, last_write in names:
+                    path = f"{directory}/{name}" if directory else name
+                    self.stats['files_found'] += 1
+                    if is_protected(name, False) or self.is_kept(path, last_write):
+                        self.stats['protected'] += 1
+                        retained.add(directory)
+                    else:
+                        files.append(path)
+                for name, last_write in subdirs:
+                    path = f"{directory}/{name}" if directory else name
+                    self.stats['directories_found'] += 1
+                    if is_protected(name, True) or self.is_kept(path, last_write):
+                        self.stats['protected'] += 1
+                        log(f"Preserving protected item: {path}")
+                        retained.add(directory)
+                    else:
+                        directories.append((depth + 1, path))
+                        next_level.append(path)
+            level = next_level
+            depth += 1
+        # A retained directory keeps all of its ancestors
+        for path in list(retained):
+            while '/' in path:
+                path = path.rsplit('/', 1)[0]
+                retained.add(path)
+        return files, [(d, path) for d, path in directories if path not in retained]
+
+    def delete_all(self, pool, delete, paths, kind):
+        def attempt(path):
+            try:
+                delete(path)
+                return None
+            except Exception as e:
+                return f"{path}: {e}"
+
+        for error in pool.map(attempt, paths):
+            if error:
+                self.stats['failed'] += 1
+                log(f"Failed to delete {kind} {error}", 'ERROR')
+            else:
+                self.stats['deleted'] += 1
+
+    def run(self):
+        started = time.time()
+        if not self.client.share_exists():
+            log(f"File share '{self.client.share}' does not exist. Nothing to clean.", 'WARNING')
+            return True
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="share-cleanup") as pool:
+            log("Listing contents of file share...")
+            files, directories = self.scan(pool)
+            log(f"Found {self.stats['files_found']} file(s) and {self.stats['directories_found']} directories; "
+                f"deleting {len(files)} file(s) and {len(directories)} directories with {self.max_workers} workers")
+            self.delete_all(pool, self.client.delete_file, files, 'file')
+            # Directories must be empty before they can be deleted: deepest level first
+            for depth in sorted({d for d, _ in directories}, reverse=True):
+                self.delete_all(pool, self.client.delete_directory,
+                                [path for d, path in directories if d == depth], 'directory')
+        for directory in self.recreate:
+            try:
+                if self.client.create_directory(directory):
+                    log(f"Recreated directory: {directory}", 'SUCCESS')
+            except Exception as e:
+                self.stats['failed'] += 1
+                log(f"FAILED to recreate directory {directory}: {e}", 'ERROR')
+
+        log("Cleanup Statistics:")
+        log(f"  Items deleted: {self.stats['deleted']}", 'SUCCESS')
+        log(f"  Protected items preserved: {self.stats['protected']}")
+        log(f"  Items failed: {self.stats['failed']}", 'ERROR' if self.stats['failed'] else 'INFO')
+        if self.client.transient_errors:
+            log(f"  Transient errors retried: {self.client.transient_errors}", 'WARNING')
+        log(f"  Duration: {time.time() - started:.2f} seconds")
+        return self.stats['failed'] == 0
+
+
+def get_optional_float(name):
+    value = os.environ.get(name, '').strip()
+    return float(value) if value else None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clear an Azure File Share before an ARI run")
+    parser.add_argument('--account', default=os.environ.get('AZURE_STORAGE_ACCOUNT'))
+    parser.add_argument('--share', default=os.environ.get('AZURE_FILE_SHARE'))
+    parser.add_argument('--endpoint', default=os.environ.get('AZURE_FILE_ENDPOINT'),
+                        help="Service endpoint override, e.g. a local stand-in")
+    parser.add_argument('--keep', action='append', default=[],
+                        help="Share-relative path to preserve (e.g. the current run folder); repeatable")
+    parser.add_argument('--keep-newer-than', type=float, default=get_optional_float('ARI_CLEANUP_KEEP_NEWER_THAN'),
+                        help="Preserve anything last written at or after this Unix time")
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('ARI_CLEANUP_WORKERS', '16')))
+    args = parser.parse_args(argv)
+    key = os.environ.get('AZURE_STORAGE_KEY')
+    if not (args.account and key and args.share):
+        log("AZURE_STORAGE_ACCOUNT, AZURE_STORAGE_KEY and AZURE_FILE_SHARE are required", 'ERROR')
+        return 1
+    keep = args.keep + [p for p in os.environ.get('ARI_CLEANUP_KEEP', '').split(',') if p]
+
+    print("🧹 Azure File Share Cleanup", flush=True)
+    log(f"Storage Account: {args.account}, File Share: {args.share}")
+    try:
+        client = FileShareClient(args.account, key, args.share, endpoint=args.endpoint)
+        if args.keep_newer_than is not None:
+            log(f"Preserving anything written since {datetime.fromtimestamp(args.keep_newer_than, timezone.utc):%Y-%m-%d %H:%M:%S} UTC")
+        engine = CleanupEngine(client, keep=keep, max_workers=max(1, args.workers), keep_newer_than=args.keep_newer_than)
+        if engine.run():
+            log("CLEANUP COMPLETED SUCCESSFULLY", 'SUCCESS')
+            return 0
+        log("CLEANUP FAILED - some items could not be deleted", 'ERROR')
+        return 1
+    except Exception as e:
+        log(f"ERROR: Failed to clear file share: {e}", 'ERROR')
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
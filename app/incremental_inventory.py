@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""Incremental resource inventory built from Resource Graph change history.
+
+Keeps the last snapshot of the ``resources`` table in a state directory
+(``resources.ndjson`` plus ``snapshot.json``). A run asks Resource Graph's
+``resourcechanges`` table which resources were created, updated or deleted
+since the snapshot was taken, fetches only the current state of the created
+and updated ones, and merges everything into a new snapshot keyed by
+resource id. A full re-extraction (re-baseline) runs when there is no
+snapshot, when the last baseline is older than the configured cadence, or
+when the snapshot is older than the change history Resource Graph keeps.
+
+    python3 /app/app/incremental_inventory.py --state DIR [--subscription ID ...]
+        [--rebaseline-days 7] [--full] [--columnar DIR] [--endpoint URL]
+
+--columnar also writes the refreshed snapshot in the columnar layout of
+snapshot_store.py for downstream stages.
+
+This is an offline tool: jobs started from the web UI do not read or update
+the snapshot. Run it by hand or from a scheduled task.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+try:
+    from .arm_client import ArmClient, RateGovernor, list_subscriptions
+    from .resource_graph import PROJECTION, ResourceGraphExtractor, chunked
+    from .snapshot_store import write_snapshot
+except ImportError:  # Run as a standalone script
+    from arm_client import ArmClient, RateGovernor, list_subscriptions
+    from resource_graph import PROJECTION, ResourceGraphExtractor, chunked
+    from snapshot_store import write_snapshot
+
+
+SNAPSHOT_FILE = 'resources.ndjson'
+META_FILE = 'snapshot.json'
+
+# Resource Graph keeps 14 days of change history; stay safely inside it
+CHANGE_HISTORY_DAYS = 13
+
+# Changes can show up in resourcechanges minutes after they happened, so each
+# refresh re-reads this much of the window before the last snapshot
+DEFAULT_OVERLAP_MINUTES = 30
+
+# Resource ids per "id in~ (...)" lookup query
+LOOKUP_BATCH = 200
+
+
+def format_time(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def parse_time(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+
+
+def changes_query(since):
+    """Latest change per resource since ``since``"""
+    return (
+        "resourcechanges "
+        "| extend changeTime = todatetime(properties.changeAttributes.timestamp), "
+        "targetResourceId = tostring(properties.targetResourceId), "
+        "changeType = tostring(properties.changeType) "
+        f"| where changeTime > datetime({format_time(since)}) "
+        "| summarize arg_max(changeTime, *) by targetResourceId "
+        "| project targetResourceId, changeType, changeTime"
+    )
+
+
+def latest_changes(changes):
+    """One change per resource (ids compared case-insensitively), the latest wins"""
+    latest = {}
+    for change in changes:
+        key = change['targetResourceId'].lower()
+        if key not in latest or change.get('changeTime', '') > latest[key].get('changeTime', ''):
+            latest[key] = change
+    return list(latest.values())
+
+
+def lookup_query(resource_ids):
+    quoted = ', '.join("'" + rid.replace("'", "\\'") + "'" for rid in resource_ids)
+    return f"resources | where id in~ ({quoted}) | {PROJECTION}"
+
+
+def load_snapshot(state_dir):
+    """Return (meta, resources by lower-cased id), or (None, {}) without a snapshot"""
+    try:
+        with open(os.path.join(state_dir, META_FILE)) as f:
+            meta = json.load(f)
+        resources = {}
+        with open(os.path.join(state_dir, SNAPSHOT_FILE), encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    resources[row['id'].lower()] = row
+        return meta, resources
+    except (OSError, ValueError, KeyError):
+        return None, {}
+
+
+def save_snapshot(state_dir, meta, resources):
+    """Atomically replace the snapshot and its metadata"""
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, SNAPSHOT_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        for key in sorted(resources):
+            f.write(json.dumps(resources[key], separators=(',', ':')) + '\n')
+    os.replace(path + '.tmp', path)
+    meta_path = os.path.join(state_dir, META_FILE)
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def needs_rebaseline(meta, now, rebaseline_days):
+    if not meta:
+        return 'no previous snapshot'
+    if now - parse_time(meta['baseline_at']) >= timedelta(days=rebaseline_days):
+        return f"last baseline is older than {rebaseline_days} day(s)"
+    if now - parse_time(meta['taken_at']) >= timedelta(days=CHANGE_HISTORY_DAYS):
+        return f"snapshot is older than the {CHANGE_HISTORY_DAYS}-day change history"
+    return None
+
+
+async def refresh(extractor, state_dir, subscriptions, rebaseline_days=7, force_full=False, now=None,
+                  overlap_minutes=DEFAULT_OVERLAP_MINUTES):
+    """Bring the snapshot up to date; return a summary of what changed
+
+    The change window starts ``overlap_minutes`` before the snapshot was
+    taken. Changes seen by the previous run are read again; that is harmless
+    because only the current state of each resource is fetched.
+    """
+    now = now or datetime.now(timezone.utc)
+    meta, resources = load_snapshot(state_dir)
+    if meta and sorted(meta.get('subscriptions', [])) != sorted(subscriptions):
+        reason = 'subscription scope changed'
+    else:
+        reason = 'requested' if force_full else needs_rebaseline(meta, now, rebaseline_days)
+
+    if reason:
+        rows = await extractor.collect(f"resources | {PROJECTION}", subscriptions)
+        resources = {row['id'].lower(): row for row in rows}
+        summary = {'mode': 'full', 'reason': reason, 'resources': len(resources)}
+        baseline_at = format_time(now)
+    else:
+        since = parse_time(meta['taken_at']) - timedelta(minutes=overlap_minutes)
+        changes = latest_changes(await extractor.collect(changes_query(since), subscriptions))
+        deleted = [c['targetResourceId'] for c in changes if c.get('changeType') == 'Delete']
+        changed = [c['targetResourceId'] for c in changes if c.get('changeType') != 'Delete']
+        # Look changed resources up only in the subscriptions they belong to
+        batches = await asyncio.gather(*(
+            extractor.collect(lookup_query(batch), sorted({rid.split('/')[2] for rid in batch}))
+            for batch in chunked(changed, LOOKUP_BATCH)
+        ))
+        fetched = [row for rows in batches for row in rows]
+        added = 0
+        for row in fetched:
+            key = row['id'].lower()
+            added += key not in resources
+            resources[key] = row
+        removed = sum(resources.pop(rid.lower(), None) is not None for rid in deleted)
+        # Created/updated but already gone again: not returned by the lookup
+        found = {row['id'].lower() for row in fetched}
+        for rid in changed:
+            if rid.lower() not in found:
+                removed += resources.pop(rid.lower(), None) is not None
+        summary = {
+            'mode': 'incremental',
+            'since': format_time(since),
+            'changes': len(changes),
+            'added': added,
+            'updated': len(fetched) - added,
+            'deleted': removed,
+            'resources': len(resources)
+        }
+        baseline_at = meta['baseline_at']
+
+    # Changes made while this run was querying are picked up next time
+    save_snapshot(state_dir, {
+        'taken_at': format_time(now),
+        'baseline_at': baseline_at,
+        'subscriptions': sorted(subscriptions),
+        'resources': len(resources)
+    }, resources)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally refresh a resource inventory snapshot")
+    parser.add_argument('--state', required=True, help="Directory holding the snapshot")
+    parser.add_argument('--subscription', action='append', default=[],
+                        help="Subscription id to include (repeatable; default: all enabled subscriptions)")
+    parser.add_argument('--rebaseline-days', type=float,
+                        default=float(os.environ.get('ARI_INVENTORY_REBASELINE_DAYS', '7')),
+                        help="Run a full extraction when the last one is older than this")
+    parser.add_argument('--full', action='store_true', help="Force a full re-baseline")
+    parser.add_argument('--overlap-minutes', type=float,
+                        default=float(os.environ.get('ARI_INVENTORY_OVERLAP_MINUTES', DEFAULT_OVERLAP_MINUTES)),
+                        help="Re-read this much change history before the last snapshot")
+    parser.add_argument('--columnar', default=None, help="Also write the snapshot as a columnar snapshot here")
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('ARI_ARG_CONCURRENCY', '8')))
+    parser.add_argument('--endpoint', default=None, help="ARM endpoint override, e.g. a mock server")
+    args = parser.parse_args(argv)
+
+    concurrency = max(1, args.concurrency)
+    client = ArmClient(endpoint=args.endpoint, pool_size=concurrency, governor=RateGovernor())
+    started = time.time()
+    try:
+        subscriptions = args.subscription or [s['subscriptionId'] for s in list_subscriptions(client)]
+        extractor = ResourceGraphExtractor(client, max_concurrency=concurrency)
+        summary = asyncio.run(refresh(extractor, args.state, subscriptions,
+                                      rebaseline_days=args.rebaseline_days, force_full=args.full,
+                                      overlap_minutes=args.overlap_minutes))
+        if args.columnar:
+            _, resources = load_snapshot(args.state)
+            write_snapshot(resources.values(), args.columnar)
+    except Exception as e:
+        print(f"ERROR: Incremental inventory failed: {e}", flush=True)
+        return 1
+    finally:
+        client.close()
+    summary['duration_seconds'] = round(time.time() - started, 2)
+    print(json.dumps(summary), flush=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
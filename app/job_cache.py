@@ -0,0 +1,112 @@
+"""Bounded in-memory cache of job records for the ARI web runner."""
+import threading
+from collections import OrderedDict
+
+from .job_store import build_metadata
+
+
+class JobCache:
+    """LRU cache of job dicts with an entry count and output size budget
+
+    Behaves like the plain ``jobs`` dict it replaces. Jobs whose status is in
+    ``pinned_statuses`` (running or waiting to run) are never evicted; other
+    jobs are evicted least-recently-used first once the cache holds more than
+    ``max_jobs`` entries or more than ``max_output_bytes`` of output. Only
+    jobs that are fully persisted are evicted, and a miss on ``get`` reloads
+    the job through ``loader`` so eviction is transparent to callers.
+    """
+
+    def __init__(self, max_jobs, max_output_bytes, pinned_statuses=('running',), loader=None, on_evict=None):
+        self.max_jobs = max_jobs
+        self.max_output_bytes = max_output_bytes
+        self.pinned_statuses = pinned_statuses
+        self.loader = loader
+        self.on_evict = on_evict
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get(self, job_id, default=None):
+        with self.lock:
+            job = self.entries.get(job_id)
+            if job is not None:
+                self.entries.move_to_end(job_id)
+                return job
+        if self.loader is None:
+            return default
+        job = self.loader(job_id)
+        if job is None:
+            return default
+        with self.lock:
+            # Another request may have loaded the job in the meantime
+            job = self.entries.setdefault(job_id, job)
+            self.entries.move_to_end(job_id)
+            self.evict()
+        return job
+
+    def __getitem__(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def __setitem__(self, job_id, job):
+        with self.lock:
+            self.entries[job_id] = job
+            self.entries.move_to_end(job_id)
+            self.evict()
+
+    def __contains__(self, job_id):
+        with self.lock:
+            return job_id in self.entries
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def pop(self, job_id, default=None):
+        with self.lock:
+            return self.entries.pop(job_id, default)
+
+    def keys(self):
+        with self.lock:
+            return list(self.entries.keys())
+
+    def values(self):
+        with self.lock:
+            return list(self.entries.values())
+
+    def items(self):
+        with self.lock:
+            return list(self.entries.items())
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def output_bytes(self):
+        """Total size of the output held by cached jobs, in bytes"""
+        with self.lock:
+            return sum(len(job.get('output') or '') for job in self.entries.values())
+
+    def is_evictable(self, job):
+        if job.get('status') in self.pinned_statuses:
+            return False
+        # Never drop output or status changes that have not reached the store
+        return (job.get('persisted_output_size', 0) == len(job.get('output') or '')
+                and job.get('persisted_metadata') == build_metadata(job))
+
+    def evict(self):
+        """Evict unpinned jobs, least recently used first, until within budget"""
+        with self.lock:
+            total_bytes = self.output_bytes()
+            # The most recently used job is the one a caller is about to use
+            for job_id in list(self.entries.keys())[:-1]:
+                if len(self.entries) <= self.max_jobs and total_bytes <= self.max_output_bytes:
+                    break
+                job = self.entries[job_id]
+                if not self.is_evictable(job):
+                    continue
+                del self.entries[job_id]
+                total_bytes -= len(job.get('output') or '')
+                if self.on_evict:
+                    self.on_evict(job_id)
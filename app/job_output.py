@@ -0,0 +1,95 @@
+"""Append-only output buffer for ARI web runner jobs."""
+import bisect
+import threading
+
+
+class JobOutput:
+    """Job output stored as a list of UTF-8 encoded chunks
+
+    Appending never copies earlier output, so building a log from tens of
+    thousands of subprocess lines stays linear. All offsets and sizes are in
+    bytes; reads from an offset only touch the chunks after that offset.
+    """
+
+    def __init__(self, text=''):
+        self.lock = threading.Lock()
+        self.chunks = []
+        self.starts = []  # Byte offset at which each chunk starts
+        self.size = 0
+        if text:
+            self.append(text)
+
+    @classmethod
+    def from_bytes(cls, data):
+        output = cls()
+        output.append_bytes(data)
+        return output
+
+    def append(self, text):
+        """Append text to the output"""
+        self.append_bytes(text.encode('utf-8'))
+
+    def append_bytes(self, data):
+        """Append already encoded output"""
+        if not data:
+            return
+        with self.lock:
+            self.starts.append(self.size)
+            self.chunks.append(data)
+            self.size += len(data)
+
+    def __iadd__(self, text):
+        self.append(text)
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def read_bytes(self, offset=0, end=None):
+        """Return the encoded output between two byte offsets"""
+        with self.lock:
+            end = self.size if end is None else min(end, self.size)
+            offset = max(offset, 0)
+            if offset >= end:
+                return b''
+            first = bisect.bisect_right(self.starts, offset) - 1
+            last = bisect.bisect_left(self.starts, end)
+            data = b''.join(self.chunks[first:last])
+            base = self.starts[first]
+        return data[offset - base:end - base]
+
+    def read(self, offset=0, end=None):
+        """Return the output between two byte offsets as text
+
+        Offsets that fall inside a multi-byte character drop the partial
+        character instead of failing.
+        """
+        return self.read_bytes(offset, end).decode('utf-8', errors='ignore')
+
+    def tail(self, size):
+        """Return the last ``size`` bytes of output as text"""
+        return self.read(max(self.size - size, 0))
+
+    def __str__(self):
+        return self.read()
+
+    def __contains__(self, text):
+        """Search chunk by chunk without joining or decoding the whole output
+
+        The last ``len(needle) - 1`` bytes before each chunk are carried over,
+        so a match split across chunks is still found. UTF-8 is
+        self-synchronising, so a byte match is a text match.
+        """
+        needle = text.encode('utf-8')
+        if not needle:
+            return True
+        keep = len(needle) - 1
+        with self.lock:
+            chunks = list(self.chunks)
+        carry = b''
+        for chunk in chunks:
+            if needle in chunk or (keep and needle in carry + chunk[:keep]):
+                return True
+            if keep:
+                carry = (carry + chunk[-keep:])[-keep:]
+        return False
@@ -0,0 +1,119 @@
+"""Bounded worker pool that runs ARI jobs in FIFO order."""
+import threading
+import traceback
+from collections import deque
+
+
+def get_available_memory_mb():
+    """Return the memory available to this container in MB, or None if unknown
+
+    The cgroup limit is preferred over /proc/meminfo, which reports the
+    host's memory when running inside a container.
+    """
+    try:
+        with open('/sys/fs/cgroup/memory.max') as f:
+            limit = f.read().strip()
+        with open('/sys/fs/cgroup/memory.current') as f:
+            current = int(f.read().strip())
+        if limit != 'max':
+            return (int(limit) - current) / (1024 * 1024)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class JobScheduler:
+    """Run submitted jobs on at most ``max_concurrent`` worker threads
+
+    Jobs wait in a FIFO queue. Before the job at the head of the queue
+    starts, the scheduler checks that at least ``min_free_memory_mb`` is
+    available; while other jobs are running and memory is short, the job
+    stays queued and the check is repeated every ``admission_poll_seconds``.
+    The check also runs when nothing else is running (the only case with
+    the default ``max_concurrent`` of 1), but then the job starts anyway
+    with a warning, so a low memory reading can never stall the queue.
+    """
+
+    def __init__(self, max_concurrent, min_free_memory_mb, admission_poll_seconds=15,
+                 memory_probe=get_available_memory_mb):
+        self.max_concurrent = max(1, max_concurrent)
+        self.min_free_memory_mb = min_free_memory_mb
+        self.admission_poll_seconds = admission_poll_seconds
+        self.memory_probe = memory_probe
+        self.queue = deque()
+        self.running = set()
+        self.condition = threading.Condition()
+        self.workers = []
+
+    def start(self):
+        """Start the worker threads (idempotent)"""
+        with self.condition:
+            while len(self.workers) < self.max_concurrent:
+                worker = threading.Thread(target=self.worker_loop, name=f"ari-job-worker-{len(self.workers) + 1}")
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def submit(self, job_id, target, *args):
+        """Queue ``target(*args)`` and return the job's 1-based queue position"""
+        self.start()
+        with self.condition:
+            self.queue.append((job_id, target, args))
+            self.condition.notify_all()
+            return len(self.queue)
+
+    def queue_position(self, job_id):
+        """Return the 1-based queue position of a waiting job, or None"""
+        with self.condition:
+            for position, (queued_id, _, _) in enumerate(self.queue, start=1):
+                if queued_id == job_id:
+                    return position
+        return None
+
+    def memory_below_floor(self):
+        """Return the available memory in MB when it is below the floor, else None"""
+        if not self.min_free_memory_mb:
+            return None
+        available = self.memory_probe()
+        if available is None or available >= self.min_free_memory_mb:
+            return None
+        return available
+
+    def worker_loop(self):
+        while True:
+            with self.condition:
+                waiting_for_memory = None
+                while True:
+                    if self.queue:
+                        head_id = self.queue[0][0]
+                        available = self.memory_below_floor()
+                        if available is None:
+                            break
+                        if not self.running:
+                            print(f"[SCHEDULER] WARNING: starting job {head_id} with only {available:.0f} MB of free "
+                                  f"memory (below {self.min_free_memory_mb} MB) because no other job is running")
+                            break
+                        if waiting_for_memory != head_id:
+                            waiting_for_memory = head_id
+                            print(f"[SCHEDULER] Job {head_id} waiting for {self.min_free_memory_mb} MB of free memory "
+                                  f"({len(self.running)} job(s) running)")
+                    self.condition.wait(timeout=self.admission_poll_seconds)
+                job_id, target, args = self.queue.popleft()
+                self.running.add(job_id)
+                print(f"[SCHEDULER] Starting job {job_id} ({len(self.running)} running, {len(self.queue)} queued)")
+            try:
+                target(*args)
+            except Exception as e:
+                print(f"[SCHEDULER] Job {job_id} raised: {e}")
+                print(traceback.format_exc())
+            finally:
+                with self.condition:
+                    self.running.discard(job_id)
+                    self.condition.notify_all()
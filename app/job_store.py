@@ -0,0 +1,462 @@
+"""Job persistence backends for the ARI web runner.
+
+Two interchangeable stores are provided:
+
+* ``FileJobStore`` keeps one append-only ``<id>.log`` output segment and one
+  small ``<id>.meta.json`` record per job in the jobs directory.
+* ``SQLiteJobStore`` keeps the same data in an indexed SQLite database, so
+  lookups by id, status and created_at do not scale with the number of
+  files in the jobs directory.
+
+The backend is selected with the ``ARI_JOB_STORE`` environment variable
+(``sqlite`` by default, ``file`` for the per-file layout). The database
+lives in the jobs directory on the share by default, so job history
+survives container restarts. WAL mode needs shared memory, which network
+filesystems such as the Azure Files (SMB) share do not provide, so a
+database on one uses the rollback journal instead.
+"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from .job_output import JobOutput
+
+
+# Written next to the legacy job files once they are copied into SQLite
+MIGRATION_MARKER = '.sqlite-migrated'
+
+NETWORK_FILESYSTEMS = ('cifs', 'smb3', 'smbfs', 'nfs', 'nfs4', '9p', 'fuse.sshfs', 'fuse.blobfuse', 'fuse.blobfuse2')
+
+
+def is_network_filesystem(path):
+    """Return True if ``path`` is on a network filesystem (per /proc/mounts)"""
+    path = os.path.realpath(path)
+    best_mount, best_type = '', ''
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) > len(best_mount):
+                    best_mount, best_type = mount_point, fields[2]
+    except OSError:
+        return False
+    return best_type.lower() in NETWORK_FILESYSTEMS
+
+
+METADATA_FIELDS = ('status', 'created_at', 'cleanup_status', 'cleanup_error')
+
+
+def build_metadata(job_data):
+    """Return the serializable metadata record for a job"""
+    created_at = job_data.get('created_at')
+    return {
+        'status': job_data.get('status'),
+        'created_at': created_at.isoformat() if created_at else None,
+        'cleanup_status': job_data.get('cleanup_status', 'pending'),
+        'cleanup_error': job_data.get('cleanup_error', '')
+    }
+
+
+def parse_created_at(value):
+    """Convert ISO format strings back to datetime"""
+    return datetime.fromisoformat(value) if value else None
+
+
+class JobStore:
+    """Interface shared by all job persistence backends
+
+    Job output is a ``JobOutput`` buffer. ``save`` only writes output appended
+    since the previous save; progress is tracked on the job dict itself
+    through ``persisted_output_size`` (bytes) and ``persisted_metadata``, so
+    callers keep passing the live job dict.
+    """
+
+    def save(self, job_id, job_data):
+        self.save_many([(job_id, job_data)])
+
+    def save_many(self, items):
+        raise NotImplementedError
+
+    def load(self, job_id):
+        raise NotImplementedError
+
+    def list_ids(self):
+        raise NotImplementedError
+
+    def find(self, status=None, created_after=None, created_before=None, limit=None):
+        """Return job summaries (id, status, created_at, output_size), newest first
+
+        ``output_size`` is the size of the persisted output in UTF-8 bytes.
+        """
+        raise NotImplementedError
+
+    def delete(self, job_id):
+        raise NotImplementedError
+
+    def compact(self):
+        """Give the space of deleted jobs back to the filesystem (no-op by default)"""
+
+    @staticmethod
+    def pending_output(job_data):
+        """Return the encoded output that has not been persisted yet"""
+        output = job_data.get('output')
+        if not isinstance(output, JobOutput):
+            output = job_data['output'] = JobOutput(output or '')
+        return output.read_bytes(job_data.get('persisted_output_size', 0))
+
+    @staticmethod
+    def mark_persisted(job_data, metadata, pending):
+        job_data['persisted_output_size'] = job_data.get('persisted_output_size', 0) + len(pending)
+        job_data['persisted_metadata'] = metadata
+
+
+class FileJobStore(JobStore):
+    """Per-file job store: append-only output log plus a metadata record"""
+
+    def __init__(self, jobs_dir):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def paths(self, job_id):
+        return (
+            os.path.join(self.jobs_dir, f"{job_id}.meta.json"),
+            os.path.join(self.jobs_dir, f"{job_id}.log"),
+        )
+
+    def save_many(self, items):
+        for job_id, job_data in items:
+            meta_file, log_file = self.paths(job_id)
+
+            # Append only the output that has not been persisted yet
+            pending = self.pending_output(job_data)
+            if pending:
+                with open(log_file, 'ab') as f:
+                    f.write(pending)
+
+            metadata = build_metadata(job_data)
+            if job_data.get('persisted_metadata') != metadata:
+                temp_file = meta_file + '.tmp'
+                with open(temp_file, 'w') as f:
+                    json.dump(metadata, f)
+                os.replace(temp_file, meta_file)
+            self.mark_persisted(job_data, metadata, pending)
+
+    def load(self, job_id):
+        meta_file, log_file = self.paths(job_id)
+        legacy_file = os.path.join(self.jobs_dir, f"{job_id}.json")
+        data = None
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                data = json.load(f)
+            data['persisted_metadata'] = dict(data)
+            data['output'] = JobOutput()
+            if os.path.exists(log_file):
+                with open(log_file, 'rb') as f:
+                    data['output'] = JobOutput.from_bytes(f.read())
+        elif os.path.exists(log_file):
+            # Metadata never made it to disk - rebuild what we can from the log
+            with open(log_file, 'rb') as f:
+                output = JobOutput.from_bytes(f.read())
+            data = {
+                'status': 'failed',
+                'output': output,
+                'created_at': datetime.fromtimestamp(os.path.getmtime(log_file)).isoformat(),
+                'cleanup_status': 'pending',
+                'cleanup_error': ''
+            }
+        elif os.path.exists(legacy_file):
+            # Jobs saved before the append-only log was introduced
+            with open(legacy_file, 'r') as f:
+                data = json.load(f)
+            data['output'] = JobOutput(data.get('output') or '')
+            data['persisted_output_size'] = 0
+        if data is None:
+            return None
+        if 'persisted_output_size' not in data:
+            data['persisted_output_size'] = len(data['output'])
+        data['created_at'] = parse_created_at(data.get('created_at'))
+        return data
+
+    def list_ids(self):
+        job_ids = set()
+        if not os.path.exists(self.jobs_dir):
+            return []
+        for filename in os.listdir(self.jobs_dir):
+            if filename.endswith('.meta.json'):
+                job_ids.add(filename[:-len('.meta.json')])
+            elif filename.endswith('.log'):
+                job_ids.add(filename[:-len('.log')])
+            elif filename.endswith('.json'):
+                job_ids.add(filename[:-len('.json')])
+        return sorted(job_ids)
+
+    def summary(self, job_id):
+        """Return the compact index entry for a job without reading its output"""
+        meta_file, log_file = self.paths(job_id)
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r') as f:
+                metadata = json.load(f)
+            return {
+                'id': job_id,
+                'status': metadata.get('status'),
+                'created_at': parse_created_at(metadata.get('created_at')),
+                'output_size': os.path.getsize(log_file) if os.path.exists(log_file) else 0
+            }
+        # Log-only and legacy jobs have to be loaded to be summarized
+        job = self.load(job_id)
+        if not job:
+            return None
+        return {
+            'id': job_id,
+            'status': job.get('status'),
+            'created_at': job.get('created_at'),
+            'output_size': len(job['output'])
+        }
+
+    def find(self, status=None, created_after=None, created_before=None, limit=None):
+        summaries = []
+        for job_id in self.list_ids():
+            summary = self.summary(job_id)
+            if not summary:
+                continue
+            created_at = summary['created_at']
+            if status and summary['status'] != status:
+                continue
+            if created_after and (not created_at or created_at < created_after):
+                continue
+            if created_before and (not created_at or created_at >= created_before):
+                continue
+            summaries.append(summary)
+        summaries.sort(key=lambda s: s['created_at'] or datetime.min, reverse=True)
+        return summaries[:limit] if limit else summaries
+
+    def delete(self, job_id):
+        meta_file, log_file = self.paths(job_id)
+        for path in (meta_file, log_file, os.path.join(self.jobs_dir, f"{job_id}.json")):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class SQLiteJobStore(JobStore):
+    """Indexed SQLite job store running in WAL mode
+
+    Output is stored as append-only chunks, one row per save, so a flush
+    inserts only the new output just like the file store does.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT,
+            created_at TEXT,
+            cleanup_status TEXT,
+            cleanup_error TEXT,
+            output_size INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+        CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+        CREATE TABLE IF NOT EXISTS job_output (
+            job_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            chunk BLOB NOT NULL,
+            PRIMARY KEY (job_id, seq)
+        );
+        CREATE TABLE IF NOT EXISTS store_info (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # Only takes effect on a new database; compact() converts older ones
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if is_network_filesystem(os.path.dirname(os.path.abspath(db_path))):
+            # WAL's shared-memory index is unsafe over SMB/NFS
+            journal_mode = self.conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0]
+            print(f"SQLite job store is on a network filesystem, using journal_mode={journal_mode}: {db_path}")
+        else:
+            journal_mode = self.conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+            if journal_mode.lower() != 'wal':
+                print(f"SQLite job store could not enable WAL mode (using {journal_mode}): {db_path}")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        self.conn.commit()
+
+    def save_many(self, items):
+        now = datetime.now().isoformat()
+        pendings = []
+        with self.lock, self.conn:
+            for job_id, job_data in items:
+                pending = self.pending_output(job_data)
+                pendings.append(pending)
+                metadata = build_metadata(job_data)
+                self.conn.execute(
+                    """
+                    INSERT INTO jobs (id, status, created_at, cleanup_status, cleanup_error, output_size, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(id) DO UPDATE SET
+                        status = excluded.status,
+                        created_at = excluded.created_at,
+                        cleanup_status = excluded.cleanup_status,
+                        cleanup_error = excluded.cleanup_error,
+                        output_size = jobs.output_size + excluded.output_size,
+                        updated_at = excluded.updated_at
+                    """,
+                    (job_id, metadata['status'], metadata['created_at'], metadata['cleanup_status'],
+                     metadata['cleanup_error'], len(pending), now)
+                )
+                if pending:
+                    self.conn.execute(
+                        """
+                        INSERT INTO job_output (job_id, seq, chunk)
+                        VALUES (?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM job_output WHERE job_id = ?), ?)
+                        """,
+                        (job_id, job_id, sqlite3.Binary(pending))
+                    )
+        for (_, job_data), pending in zip(items, pendings):
+            self.mark_persisted(job_data, build_metadata(job_data), pending)
+
+    def load(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            chunks = self.conn.execute(
+                "SELECT chunk FROM job_output WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+        data = {field: row[field] for field in METADATA_FIELDS}
+        data['persisted_metadata'] = dict(data)
+        output = JobOutput()
+        for chunk in chunks:
+            value = chunk['chunk']
+            output.append_bytes(value if isinstance(value, bytes) else value.encode('utf-8'))
+        data['output'] = output
+        data['persisted_output_size'] = len(output)
+        data['created_at'] = parse_created_at(data['created_at'])
+        return data
+
+    def list_ids(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT id FROM jobs ORDER BY id").fetchall()
+        return [row['id'] for row in rows]
+
+    def find(self, status=None, created_after=None, created_before=None, limit=None):
+        query = "SELECT id, status, created_at, output_size FROM jobs WHERE 1 = 1"
+        params = []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if created_after:
+            query += " AND created_at >= ?"
+            params.append(created_after.isoformat())
+        if created_before:
+            query += " AND created_at < ?"
+            params.append(created_before.isoformat())
+        query += " ORDER BY created_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [
+            {
+                'id': row['id'],
+                'status': row['status'],
+                'created_at': parse_created_at(row['created_at']),
+                'output_size': row['output_size']
+            }
+            for row in rows
+        ]
+
+    def delete(self, job_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM job_output WHERE job_id = ?", (job_id,))
+            self.conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def compact(self):
+        with self.lock:
+            if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                # executescript steps the pragma to completion; execute frees one page
+                self.conn.executescript("PRAGMA incremental_vacuum;")
+            else:
+                # A full VACUUM rebuilds the file and switches it to incremental mode
+                self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                self.conn.execute("VACUUM")
+
+    def get_info(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM store_info WHERE key = ?", (key,)).fetchone()
+        return row['value'] if row else None
+
+    def set_info(self, key, value):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO store_info (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value)
+            )
+
+
+def migrate_file_jobs(source, target, batch_size=100):
+    """Copy every job from a file store into another store, in batches
+
+    Jobs already present in the target are skipped, so the migration can be
+    re-run safely. Returns the number of jobs copied.
+    """
+    existing = set(target.list_ids())
+    batch = []
+    migrated = 0
+    for job_id in source.list_ids():
+        if job_id in existing:
+            continue
+        job_data = source.load(job_id)
+        if not job_data:
+            continue
+        # Force the full output to be written into the new store
+        job_data['persisted_output_size'] = 0
+        job_data.pop('persisted_metadata', None)
+        batch.append((job_id, job_data))
+        if len(batch) >= batch_size:
+            target.save_many(batch)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        target.save_many(batch)
+        migrated += len(batch)
+    return migrated
+
+
+def get_job_store(jobs_dir):
+    """Create the configured job store, migrating legacy job files if needed"""
+    backend = os.environ.get("ARI_JOB_STORE", "sqlite").strip().lower()
+    if backend == "file":
+        return FileJobStore(jobs_dir)
+
+    db_path = os.environ.get("ARI_JOB_DB") or os.path.join(jobs_dir, "jobs.db")
+    store = SQLiteJobStore(db_path)
+    # The marker sits next to the legacy files, so a database on local disk
+    # that starts empty after a restart does not parse them all again
+    marker = os.path.join(jobs_dir, MIGRATION_MARKER)
+    if not store.get_info('file_jobs_migrated_at') and not os.path.exists(marker):
+        try:
+            migrated = migrate_file_jobs(FileJobStore(jobs_dir), store)
+            migrated_at = datetime.now().isoformat()
+            store.set_info('file_jobs_migrated_at', migrated_at)
+            with open(marker, 'w') as f:
+                json.dump({'migrated_at': migrated_at, 'db_path': db_path, 'jobs': migrated}, f)
+            if migrated:
+                print(f"Migrated {migrated} job files from {jobs_dir} into {db_path}")
+        except Exception as e:
+            print(f"Error migrating job files into {db_path}: {e}")
+    return store
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""Incremental readers for large JSON inventory files, and an NDJSON converter.
+
+``resources-detailed.json`` (a top-level array from ``az resource list``) and
+the ReportCache files (a top-level object of module name -> array of entries,
+written by Build-ARICacheFiles) are single JSON documents. ``iter_json``
+yields their items one at a time, reading the file in chunks and decoding
+each item with ``json.JSONDecoder.raw_decode``, so memory is bounded by the
+largest single item rather than the whole file.
+
+``convert_to_ndjson`` rewrites such a file as one item per line next to a
+``.idx`` file of 8-byte line offsets; ``NdjsonFile`` seeks to any line
+through the index and appends new lines cheaply.
+
+    python3 /app/app/json_stream.py convert resources-detailed.json [--out FILE]
+    python3 /app/app/json_stream.py count FILE
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+
+
+CHUNK_SIZE = 1 << 16
+OFFSET = struct.Struct('<Q')
+WHITESPACE = ' \t\r\n'
+DELIMITERS = WHITESPACE + ',:]}'
+
+
+class JsonStream:
+    """Chunked character buffer over a text file with raw_decode on top"""
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """Read more input, dropping consumed text; False at end of file"""
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character ('' at end of file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected one of {chars!r} but found {char or 'end of file'!r} "
+                             f"near character {self.pos} of the current chunk")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut by the end of the chunk (e.g. "-2." of "-2.5e3") may continue
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Grow geometrically so a huge item is not re-decoded once per chunk
+            self.fill(max(self.chunk_size, len(self.buffer) - self.pos))
+
+    def items(self):
+        """Yield the elements of the array at the current position"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def members(self):
+        """Yield (key, value) for the object at the current position
+
+        Array values are streamed: one (key, element) pair per element.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            if self.peek() == '[':
+                for element in self.items():
+                    yield key, element
+            else:
+                yield key, self.value()
+            if self.expect(',}') == '}':
+                return
+
+
+def iter_json(path, chunk_size=CHUNK_SIZE):
+    """Yield the items of a large JSON file one at a time
+
+    A top-level array yields its elements. A top-level object (a ReportCache
+    file) yields (key, entry) pairs, one per element of array values. Any
+    other document is yielded whole.
+    """
+    with open(path, encoding='utf-8-sig') as f:
+        stream = JsonStream(f, chunk_size)
+        first = stream.peek()
+        if first == '[':
+            yield from stream.items()
+        elif first == '{':
+            yield from stream.members()
+        elif first:
+            yield stream.value()
+        if stream.peek():
+            raise ValueError(f"{path}: unexpected data after the JSON document")
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+def convert_to_ndjson(source, destination=None):
+    """Rewrite a JSON array or ReportCache file as NDJSON with a line-offset index
+
+    ReportCache entries are written as {"key": module, "value": entry}.
+    Returns (destination, number of lines).
+    """
+    if destination is None:
+        destination = os.path.splitext(source)[0] + '.ndjson'
+    tmp = destination + '.tmp'
+    count = 0
+    with open(tmp, 'wb') as out, open(index_path(tmp), 'wb') as idx:
+        for item in iter_json(source):
+            if isinstance(item, tuple):
+                item = {'key': item[0], 'value': item[1]}
+            idx.write(OFFSET.pack(out.tell()))
+            out.write(json.dumps(item, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n')
+            count += 1
+    os.replace(index_path(tmp), index_path(destination))
+    os.replace(tmp, destination)
+    return destination, count
+
+
+def build_index(path):
+    """(Re)build the offset index of an NDJSON file; return the line count"""
+    count = 0
+    with open(path, 'rb') as f, open(index_path(path) + '.tmp', 'wb') as idx:
+        offset = 0
+        for line in f:
+            if line.strip():
+                idx.write(OFFSET.pack(offset))
+                count += 1
+            offset += len(line)
+    os.replace(index_path(path) + '.tmp', index_path(path))
+    return count
+
+
+def index_is_current(path):
+    """Return True if the ``.idx`` file still describes the NDJSON file
+
+    The last indexed line must end where the file's data ends. This does not
+    rely on mtimes, which are too coarse on SMB shares to order the two files.
+    """
+    try:
+        index_size = os.path.getsize(index_path(path))
+        if index_size % OFFSET.size:
+            return False
+        with open(path, 'rb') as f:
+            if not index_size:
+                return not f.read().strip()
+            with open(index_path(path), 'rb') as idx:
+                idx.seek(index_size - OFFSET.size)
+                f.seek(OFFSET.unpack(idx.read(OFFSET.size))[0])
+            line = f.readline()
+            return line.endswith(b'\n') and bool(line.strip()) and not f.read().strip()
+    except OSError:
+        return False
+
+
+class NdjsonFile:
+    """Random access to, and appends onto, an NDJSON file with a ``.idx`` index"""
+
+    def __init__(self, path):
+        self.path = path
+        if not index_is_current(path):
+            build_index(path)
+
+    def __len__(self):
+        return os.path.getsize(index_path(self.path)) // OFFSET.size
+
+    def offset(self, number):
+        with open(index_path(self.path), 'rb') as idx:
+            idx.seek(number * OFFSET.size)
+            return OFFSET.unpack(idx.read(OFFSET.size))[0]
+
+    def __getitem__(self, number):
+        if number < 0:
+            number += len(self)
+        if not 0 <= number < len(self):
+            raise IndexError(number)
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset(number))
+            return json.loads(f.readline())
+
+    def __iter__(self):
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def append(self, item):
+        line = json.dumps(item, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n'
+        with open(self.path, 'ab') as f, open(index_path(self.path), 'ab') as idx:
+            idx.write(OFFSET.pack(f.tell()))
+            f.write(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream large inventory JSON files")
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help="Rewrite a JSON file as indexed NDJSON")
+    convert.add_argument('source')
+    convert.add_argument('--out', default=None, help="NDJSON file (default: <source>.ndjson)")
+    count = commands.add_parser('count', help="Count the items of a JSON or NDJSON file")
+    count.add_argument('source')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'convert':
+            destination, lines = convert_to_ndjson(args.source, args.out)
+            print(f"Wrote {lines} line(s) to {destination}")
+        elif args.source.endswith('.ndjson'):
+            print(len(NdjsonFile(args.source)))
+        else:
+            print(sum(1 for _ in iter_json(args.source)))
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", flush=True)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-from flask import Flask, render_template_string, request, redirect, url_for, jsonify
+from flask import Flask, Response, render_template_string, request, redirect, url_for, jsonify
 import os
 import subprocess
 import shlex
@@ -9,12 +9,70 @@ from datetime import datetime
 import re
 import json
 import pickle
+import shutil
+
+from .artifact_store import get_artifact_store
+from .job_cache import JobCache
+from .job_output import JobOutput
+from .job_scheduler import JobScheduler
+from .job_store import get_job_store
+from .run_archive import run_archive_files, stream_zip
+from .retention import RetentionEngine
+from .run_index import RUN_DIR_PATTERN, RunIndex
+from .run_manifest import build_manifest, matches_manifest, write_manifest
 
 
 app = Flask(__name__)
 
-# Global jobs dictionary to track running processes
-jobs = {}
+# Job statuses for which /job-stream keeps the connection open
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+# Global jobs cache to track running processes. Running jobs stay pinned;
+# finished jobs are evicted LRU-first and reloaded from the job store on demand
+jobs = JobCache(
+    max_jobs=int(os.environ.get("ARI_JOB_CACHE_MAX_JOBS", "50")),
+    max_output_bytes=int(os.environ.get("ARI_JOB_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    pinned_statuses=ACTIVE_JOB_STATUSES
+)
+
+# Seconds between /job-stream heartbeat events while a job is quiet
+JOB_STREAM_HEARTBEAT_SECONDS = 10
+# Margin for clock differences between this container and the file share
+CLEANUP_CLOCK_SKEW_SECONDS = 300
+
+# Bounded worker pool - jobs beyond the concurrency limit wait in a FIFO queue
+job_scheduler = JobScheduler(
+    max_concurrent=int(os.environ.get("ARI_MAX_CONCURRENT_JOBS", "1")),
+    min_free_memory_mb=int(os.environ.get("ARI_JOB_MIN_FREE_MEMORY_MB", "2048"))
+)
+
+# Per-job condition variables used to wake /job-stream listeners
+job_conditions = {}
+job_conditions_lock = threading.Lock()
+
+def get_job_condition(job_id):
+    """Get (or create) the condition variable that signals new job output"""
+    with job_conditions_lock:
+        return job_conditions.setdefault(job_id, threading.Condition())
+
+def forget_job_condition(job_id):
+    """Drop the condition variable of a job that left the cache"""
+    with job_conditions_lock:
+        job_conditions.pop(job_id, None)
+
+def append_job_output(job_id, text):
+    """Append output to a job and wake any /job-stream listeners"""
+    condition = get_job_condition(job_id)
+    with condition:
+        jobs[job_id]['output'].append(text)
+        condition.notify_all()
+
+def set_job_status(job_id, status):
+    """Update a job's status and wake any /job-stream listeners"""
+    condition = get_job_condition(job_id)
+    with condition:
+        jobs[job_id]['status'] = status
+        condition.notify_all()
 
 # Job persistence directory - use same volume as ARI output for persistence
 def get_jobs_dir():
@@ -26,51 +84,49 @@ def get_jobs_dir():
 
 JOBS_DIR = get_jobs_dir()
 
+job_store = get_job_store(JOBS_DIR)
+
 def save_job(job_id, job_data):
-    """Save job data to disk for persistence"""
+    """Save job data to the job store for persistence
+
+    Only output appended since the previous save is written, so periodic
+    flushes stay cheap no matter how long the job has been running.
+    """
     try:
-        job_file = os.path.join(JOBS_DIR, f"{job_id}.json")
-        # Convert datetime objects to strings for JSON serialization
-        serializable_data = {
-            'status': job_data.get('status'),
-            'output': job_data.get('output', ''),
-            'created_at': job_data.get('created_at').isoformat() if 'created_at' in job_data else None,
-            'cleanup_status': job_data.get('cleanup_status', 'pending'),
-            'cleanup_error': job_data.get('cleanup_error', '')
-        }
-        with open(job_file, 'w') as f:
-            json.dump(serializable_data, f)
+        job_store.save(job_id, job_data)
     except Exception as e:
         print(f"Error saving job {job_id}: {e}")
 
 def load_job(job_id):
-    """Load job data from disk"""
+    """Load job data from the job store
+
+    Jobs queued or running in this process are pinned in the jobs cache and
+    never loaded from the store, so an active status found here was left
+    behind by a previous container and the job is marked as failed.
+    """
     try:
-        job_file = os.path.join(JOBS_DIR, f"{job_id}.json")
-        if os.path.exists(job_file):
-            with open(job_file, 'r') as f:
-                data = json.load(f)
-                # Convert ISO format strings back to datetime
-                if data.get('created_at'):
-                    data['created_at'] = datetime.fromisoformat(data['created_at'])
-                return data
+        job = job_store.load(job_id)
+        if job and job.get('status') in ACTIVE_JOB_STATUSES:
+            job['status'] = 'failed'
+            job['output'].append('<br>Job was interrupted because the container restarted before it finished.')
+            save_job(job_id, job)
+        return job
     except Exception as e:
         print(f"Error loading job {job_id}: {e}")
     return None
 
+# Cache misses (e.g. evicted jobs) are reloaded from the job store
+jobs.loader = load_job
+jobs.on_evict = forget_job_condition
+
 def load_all_jobs():
     """Load all persisted jobs on startup"""
     try:
-        print(f"Loading jobs from: {JOBS_DIR}")
-        if not os.path.exists(JOBS_DIR):
-            print(f"Jobs directory does not exist yet: {JOBS_DIR}")
-            return
-        
-        job_files = [f for f in os.listdir(JOBS_DIR) if f.endswith('.json')]
-        print(f"Found {len(job_files)} job files to restore")
+        print(f"Loading jobs from: {JOBS_DIR} ({type(job_store).__name__})")
+        job_ids = job_store.list_ids()
+        print(f"Found {len(job_ids)} jobs to restore")
         
-        for filename in job_files:
-            job_id = filename[:-5]  # Remove .json extension
+        for job_id in job_ids:
             job_data = load_job(job_id)
             if job_data:
                 jobs[job_id] = job_data
@@ -82,10 +138,14 @@ def load_all_jobs():
         import traceback
         print(traceback.format_exc())
 
-# Load existing jobs on startup
+# Load existing jobs on startup - lazily by default, eagerly if requested
 print("=" * 50)
 print("Flask app starting - loading persisted jobs...")
-load_all_jobs()
+if os.environ.get("ARI_JOB_RESTORE", "lazy").strip().lower() == "eager":
+    load_all_jobs()
+else:
+    # Jobs are paged in from the job store on their first request
+    print(f"Jobs are loaded on demand from: {JOBS_DIR} ({type(job_store).__name__})")
 print("=" * 50)
 
 
@@ -281,6 +341,80 @@ def get_output_dir() -> str:
     return default_dir
 
 
+# Cached listing of run folders and their artifacts on the output share
+run_index = RunIndex(get_output_dir(), max_cached_runs=int(os.environ.get("ARI_RUN_INDEX_CACHE_RUNS", "256")))
+# Optional deduplicated blob store that run artifacts are moved into
+artifact_store = get_artifact_store(get_output_dir())
+
+
+
+def get_optional_number(name, cast=int):
+    value = os.environ.get(name, "").strip()
+    return cast(value) if value else None
+
+
+def active_jobs_since():
+    """Creation time of the oldest queued or running job, or None"""
+    started = [job.get('created_at') for job in jobs.values() if job.get('status') in ACTIVE_JOB_STATUSES]
+    started = [created_at for created_at in started if created_at]
+    return min(started) if started else None
+
+
+def forget_deleted_job(job_id):
+    jobs.pop(job_id)
+    forget_job_condition(job_id)
+
+
+# Background pruning of old run folders and job records (off unless a policy is set)
+max_total_mb = get_optional_number("ARI_RETENTION_MAX_MB", float)
+retention_engine = RetentionEngine(
+    get_output_dir(),
+    run_index,
+    job_store,
+    keep_last_runs=get_optional_number("ARI_RETENTION_KEEP_RUNS"),
+    keep_last_jobs=get_optional_number("ARI_RETENTION_KEEP_JOBS"),
+    max_age_days=get_optional_number("ARI_RETENTION_MAX_AGE_DAYS", float),
+    max_total_bytes=int(max_total_mb * 1024 * 1024) if max_total_mb is not None else None,
+    interval_seconds=int(os.environ.get("ARI_RETENTION_INTERVAL_MINUTES", "60")) * 60,
+    max_workers=int(os.environ.get("ARI_RETENTION_WORKERS", "8")),
+    artifact_store=artifact_store,
+    active_statuses=ACTIVE_JOB_STATUSES,
+    active_since=active_jobs_since,
+    on_job_deleted=forget_deleted_job
+)
+retention_engine.start()
+
+def resolve_artifact_path(artifact):
+    """Return the file holding an artifact's content: the run copy or its blob"""
+    run_path = os.path.join(get_output_dir(), artifact["path"])
+    if artifact.get("stored") == "blob" and artifact_store and not os.path.exists(run_path):
+        return artifact_store.blob_path(artifact["sha256"])
+    return run_path
+
+
+def share_relative_path(path):
+    """Return ``path`` relative to the file share mount (ARI_SHARE_MOUNT), or None"""
+    relative = os.path.relpath(os.path.abspath(path), os.environ.get("ARI_SHARE_MOUNT", "/data"))
+    if relative == ".":
+        return ""
+    return None if relative.startswith("..") else relative.replace(os.sep, "/")
+
+
+def get_job_work_dir(job_id) -> str:
+    """Create the private scratch directory of a job
+
+    Holds the generated scripts, PowerShell temp files (TMPDIR), the Azure
+    CLI config (AZURE_CONFIG_DIR) and the Az PowerShell context (HOME), so
+    concurrent jobs never share logins or overwrite each other's files.
+    """
+    base_dir = os.environ.get("ARI_WORK_DIR", "/tmp/ari-jobs")
+    work_dir = os.path.join(base_dir, job_id)
+    for subdir in ("tmp", "azure", "home"):
+        os.makedirs(os.path.join(work_dir, subdir), exist_ok=True)
+    os.chmod(work_dir, 0o700)
+    return work_dir
+
+
 @app.route("/", methods=["GET"])
 def index():
     return INDEX_HTML
@@ -295,7 +429,9 @@ def debug_files():
         "dir_exists": os.path.exists(output_dir),
         "all_files": [],
         "filtered_files": [],
-        "env_var": os.environ.get("ARI_OUTPUT_DIR", "Not set")
+        "env_var": os.environ.get("ARI_OUTPUT_DIR", "Not set"),
+        "latest_run": None,
+        "latest_run_artifacts": []
     }
     
     try:
@@ -303,6 +439,12 @@ def debug_files():
             all_files = os.listdir(output_dir)
             debug_info["all_files"] = all_files
             debug_info["filtered_files"] = [f for f in all_files if f.lower().endswith((".xlsx", ".xml", ".log", ".txt", ".csv", ".json", ".html", ".pdf"))]
+        # Run contents come from the run index (the run's manifest when it has one)
+        debug_info["latest_run"] = run_index.latest_run()
+        if debug_info["latest_run"]:
+            debug_info["latest_run_artifacts"] = [
+                f"{a['path']} ({a['kind']}, {a['size']} bytes)" for a in run_index.artifacts(debug_info["latest_run"])
+            ]
     except Exception as e:
         debug_info["error"] = str(e)
     
@@ -332,36 +474,23 @@ def check_jobs():
 
 @app.route("/outputs", methods=["GET"])
 def list_outputs():
-    output_dir = get_output_dir()
     files = []
+    latest = None
     try:
         # Prefer the newest per-run subdirectory (yyyyMMdd_HHmmss) if present
-        run_roots = []
-        try:
-            candidates = [
-                name
-                for name in os.listdir(output_dir)
-                if os.path.isdir(os.path.join(output_dir, name))
-                and re.match(r"^\d{8}_\d{6}$", name)
-            ]
-            if candidates:
-                latest = sorted(candidates)[-1]
-                run_roots = [os.path.join(output_dir, latest)]
-            else:
-                run_roots = [output_dir]
-        except FileNotFoundError:
-            run_roots = [output_dir]
-
-        for root in run_roots:
-          for _, _, filenames in os.walk(root):
-            for fname in filenames:
-              # Only include Excel report files from the newest run directory
-              if fname.lower().endswith(".xlsx"):
-                rel_path = os.path.relpath(os.path.join(root, fname), output_dir)
-                files.append(rel_path)
+        latest = run_index.latest_run()
+        for artifact in run_index.artifacts(latest):
+            # Only include Excel report files from the newest run directory
+            if artifact['name'].lower().endswith(".xlsx"):
+                files.append(artifact['path'])
     except FileNotFoundError:
         pass
 
+    bundle_link = (
+        f'<div class="stats"><a href="/download-run/{latest}.zip" class="download-btn">🗜️ Download all files of run {latest} (.zip)</a></div>'
+        if latest else ''
+    )
+
     # Create file items with enhanced styling
     if files:
         items = ""
@@ -597,12 +726,14 @@ def list_outputs():
       
       <div class="content">
         {f'<div class="stats"><div class="stats-text">📁 Found {len(files)} report file(s) ready for download</div></div>' if files else ''}
+        {bundle_link}
         
         <div class="file-grid">
           {items}
         </div>
         
         <div class="back-link">
+          <a href="/runs">🕘 Browse older runs</a> &nbsp;|&nbsp;
           <a href="/">← Back to Main Dashboard</a>
         </div>
       </div>
@@ -613,9 +744,191 @@ def list_outputs():
     return html
 
 
+def run_created_at(run_id):
+    """Run folders are named after the local time the run started"""
+    try:
+        return datetime.strptime(run_id, "%Y%m%d_%H%M%S").isoformat()
+    except ValueError:
+        return None
+
+
+@app.route("/api/runs", methods=["GET"])
+def api_runs():
+    """Page through run history, newest first
+
+    Query parameters: ``cursor`` (run id returned as ``next_cursor`` by the
+    previous page) and ``limit`` (1-100, default 20).
+    """
+    cursor = request.args.get("cursor") or None
+    try:
+        limit = min(max(int(request.args.get("limit", "20")), 1), 100)
+    except ValueError:
+        limit = 20
+    if cursor and not RUN_DIR_PATTERN.match(cursor):
+        return jsonify({"error": "invalid cursor"}), 400
+
+    summaries, next_cursor = run_index.page(cursor, limit)
+    for summary in summaries:
+        summary["created_at"] = run_created_at(summary["run_id"])
+        summary["download_url"] = f"/download-run/{summary['run_id']}.zip"
+    return jsonify({"runs": summaries, "next_cursor": next_cursor})
+
+
+@app.route("/api/runs/<run_id>", methods=["GET"])
+def api_run(run_id: str):
+    """List the artifacts of one run"""
+    if not RUN_DIR_PATTERN.match(run_id) or not os.path.isdir(os.path.join(get_output_dir(), run_id)):
+        return jsonify({"error": "run not found"}), 404
+    artifacts = [
+        {"path": a["path"], "name": a["name"], "size": a["size"], "kind": a["kind"], "url": f"/download/{a['path']}"}
+        for a in run_index.artifacts(run_id)
+    ]
+    return jsonify({"run_id": run_id, "created_at": run_created_at(run_id), "artifacts": artifacts})
+
+
+@app.route("/api/retention", methods=["GET"])
+def api_retention():
+    """Show the retention policy and the report of the last pass"""
+    return jsonify({
+        "enabled": retention_engine.enabled,
+        "policy": retention_engine.policy(),
+        "last_report": retention_engine.last_report
+    })
+
+
+@app.route("/api/retention/run", methods=["POST"])
+def api_retention_run():
+    """Start a retention pass now on the background thread"""
+    if not retention_engine.enabled:
+        return jsonify({"error": "no retention policy configured"}), 400
+    retention_engine.trigger()
+    return jsonify({"status": "scheduled"}), 202
+
+
+RUNS_HTML = """
+<!doctype html>
+<html>
+  <head>
+    <meta charset="utf-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1" />
+    <title>Run History - Azure Inventory</title>
+    <style>
+      body {
+        font-family: system-ui, -apple-system, 'Segoe UI', Roboto, Helvetica, Arial, sans-serif;
+        margin: 0;
+        padding: 40px;
+        background: linear-gradient(135deg, #1e3c72 0%, #2a5298 50%, #0ea5e9 100%);
+        min-height: 100vh;
+      }
+      .container { max-width: 900px; margin: 0 auto; background: white; border-radius: 16px; overflow: hidden; }
+      .header { background: linear-gradient(135deg, #0078d4 0%, #106ebe 100%); color: white; padding: 30px 40px; text-align: center; }
+      .content { padding: 30px 40px; }
+      .run { border: 1px solid #e5e7eb; border-radius: 10px; padding: 15px 20px; margin-bottom: 12px; }
+      .run-title { display: flex; justify-content: space-between; align-items: center; gap: 10px; }
+      .run-name { font-weight: 600; color: #1e293b; cursor: pointer; }
+      .run-meta { color: #64748b; font-size: 0.9rem; }
+      .run-files { margin: 10px 0 0 0; padding-left: 20px; }
+      .run-files a, .back-link a { color: #0078d4; text-decoration: none; }
+      .download-btn { background: #10b981; color: white; padding: 8px 16px; border-radius: 8px; text-decoration: none; font-weight: 600; font-size: 0.85rem; }
+      .more-btn { display: block; margin: 20px auto 0 auto; padding: 10px 24px; border: none; border-radius: 8px; background: #0078d4; color: white; font-weight: 600; cursor: pointer; }
+      .back-link { text-align: center; margin-top: 30px; padding-top: 20px; border-top: 1px solid #e5e7eb; }
+    </style>
+  </head>
+  <body>
+    <div class="container">
+      <div class="header">
+        <h1>🕘 Run History</h1>
+        <p>All retained Azure Resource Inventory runs, newest first</p>
+      </div>
+      <div class="content">
+        <div id="runs"></div>
+        <button id="more" class="more-btn" style="display: none;">Load more runs</button>
+        <div class="back-link">
+          <a href="/outputs">← Back to latest reports</a>
+        </div>
+      </div>
+    </div>
+    <script>
+      let nextCursor = null;
+      const runsDiv = document.getElementById('runs');
+      const moreBtn = document.getElementById('more');
+
+      function formatSize(bytes) {
+        const units = ['B', 'KB', 'MB', 'GB'];
+        let i = 0;
+        while (bytes >= 1024 && i < units.length - 1) { bytes /= 1024; i++; }
+        return bytes.toFixed(i ? 1 : 0) + ' ' + units[i];
+      }
+
+      function escapeHtml(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+      }
+
+      function toggleFiles(runId, runDiv) {
+        const existing = runDiv.querySelector('.run-files');
+        if (existing) { existing.remove(); return; }
+        fetch('/api/runs/' + runId)
+          .then(r => r.json())
+          .then(data => {
+            const list = document.createElement('ul');
+            list.className = 'run-files';
+            list.innerHTML = (data.artifacts || []).map(a =>
+              `<li><a href="${encodeURI(a.url)}">${escapeHtml(a.path.substring(runId.length + 1))}</a> <span class="run-meta">(${formatSize(a.size)})</span></li>`
+            ).join('');
+            runDiv.appendChild(list);
+          });
+      }
+
+      function loadRuns() {
+        moreBtn.disabled = true;
+        const params = new URLSearchParams({ limit: '20' });
+        if (nextCursor) params.set('cursor', nextCursor);
+        fetch('/api/runs?' + params.toString())
+          .then(r => r.json())
+          .then(data => {
+            if (!nextCursor && data.runs.length === 0) {
+              runsDiv.innerHTML = '<p class="run-meta">No runs found yet.</p>';
+            }
+            data.runs.forEach(run => {
+              const runDiv = document.createElement('div');
+              runDiv.className = 'run';
+              const started = run.created_at ? new Date(run.created_at).toLocaleString() : run.run_id;
+              runDiv.innerHTML = `
+                <div class="run-title">
+                  <div>
+                    <div class="run-name">📁 ${run.run_id}</div>
+                    <div class="run-meta">${started} · ${run.artifact_count} file(s) · ${formatSize(run.total_bytes)}</div>
+                  </div>
+                  <a href="${run.download_url}" class="download-btn">🗜️ Download .zip</a>
+                </div>`;
+              runDiv.querySelector('.run-name').addEventListener('click', () => toggleFiles(run.run_id, runDiv));
+              runsDiv.appendChild(runDiv);
+            });
+            nextCursor = data.next_cursor;
+            moreBtn.style.display = nextCursor ? 'block' : 'none';
+            moreBtn.disabled = false;
+          })
+          .catch(() => { moreBtn.disabled = false; });
+      }
+
+      moreBtn.addEventListener('click', loadRuns);
+      loadRuns();
+    </script>
+  </body>
+</html>
+"""
+
+
+@app.route("/runs", methods=["GET"])
+def list_runs():
+    return RUNS_HTML
+
+
 @app.route("/download/<path:filename>", methods=["GET"])
 def download_file(filename: str):
-    from flask import send_from_directory, abort
+    from flask import abort
 
     output_dir = get_output_dir()
     safe_path = os.path.normpath(filename)
@@ -625,12 +938,61 @@ def download_file(filename: str):
         return abort(400)
 
     file_path = os.path.join(output_dir, safe_path)
-    if not os.path.exists(file_path):
+    artifact = run_index.find_artifact(safe_path.replace(os.sep, "/"))
+    if artifact and artifact.get("stored") == "blob":
+        # Content-addressed: the file may live only in the artifact store
+        file_path = resolve_artifact_path(artifact)
+    if not os.path.isfile(file_path):
+        return abort(404)
+
+    # Use the content hash from the run's manifest while the file still matches it
+    etag = artifact["sha256"] if artifact and matches_manifest(file_path, artifact) else None
+
+    return send_artifact(file_path, etag=etag, download_name=os.path.basename(safe_path))
+
+
+@app.route("/download-run/<run_id>.zip", methods=["GET"])
+def download_run(run_id: str):
+    """Stream every artifact of one run folder as a single ZIP"""
+    from flask import abort
+
+    output_dir = get_output_dir()
+    if not RUN_DIR_PATTERN.match(run_id) or not os.path.isdir(os.path.join(output_dir, run_id)):
         return abort(404)
 
-    directory = os.path.dirname(file_path) or output_dir
-    basename = os.path.basename(file_path)
-    return send_from_directory(directory, basename, as_attachment=True)
+    files = run_archive_files(run_id, run_index.artifacts(run_id), resolve_artifact_path)
+    response = Response(stream_zip(files), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f"attachment; filename=ari-{run_id}.zip"
+    return response
+
+
+def send_artifact(file_path, etag=None, download_name=None):
+    """Send a report artifact with validators so downloads resume and cache
+
+    The strong ETag is derived from the file's size and mtime (or is the
+    content hash passed by the caller), so it is identical on every replica
+    that mounts the share. Werkzeug then answers If-None-Match and
+    If-Modified-Since with 304 and Range/If-Range with 206, letting an
+    interrupted download of a large workbook resume where it stopped.
+    Responses are private (reports describe the tenant, so shared proxies
+    must not keep them) and the browser must revalidate before reuse.
+    """
+    from flask import send_file
+
+    stat = os.stat(file_path)
+    if etag is None:
+        etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    response = send_file(
+        file_path,
+        as_attachment=True,
+        download_name=download_name or os.path.basename(file_path),
+        etag=etag,
+        last_modified=stat.st_mtime,
+        conditional=True
+    )
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 
 def enhance_device_code_output(line):
@@ -1078,8 +1440,8 @@ def cli_device_login():
     cli_script = generate_cli_device_login_script(output_dir, tenant, subscription)
     
     jobs[job_id] = {
-        'status': 'running',
-        'output': '',
+        'status': 'queued',
+        'output': JobOutput(),
         'created_at': datetime.now(),
         'process': None
     }
@@ -1087,10 +1449,9 @@ def cli_device_login():
     # Save job to disk for persistence
     save_job(job_id, jobs[job_id])
     
-    # Start CLI job
-    thread = threading.Thread(target=run_cli_job, args=(job_id, cli_script))
-    thread.daemon = True
-    thread.start()
+    # Queue CLI job - it starts as soon as a worker slot and enough memory are free
+    position = job_scheduler.submit(job_id, run_cli_job, job_id, cli_script)
+    print(f"[JOB {job_id}] Queued at position {position}")
     
     return '''<!doctype html>
 <html>
@@ -1201,198 +1562,251 @@ def cli_device_login():
       <script>
         const jobId = ''' + f"'{job_id}'" + ''';
         let checkCount = 0;
-        const maxChecks = 1350; // 45 minutes (1350 * 2 seconds) - Enhanced error detection prevents hanging
+        const maxRuntimeMs = 45 * 60 * 1000; // 45 minutes - Enhanced error detection prevents hanging
+        const pageStartTime = Date.now();
         let lastOutputLength = 0;
+        let outputOffset = 0; // Server-side offset of the output received so far
+        let fullOutput = ''; // Accumulated output used for progress detection
         let processingStartTime = null;
         let sessionExpiredHandled = false; // Flag to prevent duplicate restart buttons
         let interval = null; // Declare interval variable early
+        let eventSource = null;
         
-        function checkOutput() {
+        function stopUpdates() {
+          if (interval) clearInterval(interval);
+          if (eventSource) eventSource.close();
+        }
+        
+        function handleUpdate(data) {
           // Skip if session expired is already being handled
           if (sessionExpiredHandled) {
-            if (interval) clearInterval(interval);
+            stopUpdates();
             return;
           }
           
           checkCount++;
-          fetch(`/job-status/${jobId}`)
-            .then(response => response.json())
-            .then(data => {
-              // Double-check the flag after async operation
-              if (sessionExpiredHandled) {
-                if (interval) clearInterval(interval);
-                return;
-              }
-              
-              console.log('Job status:', data.status, 'Check:', checkCount);
-              const outputElement = document.getElementById('output');
-              const currentOutput = data.output || '';
-              outputElement.innerHTML = currentOutput;
-              outputElement.scrollTop = outputElement.scrollHeight;
-              
-              // Track output changes for heartbeat
-              const currentOutputLength = currentOutput.length;
-              if (currentOutputLength > lastOutputLength) {
-                lastOutputLength = currentOutputLength;
-              }
-              
-              // Update status message based on progress
-              const statusElement = document.querySelector('.status');
-              const output = data.output || '';
-              
-              if (output.includes('Azure Resource Inventory execution') || 
-                  output.includes('Starting Invoke-ARI') || 
-                  output.includes('Connected to Azure successfully') ||
-                  output.includes('Attempting ARI execution') ||
-                  output.includes('Gathering VM Extra Details') ||
-                  output.includes('Running API Inventory')) {
-                statusElement.className = 'status processing';
-                
-                // Track when processing started
-                if (!processingStartTime) {
-                  processingStartTime = Date.now();
-                }
-                
-                // Calculate elapsed time
-                const elapsed = Math.floor((Date.now() - processingStartTime) / 1000);
-                const minutes = Math.floor(elapsed / 60);
-                const seconds = elapsed % 60;
-                
-                // Show progress based on what's happening
-                let progressMsg = '🔍 Processing Azure Resource Inventory';
-                if (output.includes('Running API Inventory')) {
-                  progressMsg = '📊 Scanning Azure resources and generating reports';
-                } else if (output.includes('Gathering VM Extra Details')) {
-                  progressMsg = '🖥️ Gathering detailed VM information';
-                } else if (output.includes('Extracting Subscriptions')) {
-                  progressMsg = '📋 Extracting subscription details';
-                }
-                
-                // Add heartbeat indicator if no output for a while
-                let heartbeat = '';
-                if (currentOutputLength === lastOutputLength && checkCount > 10) {
-                  const dots = '.'.repeat((checkCount % 4) + 1);
-                  heartbeat = ` <span style="color: #10b981;">Processing${dots}</span>`;
-                }
-                
-                statusElement.innerHTML = `<span class="spinner"></span>${progressMsg}...${heartbeat} <br><small style="opacity: 0.7;">Running for ${minutes}m ${seconds}s - Large environments may take 10-30 minutes</small>`;
-              } else if (output.includes('completed successfully') || data.status === 'completed') {
-                statusElement.className = 'status completed';
-                statusElement.innerHTML = '✅ Azure Resource Inventory completed successfully!';
-              } else if (output.includes('Failed to resolve tenant') || 
-                        output.includes('ERROR: Failed to authenticate') ||
-                        output.includes('ERROR: Failed to set subscription') ||
-                        output.includes('ERROR: Tenant ID is required') ||
-                        output.includes('Process failed with exit code')) {
-                statusElement.className = 'status';
-                statusElement.style.background = '#fef2f2';
-                statusElement.style.borderLeftColor = '#ef4444';
-                statusElement.style.color = '#991b1b';
-                
-                // Provide specific error messages
-                if (output.includes('Failed to authenticate with the provided Tenant ID')) {
-                  statusElement.innerHTML = '❌ Authentication failed - Invalid Tenant ID. Please verify your Tenant ID and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
-                } else if (output.includes('Failed to set subscription')) {
-                  statusElement.innerHTML = '❌ Authentication failed - Invalid or inaccessible Subscription ID. Please verify your Subscription ID and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
-                } else {
-                  statusElement.innerHTML = '❌ Authentication failed - Please check your Azure credentials and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
-                }
-              } else if (output.includes('Authentication completed') || 
-                        output.includes('Verifying authentication') ||
-                        output.includes('Current Subscription:') ||
-                        output.includes('Already authenticated')) {
-                statusElement.className = 'status processing';
-                statusElement.innerHTML = '<span class="spinner"></span>🔐 Authentication successful! Initializing Azure Resource Inventory...';
+
+          console.log('Job status:', data.status, 'Check:', checkCount);
+          const outputElement = document.getElementById('output');
+          if (data.reset) {
+            outputElement.innerHTML = '';
+            fullOutput = '';
+          }
+          // Only the output appended since our last offset is sent
+          const newOutput = data.output || '';
+          if (newOutput) {
+            outputElement.insertAdjacentHTML('beforeend', newOutput);
+            outputElement.scrollTop = outputElement.scrollHeight;
+            fullOutput += newOutput;
+          }
+          outputOffset = data.offset || 0;
+          
+          // Track output changes for heartbeat
+          const currentOutputLength = fullOutput.length;
+          if (currentOutputLength > lastOutputLength) {
+            lastOutputLength = currentOutputLength;
+          }
+          
+          // Update status message based on progress
+          const statusElement = document.querySelector('.status');
+          const output = fullOutput;
+          
+          if (data.status === 'queued') {
+            statusElement.className = 'status processing';
+            const position = data.queue_position ? ` (position ${data.queue_position})` : '';
+            statusElement.innerHTML = `<span class="spinner"></span>⏳ Waiting for a free worker${position}... Your inventory will start automatically.`;
+          } else if (output.includes('Azure Resource Inventory execution') || 
+              output.includes('Starting Invoke-ARI') || 
+              output.includes('Connected to Azure successfully') ||
+              output.includes('Attempting ARI execution') ||
+              output.includes('Gathering VM Extra Details') ||
+              output.includes('Running API Inventory')) {
+            statusElement.className = 'status processing';
+            
+            // Track when processing started
+            if (!processingStartTime) {
+              processingStartTime = Date.now();
+            }
+            
+            // Calculate elapsed time
+            const elapsed = Math.floor((Date.now() - processingStartTime) / 1000);
+            const minutes = Math.floor(elapsed / 60);
+            const seconds = elapsed % 60;
+            
+            // Show progress based on what's happening
+            let progressMsg = '🔍 Processing Azure Resource Inventory';
+            if (output.includes('Running API Inventory')) {
+              progressMsg = '📊 Scanning Azure resources and generating reports';
+            } else if (output.includes('Gathering VM Extra Details')) {
+              progressMsg = '🖥️ Gathering detailed VM information';
+            } else if (output.includes('Extracting Subscriptions')) {
+              progressMsg = '📋 Extracting subscription details';
+            }
+            
+            // Add heartbeat indicator if no output for a while
+            let heartbeat = '';
+            if (currentOutputLength === lastOutputLength && checkCount > 10) {
+              const dots = '.'.repeat((checkCount % 4) + 1);
+              heartbeat = ` <span style="color: #10b981;">Processing${dots}</span>`;
+            }
+            
+            statusElement.innerHTML = `<span class="spinner"></span>${progressMsg}...${heartbeat} <br><small style="opacity: 0.7;">Running for ${minutes}m ${seconds}s - Large environments may take 10-30 minutes</small>`;
+          } else if (output.includes('completed successfully') || data.status === 'completed') {
+            statusElement.className = 'status completed';
+            statusElement.innerHTML = '✅ Azure Resource Inventory completed successfully!';
+          } else if (output.includes('Failed to resolve tenant') || 
+                    output.includes('ERROR: Failed to authenticate') ||
+                    output.includes('ERROR: Failed to set subscription') ||
+                    output.includes('ERROR: Tenant ID is required') ||
+                    output.includes('Process failed with exit code')) {
+            statusElement.className = 'status';
+            statusElement.style.background = '#fef2f2';
+            statusElement.style.borderLeftColor = '#ef4444';
+            statusElement.style.color = '#991b1b';
+            
+            // Provide specific error messages
+            if (output.includes('Failed to authenticate with the provided Tenant ID')) {
+              statusElement.innerHTML = '❌ Authentication failed - Invalid Tenant ID. Please verify your Tenant ID and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
+            } else if (output.includes('Failed to set subscription')) {
+              statusElement.innerHTML = '❌ Authentication failed - Invalid or inaccessible Subscription ID. Please verify your Subscription ID and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
+            } else {
+              statusElement.innerHTML = '❌ Authentication failed - Please check your Azure credentials and <a href="/cli-device-login" style="color: #991b1b; font-weight: bold; text-decoration: underline;">try again</a>.';
+            }
+          } else if (output.includes('Authentication completed') || 
+                    output.includes('Verifying authentication') ||
+                    output.includes('Current Subscription:') ||
+                    output.includes('Already authenticated')) {
+            statusElement.className = 'status processing';
+            statusElement.innerHTML = '<span class="spinner"></span>🔐 Authentication successful! Initializing Azure Resource Inventory...';
+          }
+          
+          if (data.status === 'completed') {
+            stopUpdates();
+            console.log('Job completed, redirecting to outputs...');
+            setTimeout(() => {
+              window.location.href = '/outputs';
+            }, 2000);
+          } else if (data.status === 'not_found') {
+            sessionExpiredHandled = true; // Set flag immediately
+            stopUpdates(); // Stop updates immediately
+            
+            console.log('Job not found - likely expired or container restarted');
+            const statusElement = document.querySelector('.status');
+            statusElement.className = 'status';
+            statusElement.style.background = '#fff3cd';
+            statusElement.style.borderLeftColor = '#ffc107';
+            statusElement.style.color = '#856404';
+            statusElement.innerHTML = '⚠️ Session expired. Please start a new Azure Resource Inventory scan.';
+            // Show single restart button after delay
+            setTimeout(() => {
+              // Only add button if it doesn't already exist
+              if (!document.querySelector('.restart-scan-btn')) {
+                const restartBtn = document.createElement('button');
+                restartBtn.className = 'restart-scan-btn';
+                restartBtn.innerHTML = '🔄 Start New Scan';
+                restartBtn.style.cssText = 'margin-top: 15px; background: #0078d4; color: white; border: none; padding: 12px 24px; border-radius: 8px; cursor: pointer; font-weight: bold; transition: all 0.3s ease;';
+                restartBtn.onmouseover = () => restartBtn.style.backgroundColor = '#106ebe';
+                restartBtn.onmouseout = () => restartBtn.style.backgroundColor = '#0078d4';
+                restartBtn.onclick = () => window.location.href = '/';
+                statusElement.appendChild(document.createElement('br'));
+                statusElement.appendChild(restartBtn);
               }
-              
-              if (data.status === 'completed') {
-                clearInterval(interval);
-                console.log('Job completed, redirecting to outputs...');
-                setTimeout(() => {
-                  window.location.href = '/outputs';
-                }, 2000);
-              } else if (data.status === 'not_found') {
-                sessionExpiredHandled = true; // Set flag immediately
-                clearInterval(interval); // Clear interval immediately
-                
-                console.log('Job not found - likely expired or container restarted');
-                const statusElement = document.querySelector('.status');
-                statusElement.className = 'status';
-                statusElement.style.background = '#fff3cd';
-                statusElement.style.borderLeftColor = '#ffc107';
-                statusElement.style.color = '#856404';
-                statusElement.innerHTML = '⚠️ Session expired. Please start a new Azure Resource Inventory scan.';
-                // Show single restart button after delay
-                setTimeout(() => {
-                  // Only add button if it doesn't already exist
-                  if (!document.querySelector('.restart-scan-btn')) {
-                    const restartBtn = document.createElement('button');
-                    restartBtn.className = 'restart-scan-btn';
-                    restartBtn.innerHTML = '🔄 Start New Scan';
-                    restartBtn.style.cssText = 'margin-top: 15px; background: #0078d4; color: white; border: none; padding: 12px 24px; border-radius: 8px; cursor: pointer; font-weight: bold; transition: all 0.3s ease;';
-                    restartBtn.onmouseover = () => restartBtn.style.backgroundColor = '#106ebe';
-                    restartBtn.onmouseout = () => restartBtn.style.backgroundColor = '#0078d4';
-                    restartBtn.onclick = () => window.location.href = '/';
-                    statusElement.appendChild(document.createElement('br'));
-                    statusElement.appendChild(restartBtn);
+            }, 500);
+          } else if (data.status === 'failed' || Date.now() - pageStartTime >= maxRuntimeMs) {
+            stopUpdates();
+            const spinner = document.querySelector('.spinner');
+            if (spinner) spinner.style.display = 'none';
+            
+            // Add a delay before checking files to ensure they're fully written
+            // This prevents race condition where frontend checks before files are flushed
+            setTimeout(() => {
+              // Check if any reports were generated before showing navigation
+              fetch('/debug-files')
+                .then(response => response.text())
+                .then(debugData => {
+                  console.log('Debug data:', debugData);
+                  const hasFiles = debugData.includes('"filtered_files": [') && !debugData.includes('"filtered_files": []');
+                  
+                  if (hasFiles) {
+                    // Show success navigation if files exist
+                    document.getElementById('manual-nav').innerHTML = `
+                      <p style="margin: 0 0 10px 0; color: #2e7d32; font-weight: 500;">🎉 Reports generated successfully!</p>
+                      <a href="/outputs" style="display: inline-block; background: #4caf50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">📁 View Generated Reports</a>
+                      <span style="margin: 0 10px;">|</span>
+                      <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
+                    `;
+                    document.getElementById('manual-nav').style.display = 'block';
+                  } else {
+                    // Show error navigation if no files exist
+                    document.getElementById('manual-nav').innerHTML = `
+                      <p style="margin: 0 0 10px 0; color: #d32f2f; font-weight: 500;">❌ Process failed - No reports were generated</p>
+                      <a href="/cli-device-login" style="display: inline-block; background: #dc2626; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🔄 Try Again</a>
+                      <span style="margin: 0 10px;">|</span>
+                      <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
+                    `;
+                    document.getElementById('manual-nav').style.display = 'block';
                   }
-                }, 500);
-              } else if (data.status === 'failed' || checkCount >= maxChecks) {
-                clearInterval(interval);
-                const spinner = document.querySelector('.spinner');
-                if (spinner) spinner.style.display = 'none';
-                
-                // Add a delay before checking files to ensure they're fully written
-                // This prevents race condition where frontend checks before files are flushed
-                setTimeout(() => {
-                  // Check if any reports were generated before showing navigation
-                  fetch('/debug-files')
-                    .then(response => response.text())
-                    .then(debugData => {
-                      console.log('Debug data:', debugData);
-                      const hasFiles = debugData.includes('"filtered_files": [') && !debugData.includes('"filtered_files": []');
-                      
-                      if (hasFiles) {
-                        // Show success navigation if files exist
-                        document.getElementById('manual-nav').innerHTML = `
-                          <p style="margin: 0 0 10px 0; color: #2e7d32; font-weight: 500;">🎉 Reports generated successfully!</p>
-                          <a href="/outputs" style="display: inline-block; background: #4caf50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">📁 View Generated Reports</a>
-                          <span style="margin: 0 10px;">|</span>
-                          <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
-                        `;
-                        document.getElementById('manual-nav').style.display = 'block';
-                      } else {
-                        // Show error navigation if no files exist
-                        document.getElementById('manual-nav').innerHTML = `
-                          <p style="margin: 0 0 10px 0; color: #d32f2f; font-weight: 500;">❌ Process failed - No reports were generated</p>
-                          <a href="/cli-device-login" style="display: inline-block; background: #dc2626; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🔄 Try Again</a>
-                          <span style="margin: 0 10px;">|</span>
-                          <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
-                        `;
-                        document.getElementById('manual-nav').style.display = 'block';
-                      }
-                    })
-                    .catch(error => {
-                      console.error('Error checking files:', error);
-                      // Fallback: just show home button
-                      document.getElementById('manual-nav').innerHTML = `
-                        <p style="margin: 0 0 10px 0; color: #d32f2f; font-weight: 500;">❌ Process encountered errors</p>
-                        <a href="/cli-device-login" style="display: inline-block; background: #dc2626; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🔄 Try Again</a>
-                        <span style="margin: 0 10px;">|</span>
-                        <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
-                      `;
-                      document.getElementById('manual-nav').style.display = 'block';
-                    });
-                }, 3000); // Wait 3 seconds for files to be fully written
-              }
-            })
+                })
+                .catch(error => {
+                  console.error('Error checking files:', error);
+                  // Fallback: just show home button
+                  document.getElementById('manual-nav').innerHTML = `
+                    <p style="margin: 0 0 10px 0; color: #d32f2f; font-weight: 500;">❌ Process encountered errors</p>
+                    <a href="/cli-device-login" style="display: inline-block; background: #dc2626; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🔄 Try Again</a>
+                    <span style="margin: 0 10px;">|</span>
+                    <a href="/" style="display: inline-block; background: #2196f3; color: white; padding: 10px 20px; text-decoration: none; border-radius: 6px; font-weight: bold;">🏠 Back to Home</a>
+                  `;
+                  document.getElementById('manual-nav').style.display = 'block';
+                });
+            }, 3000); // Wait 3 seconds for files to be fully written
+          }
+        }
+        
+        function checkOutput() {
+          // Skip if session expired is already being handled
+          if (sessionExpiredHandled) {
+            stopUpdates();
+            return;
+          }
+          
+          fetch(`/job-status/${jobId}?offset=${outputOffset}`)
+            .then(response => response.json())
+            .then(handleUpdate)
             .catch(error => {
               console.error('Error checking job status:', error);
             });
         }
         
-        interval = setInterval(checkOutput, 2000);
-        checkOutput();
+        function startPolling() {
+          if (!interval) {
+            interval = setInterval(checkOutput, 2000);
+            checkOutput();
+          }
+        }
+        
+        if (window.EventSource) {
+          // Output is pushed over Server-Sent Events; after a dropped connection the
+          // browser reconnects with Last-Event-ID and only receives what it missed
+          let currentStatus = 'running';
+          eventSource = new EventSource(`/job-stream/${jobId}`);
+          eventSource.addEventListener('output', event => {
+            handleUpdate({ status: currentStatus, output: JSON.parse(event.data), offset: Number(event.lastEventId) });
+          });
+          eventSource.addEventListener('status', event => {
+            const data = JSON.parse(event.data);
+            currentStatus = data.status;
+            handleUpdate(data);
+          });
+          eventSource.onerror = () => {
+            // Fall back to polling if the browser gives up on the stream
+            if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+              eventSource = null;
+              startPolling();
+            }
+          };
+        } else {
+          startPolling();
+        }
       </script>
     </div>
   </body>
@@ -1401,39 +1815,123 @@ def cli_device_login():
 
 @app.route("/job-status/<job_id>")
 def get_job_status(job_id):
-    """Get the status and output of a running job"""
-    # Try to get from memory first
+    """Get the status and output of a running job
+
+    Pass ``?offset=N`` (the byte ``offset`` returned by the previous call) to
+    receive only the output appended since then. ``reset`` is set when the
+    offset no longer matches the stored output and the full output is sent.
+    """
+    # Served from memory, or paged in (with its output) from the job store
     job = jobs.get(job_id)
     
-    # If not in memory, try loading from disk
-    if not job:
-        job = load_job(job_id)
-        if job:
-            jobs[job_id] = job  # Restore to memory
-    
     if not job:
         # Instead of 404, return a "not found" status to prevent log spam
         return jsonify({
             'status': 'not_found',
             'output': 'Job not found. It may have expired or the container was restarted.',
+            'offset': 0,
+            'reset': True,
             'created_at': None
         }), 200
     
+    output = job['output']
+    size = len(output)
+    offset = request.args.get('offset', type=int)
+    reset = offset is None or offset < 0 or offset > size
+    
     return jsonify({
         'status': job['status'],
-        'output': job['output'],
-        'created_at': job['created_at'].isoformat() if 'created_at' in job else None
+        'output': output.read(0 if reset else offset, size),
+        'offset': size,
+        'reset': reset,
+        'queue_position': job_scheduler.queue_position(job_id),
+        'created_at': job['created_at'].isoformat() if job.get('created_at') else None
+    })
+
+
+@app.route("/job-stream/<job_id>")
+def job_stream(job_id):
+    """Stream a job's output as Server-Sent Events
+
+    ``output`` events carry the output appended since the previous event and
+    use the resulting output offset as their event id, so a reconnecting
+    browser resumes from ``Last-Event-ID`` and only receives what it missed.
+    ``status`` events report the job status and double as a heartbeat while
+    the job is quiet; the stream ends once the job is no longer active.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('offset') or '0'
+    try:
+        start_offset = int(last_event_id)
+    except ValueError:
+        start_offset = 0
+
+    def format_event(event, data, event_id):
+        return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def generate():
+        offset = start_offset
+        sent_status = None
+        while True:
+            job = jobs.get(job_id)
+            if not job:
+                yield format_event('status', {
+                    'status': 'not_found',
+                    'output': 'Job not found. It may have expired or the container was restarted.',
+                    'offset': 0,
+                    'reset': True
+                }, 0)
+                return
+
+            # Wait for new output or a status change; time out for a heartbeat
+            condition = get_job_condition(job_id)
+            with condition:
+                if (len(job['output']) == offset and job['status'] == sent_status
+                        and job['status'] in ACTIVE_JOB_STATUSES):
+                    condition.wait(timeout=JOB_STREAM_HEARTBEAT_SECONDS)
+                size = len(job['output'])
+                status = job['status']
+
+            sent_output = False
+            if offset > size:
+                # Client offset does not match this output - resend everything
+                offset = size
+                sent_status = status
+                sent_output = True
+                yield format_event('status', {'status': status, 'output': job['output'].read(0, size), 'offset': offset, 'reset': True,
+                                              'queue_position': job_scheduler.queue_position(job_id)}, offset)
+            elif size > offset:
+                chunk = job['output'].read(offset, size)
+                offset = size
+                sent_output = True
+                yield format_event('output', chunk, offset)
+            if status != sent_status or not sent_output:
+                sent_status = status
+                yield format_event('status', {'status': status, 'output': '', 'offset': offset,
+                                              'queue_position': job_scheduler.queue_position(job_id)}, offset)
+            if status not in ACTIVE_JOB_STATUSES:
+                return
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
 
 
 def generate_cli_device_login_script(output_dir, tenant, subscription):
     """Generate bash script using Azure CLI for device login and ARI execution"""
+    # The cleanup addresses the share by share-relative paths
+    share_path = share_relative_path(output_dir)
+    keep_run_argument = f" --keep \"{share_path}/$ARI_RUN_ID\"" if share_path is not None else ""
+    account_scope = f" --subscription '{subscription}'" if subscription else ""
     script_parts = [
         "#!/bin/bash",
         "set -e",
         f"OUT_DIR='{output_dir}'",
         "mkdir -p \"$OUT_DIR\"",
         "",
+        "# Per-job scratch directory (set by run_cli_job) keeps concurrent jobs apart",
+        "ARI_JOB_DIR=\"${ARI_JOB_DIR:-$(mktemp -d)}\"",
+        "",
         "echo '🔧 AZURE CLI DEVICE LOGIN & ARI EXECUTION'",
         "echo '======================================='",
         "",
@@ -1479,17 +1977,17 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
     
     script_parts.extend([
         "",
-        "# Verify authentication",
+        "# Verify authentication over the in-process ARM client (no extra az/jq processes)",
         "echo 'Verifying authentication...'", 
-        "ACCOUNT_INFO=$(az account show)",
-        "echo \"$ACCOUNT_INFO\"",
-        "",
-        "# Extract subscription and tenant info for PowerShell",
-        "CURRENT_SUBSCRIPTION=$(echo \"$ACCOUNT_INFO\" | jq -r '.id // empty')",
-        "CURRENT_TENANT=$(echo \"$ACCOUNT_INFO\" | jq -r '.tenantId // empty')",
+        f"if ! ACCOUNT_INFO=$(python3 /app/app/cli_inventory.py --check --shell{account_scope}); then",
+        "    echo \"$ACCOUNT_INFO\"",
+        "    echo '❌ ERROR: The signed-in account cannot read the selected subscription.'",
+        "    exit 1",
+        "fi",
+        "eval \"$ACCOUNT_INFO\"",
         "",
         "echo '✅ Azure CLI authentication completed!'",
-        "echo \"📋 Current Subscription: $CURRENT_SUBSCRIPTION\"",
+        "echo \"📋 Current Subscription: $CURRENT_SUBSCRIPTION_NAME ($CURRENT_SUBSCRIPTION)\"",
         "echo \"🏢 Current Tenant: $CURRENT_TENANT\"",
         "",
         "echo 'Starting Azure Resource Inventory execution...'",
@@ -1533,6 +2031,15 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
         "fi",
         "echo ''",
         "",
+        "# Reserve this job's run folder before the cleanup so the cleanup can keep it",
+        "while true; do",
+        "    ARI_RUN_ID=$(date +%Y%m%d_%H%M%S)",
+        "    mkdir \"$OUT_DIR/$ARI_RUN_ID\" 2>/dev/null && break",
+        "    sleep 1",
+        "done",
+        "echo \"$ARI_RUN_ID\" > \"$ARI_JOB_DIR/run_id\"",
+        "export ARI_RUN_ID",
+        "",
         "# Check if all three required variables are set",
         "if [ -n \"${AZURE_STORAGE_ACCOUNT:-}\" ] && [ -n \"${AZURE_STORAGE_KEY:-}\" ] && [ -n \"${AZURE_FILE_SHARE:-}\" ]; then",
         "    echo '✅ All cleanup environment variables are configured'",
@@ -1543,16 +2050,14 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
         "    echo '🔄 Running mandatory file share cleanup...'",
         "    echo ''",
         "    ",
-        "    # Export variables explicitly for PowerShell",
+        "    # Export variables explicitly for the cleanup engine (the key is never passed on the command line)",
         "    export AZURE_STORAGE_ACCOUNT",
         "    export AZURE_STORAGE_KEY",
         "    export AZURE_FILE_SHARE",
         "    ",
-        "    # Run cleanup script with explicit variable passing (non-blocking)",
-        "    if pwsh -NoProfile -ExecutionPolicy Bypass -File /app/powershell/clear-azure-fileshare.ps1 \\",
-        "        -StorageAccountName \"$AZURE_STORAGE_ACCOUNT\" \\",
-        "        -StorageAccountKey \"$AZURE_STORAGE_KEY\" \\",
-        "        -FileShareName \"$AZURE_FILE_SHARE\"; then",
+        "    # Parallel cleanup over the Azure Files REST API (non-blocking). Files of",
+        "    # jobs still running are newer than ARI_CLEANUP_KEEP_NEWER_THAN and are kept",
+        f"    if python3 /app/app/fileshare_cleanup.py{keep_run_argument}; then",
         "        ",
         "        echo ''",
         "        echo '✅ Cleanup completed successfully'",
@@ -1610,7 +2115,7 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
         "echo ''",
         "",
         "# Create PowerShell script file with robust error handling",
-        "cat > /tmp/run_ari.ps1 << 'EOF'",
+        "cat > \"$ARI_JOB_DIR/run_ari.ps1\" << 'EOF'",
         "$ErrorActionPreference = 'Stop'",
         "",
         "Write-Host 'Setting up Azure Resource Inventory module...' -ForegroundColor Green",
@@ -1736,12 +2241,31 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
     script_parts.extend([
       "",
       f"$baseDir = '{output_dir}'",
-      "$runId = Get-Date -Format 'yyyyMMdd_HHmmss'",
-      "$reportDir = Join-Path $baseDir $runId",
-      "$reportName = 'AzureResourceInventory_' + $runId",
       "",
       "Write-Host 'Creating output directory...' -ForegroundColor Yellow",
-      "New-Item -Path $reportDir -ItemType Directory -Force | Out-Null",
+      "# Creating the run folder without -Force fails if it already exists, so two",
+      "# jobs started in the same second never share a run folder or its ReportCache",
+      "New-Item -Path $baseDir -ItemType Directory -Force | Out-Null",
+      "if ($env:ARI_RUN_ID) {",
+      "    # Reserved by the shell script before the share cleanup",
+      "    $runId = $env:ARI_RUN_ID",
+      "    $reportDir = Join-Path $baseDir $runId",
+      "    New-Item -Path $reportDir -ItemType Directory -Force | Out-Null",
+      "} else {",
+      "    while ($true) {",
+      "        $runId = Get-Date -Format 'yyyyMMdd_HHmmss'",
+      "        $reportDir = Join-Path $baseDir $runId",
+      "        try {",
+      "            New-Item -Path $reportDir -ItemType Directory -ErrorAction Stop | Out-Null",
+      "            break",
+      "        } catch {",
+      "            Start-Sleep -Seconds 1",
+      "        }",
+      "    }",
+      "}",
+      "$reportName = 'AzureResourceInventory_' + $runId",
+      "# Tell the web app which run folder this job writes (used for its manifest)",
+      "if ($env:ARI_JOB_DIR) { Set-Content -Path (Join-Path $env:ARI_JOB_DIR 'run_id') -Value $runId }",
         "",
         "Write-Host 'Starting Invoke-ARI execution...' -ForegroundColor Yellow",
         "Write-Host \"Report Directory: $reportDir\" -ForegroundColor Cyan",
@@ -1893,7 +2417,7 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
         "",
         "# Execute the PowerShell script with verbose output",
         "echo 'Executing PowerShell script...'",
-        "pwsh -NoProfile -ExecutionPolicy Bypass -File /tmp/run_ari.ps1",
+        "pwsh -NoProfile -ExecutionPolicy Bypass -File \"$ARI_JOB_DIR/run_ari.ps1\"",
         "",
         "echo 'Process completed! Check the outputs directory for your reports.'"
     ])
@@ -1901,15 +2425,27 @@ def generate_cli_device_login_script(output_dir, tenant, subscription):
     return "\n".join(script_parts)
 
 
+def read_job_run_id(work_dir):
+    """Return the run folder name the job's PowerShell script recorded, if any"""
+    try:
+        with open(os.path.join(work_dir, "run_id"), encoding="utf-8-sig") as f:
+            run_id = f.read().strip()
+    except OSError:
+        return None
+    return run_id if RUN_DIR_PATTERN.match(run_id) else None
+
+
 def run_cli_job(job_id, script):
     """Run Azure CLI script with enhanced device code formatting"""
     try:
         print(f"[JOB {job_id}] Starting Azure CLI device login process...")
-        jobs[job_id]['output'] += "Starting Azure CLI device login process...<br>"
+        set_job_status(job_id, 'running')
+        append_job_output(job_id, "Starting Azure CLI device login process...<br>")
         save_job(job_id, jobs[job_id])  # Save after update
         
-        # Write script to file
-        script_file = "/tmp/cli_device_login.sh"
+        # Write script to the job's private work directory
+        work_dir = get_job_work_dir(job_id)
+        script_file = os.path.join(work_dir, "cli_device_login.sh")
         with open(script_file, 'w') as f:
             f.write(script)
         os.chmod(script_file, 0o755)
@@ -1919,6 +2455,17 @@ def run_cli_job(job_id, script):
         # Explicitly pass environment variables to subprocess
         env = os.environ.copy()  # Copy all current env vars
         
+        # Isolate scripts, temp files and Azure logins from other running jobs
+        env['ARI_JOB_DIR'] = work_dir
+        env['TMPDIR'] = os.path.join(work_dir, "tmp")
+        env['AZURE_CONFIG_DIR'] = os.path.join(work_dir, "azure")
+        env['HOME'] = os.path.join(work_dir, "home")
+        # The share cleanup keeps anything written since the oldest active job
+        # was created (minus clock skew), including jobs admitted after this one
+        oldest_active = active_jobs_since()
+        if oldest_active:
+            env['ARI_CLEANUP_KEEP_NEWER_THAN'] = str(int(oldest_active.timestamp()) - CLEANUP_CLOCK_SKEW_SECONDS)
+        
         # Ensure cleanup variables are present and log them
         if 'AZURE_STORAGE_ACCOUNT' in env:
             print(f"[JOB {job_id}] ✓ AZURE_STORAGE_ACCOUNT = {env['AZURE_STORAGE_ACCOUNT']}")
@@ -1952,7 +2499,7 @@ def run_cli_job(job_id, script):
                 
                 # Enhance device code formatting
                 enhanced_line = enhance_device_code_output(line)
-                jobs[job_id]['output'] += enhanced_line
+                append_job_output(job_id, enhanced_line)
                 
                 # Save to disk every 10 seconds to avoid too many writes
                 current_time = time.time()
@@ -1968,30 +2515,62 @@ def run_cli_job(job_id, script):
         # Add a small delay to ensure files are fully written to disk
         # This prevents race condition where frontend checks before files are flushed
         time.sleep(2)
+        # The script records the run folder it created; describe it once in a
+        # manifest so listings and downloads never have to walk it again
+        run_id = read_job_run_id(work_dir)
+        if run_id:
+            try:
+                manifest = build_manifest(get_output_dir(), run_id)
+                if artifact_store:
+                    artifact_store.mark_manifest(manifest)
+                write_manifest(get_output_dir(), run_id, manifest)
+                print(f"[JOB {job_id}] Wrote manifest for run {run_id} ({len(manifest['artifacts'])} artifacts)")
+                if artifact_store:
+                    saved_bytes = artifact_store.ingest_run(get_output_dir(), manifest)
+                    if any(a.get("stored") == "missing" for a in manifest["artifacts"]):
+                        write_manifest(get_output_dir(), run_id, manifest)
+                    print(f"[JOB {job_id}] Moved run {run_id} into the artifact store ({saved_bytes} bytes deduplicated)")
+            except OSError as e:
+                print(f"[JOB {job_id}] Could not write manifest for run {run_id}: {e}")
+        if artifact_store:
+            # The share cleanup at the start of the script deleted old run
+            # folders, manifests included, without releasing their blobs
+            try:
+                deleted, freed_bytes = artifact_store.sweep(get_output_dir())
+                if deleted:
+                    print(f"[JOB {job_id}] Removed {deleted} orphaned blob(s) from the artifact store "
+                          f"({freed_bytes} bytes)")
+            except OSError as e:
+                print(f"[JOB {job_id}] Could not sweep the artifact store: {e}")
+        # The run folder is complete; make /outputs pick it up immediately
+        run_index.invalidate()
         
         if process.returncode == 0:
             print(f"[JOB {job_id}] SUCCESS: ARI execution completed successfully")
-            jobs[job_id]['status'] = 'completed'
-            jobs[job_id]['output'] += '''<br><div style="background: #d4edda; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #28a745;">
+            append_job_output(job_id, '''<br><div style="background: #d4edda; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #28a745;">
                 <strong style="color: #155724; font-size: 16px;">🎉 Azure Resource Inventory completed successfully!</strong><br>
                 <span style="color: #155724;">Your reports have been generated and are ready for download.</span>
-            </div>'''
+            </div>''')
+            set_job_status(job_id, 'completed')
         else:
             print(f"[JOB {job_id}] FAILED: Process failed with exit code {process.returncode}")
-            jobs[job_id]['status'] = 'failed'
-            jobs[job_id]['output'] += f'''<br><div style="background: #f8d7da; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #dc3545;">
+            append_job_output(job_id, f'''<br><div style="background: #f8d7da; padding: 15px; border-radius: 8px; margin: 15px 0; border-left: 4px solid #dc3545;">
                 <strong style="color: #721c24; font-size: 16px;">❌ Process failed with exit code {process.returncode}</strong><br>
                 <span style="color: #721c24;">Please check the output above for error details.</span>
-            </div>'''
+            </div>''')
+            set_job_status(job_id, 'failed')
         
         # Final save
         save_job(job_id, jobs[job_id])
             
     except Exception as e:
         print(f"[JOB {job_id}] EXCEPTION: {str(e)}")
-        jobs[job_id]['status'] = 'failed'
-        jobs[job_id]['output'] += f"<br>Error: {str(e)}"
+        append_job_output(job_id, f"<br>Error: {str(e)}")
+        set_job_status(job_id, 'failed')
         save_job(job_id, jobs[job_id])  # Save on error
+    finally:
+        # The work directory holds this job's Azure CLI and Az PowerShell tokens
+        shutil.rmtree(os.path.join(os.environ.get("ARI_WORK_DIR", "/tmp/ari-jobs"), job_id), ignore_errors=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,234 @@
+"""Background retention and quota enforcement for run folders and job records."""
+import os
+import shutil
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .run_manifest import read_manifest
+
+
+def parse_run_id(run_id):
+    """Run folders are named after the local time the run started"""
+    try:
+        return datetime.strptime(run_id, "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+def select_expired_runs(summaries, keep_last=None, max_age_days=None, max_total_bytes=None, now=None):
+    """Return the run ids a retention policy deletes
+
+    ``summaries`` are run summaries (run_id, total_bytes) newest first. A run
+    is deleted when it is beyond the newest ``keep_last`` runs, older than
+    ``max_age_days``, or when the runs newer than it already use up
+    ``max_total_bytes``. The newest run is always kept.
+
+    With the artifact store, a summary carries ``local_bytes`` (files kept
+    in the run folder) and ``blobs`` (sha256 -> size); a blob shared by
+    several runs is counted once, at the newest run referencing it, so the
+    quota follows the bytes actually stored.
+    """
+    now = now or datetime.now()
+    expired = []
+    total_bytes = 0
+    seen_blobs = set()
+    for position, summary in enumerate(summaries):
+        blobs = summary.get('blobs') or {}
+        total_bytes += summary.get('local_bytes', summary['total_bytes'])
+        total_bytes += sum(size for digest, size in blobs.items() if digest not in seen_blobs)
+        seen_blobs.update(blobs)
+        if position == 0:
+            continue
+        started = parse_run_id(summary['run_id'])
+        if keep_last is not None and position >= keep_last:
+            expired.append(summary['run_id'])
+        elif max_age_days is not None and started and now - started > timedelta(days=max_age_days):
+            expired.append(summary['run_id'])
+        elif max_total_bytes is not None and total_bytes > max_total_bytes:
+            expired.append(summary['run_id'])
+    return expired
+
+
+def select_expired_jobs(summaries, active_statuses, keep_last=None, max_age_days=None, now=None):
+    """Return the ids of finished job records beyond ``keep_last`` or ``max_age_days``
+
+    ``summaries`` come from ``JobStore.find`` (newest first); queued and
+    running jobs are never selected and do not count towards ``keep_last``.
+    """
+    now = now or datetime.now()
+    expired = []
+    finished = [summary for summary in summaries if summary['status'] not in active_statuses]
+    for position, summary in enumerate(finished):
+        created_at = summary['created_at']
+        if keep_last is not None and position >= keep_last:
+            expired.append(summary['id'])
+        elif max_age_days is not None and created_at and now - created_at > timedelta(days=max_age_days):
+            expired.append(summary['id'])
+    return expired
+
+
+class RetentionEngine:
+    """Periodically prune old run folders and job records on a worker thread
+
+    Deletions run in parallel on ``max_workers`` threads, which matters on
+    the SMB share where removing a run folder is one round trip per file.
+    Runs that started after the oldest active job are never touched, since
+    that job may still be writing into them. After job records are deleted
+    the job store is compacted, and every pass sweeps the artifact store for
+    blobs no surviving manifest references. Each pass is summarised in
+    ``last_report``.
+    """
+
+    def __init__(self, output_dir, run_index, job_store, keep_last_runs=None, keep_last_jobs=None, max_age_days=None,
+                 max_total_bytes=None, interval_seconds=3600, max_workers=8, artifact_store=None,
+                 active_statuses=('queued', 'running'), active_since=None, on_job_deleted=None):
+        self.output_dir = output_dir
+        self.run_index = run_index
+        self.job_store = job_store
+        self.keep_last_runs = keep_last_runs
+        self.keep_last_jobs = keep_last_jobs
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+        self.interval_seconds = interval_seconds
+        self.max_workers = max_workers
+        self.artifact_store = artifact_store
+        self.active_statuses = active_statuses
+        self.active_since = active_since
+        self.on_job_deleted = on_job_deleted
+        self.run_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        self.last_report = None
+
+    @property
+    def enabled(self):
+        return any(v is not None for v in (self.keep_last_runs, self.keep_last_jobs, self.max_age_days,
+                                           self.max_total_bytes))
+
+    def policy(self):
+        return {
+            'keep_last_runs': self.keep_last_runs,
+            'keep_last_jobs': self.keep_last_jobs,
+            'max_age_days': self.max_age_days,
+            'max_total_bytes': self.max_total_bytes,
+            'interval_seconds': self.interval_seconds
+        }
+
+    def start(self):
+        """Start the background thread (idempotent; no-op without a policy)"""
+        if not self.enabled or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.loop, name="ari-retention")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def trigger(self):
+        """Ask the background thread to run a pass now"""
+        self.wakeup.set()
+
+    def loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[RETENTION] Pass failed: {e}")
+                print(traceback.format_exc())
+            self.wakeup.wait(timeout=self.interval_seconds)
+            self.wakeup.clear()
+
+    def run_summary(self, run_id):
+        """The run index summary plus, with the artifact store, what is stored where"""
+        summary = self.run_index.summary(run_id)
+        if self.artifact_store:
+            artifacts = self.run_index.artifacts(run_id)
+            summary['local_bytes'] = sum(a['size'] for a in artifacts if a.get('stored') not in ('blob', 'missing'))
+            summary['blobs'] = {a['sha256']: a['size'] for a in artifacts if a.get('stored') == 'blob'}
+        return summary
+
+    def delete_run(self, run_id):
+        """Delete one run folder and release its blobs; return bytes reclaimed"""
+        run_dir = os.path.join(self.output_dir, run_id)
+        manifest = read_manifest(self.output_dir, run_id)
+        reclaimed = 0
+        for dirpath, _, filenames in os.walk(run_dir):
+            for fname in filenames:
+                try:
+                    reclaimed += os.path.getsize(os.path.join(dirpath, fname))
+                except OSError:
+                    pass
+        shutil.rmtree(run_dir)
+        if manifest and self.artifact_store:
+            reclaimed += self.artifact_store.release(manifest)
+        self.run_index.invalidate(run_id)
+        return reclaimed
+
+    def delete_job(self, job_id):
+        self.job_store.delete(job_id)
+        if self.on_job_deleted:
+            self.on_job_deleted(job_id)
+
+    def run_once(self):
+        """Apply the policy once and return a report of what was reclaimed"""
+        with self.run_lock:
+            started = time.time()
+            report = {
+                'started_at': datetime.now().isoformat(),
+                'runs_deleted': [],
+                'jobs_deleted': 0,
+                'bytes_reclaimed': 0,
+                'errors': []
+            }
+
+            active_since = self.active_since() if self.active_since else None
+            self.run_index.invalidate()
+            summaries = [
+                self.run_summary(run_id)
+                for run_id in self.run_index.runs()
+                if not active_since or (parse_run_id(run_id) or datetime.max) < active_since
+            ]
+            expired_runs = select_expired_runs(summaries, self.keep_last_runs, self.max_age_days, self.max_total_bytes)
+            expired_jobs = select_expired_jobs(
+                self.job_store.find(), self.active_statuses, self.keep_last_jobs, self.max_age_days
+            )
+
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ari-retention") as pool:
+                run_futures = {run_id: pool.submit(self.delete_run, run_id) for run_id in expired_runs}
+                job_futures = {job_id: pool.submit(self.delete_job, job_id) for job_id in expired_jobs}
+                for run_id, future in run_futures.items():
+                    try:
+                        report['bytes_reclaimed'] += future.result()
+                        report['runs_deleted'].append(run_id)
+                    except Exception as e:
+                        report['errors'].append(f"run {run_id}: {e}")
+                for job_id, future in job_futures.items():
+                    try:
+                        future.result()
+                        report['jobs_deleted'] += 1
+                    except Exception as e:
+                        report['errors'].append(f"job {job_id}: {e}")
+
+            if report['jobs_deleted']:
+                try:
+                    self.job_store.compact()
+                except Exception as e:
+                    report['errors'].append(f"job store compaction: {e}")
+
+            if self.artifact_store:
+                # Runs deleted outside this engine never released their blobs
+                try:
+                    _, freed_bytes = self.artifact_store.sweep(self.output_dir)
+                    report['bytes_reclaimed'] += freed_bytes
+                except OSError as e:
+                    report['errors'].append(f"artifact store sweep: {e}")
+
+            self.run_index.invalidate()
+            report['duration_seconds'] = round(time.time() - started, 2)
+            self.last_report = report
+            if expired_runs or expired_jobs or report['errors']:
+                print(f"[RETENTION] Deleted {len(report['runs_deleted'])} run(s) and {report['jobs_deleted']} job "
+                      f"record(s), reclaimed {report['bytes_reclaimed'] / (1024 * 1024):.1f} MB "
+                      f"in {report['duration_seconds']}s ({len(report['errors'])} error(s))")
+            return report
@@ -0,0 +1,72 @@
+"""Stream the artifacts of an ARI run as a ZIP archive built on the fly."""
+import zipfile
+
+
+# Members that are already compressed and gain nothing from deflate
+STORED_EXTENSIONS = ('.xlsx', '.zip', '.gz', '.png', '.jpg', '.jpeg', '.pdf')
+
+
+class ZipStream:
+    """Write-only, unseekable file object that collects what zipfile writes
+
+    zipfile switches to streaming mode (data descriptors after each member)
+    when the target cannot seek, so nothing has to be staged on disk.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files, chunk_size=1024 * 1024):
+    """Yield a ZIP archive of ``files``, a list of (path, arcname) pairs
+
+    Only about ``chunk_size`` bytes of a member are held in memory at a
+    time. Already-compressed members such as xlsx workbooks are stored as
+    is; everything else (diagram XML, json, csv) is deflated.
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode='w', allowZip64=True) as archive:
+        for path, arcname in files:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(path, arcname)
+            except FileNotFoundError:
+                continue
+            if arcname.lower().endswith(STORED_EXTENSIONS):
+                zinfo.compress_type = zipfile.ZIP_STORED
+            else:
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+            with open(path, 'rb') as source, archive.open(zinfo, mode='w') as member:
+                while True:
+                    data = source.read(chunk_size)
+                    if not data:
+                        break
+                    member.write(data)
+                    yield stream.drain()
+            yield stream.drain()
+    # Central directory
+    yield stream.drain()
+
+
+def run_archive_files(run_id, artifacts, resolve):
+    """Map run artifacts to (file path, name inside the run) pairs
+
+    ``resolve`` turns an artifact entry into the file that holds its content.
+    """
+    prefix = run_id + '/'
+    return [
+        (resolve(artifact), artifact['path'][len(prefix):])
+        for artifact in artifacts
+        if artifact['path'].startswith(prefix)
+    ]
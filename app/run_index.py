@@ -0,0 +1,179 @@
+"""Cached index of ARI run folders and the artifacts they contain."""
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from .run_manifest import MANIFEST_NAME, artifact_kind, read_manifest
+
+
+RUN_DIR_PATTERN = re.compile(r"^\d{8}_\d{6}$")
+
+
+class RunIndex:
+    """In-memory index of the per-run (yyyyMMdd_HHmmss) output folders
+
+    The output root and run folders live on an SMB-mounted share where every
+    listdir/stat is a network round trip, so listings are cached. Cached
+    entries are revalidated against the directory mtime at most once every
+    ``check_interval`` seconds, and ``invalidate`` drops them immediately
+    (called when a job finishes writing a run). Runs that carry a
+    manifest.json are served from it and never listed or revalidated again.
+    Both caches keep at most ``max_cached_runs`` runs, least recently used
+    first out.
+    """
+
+    def __init__(self, output_dir, check_interval=10, max_cached_runs=256):
+        self.output_dir = output_dir
+        self.check_interval = check_interval
+        self.max_cached_runs = max_cached_runs
+        self.lock = threading.Lock()
+        self.run_ids = None
+        self.root_mtime = None
+        self.root_checked_at = 0
+        self.artifact_cache = OrderedDict()  # run_id -> (dir_mtime, checked_at, artifacts)
+        self.manifests = OrderedDict()  # run_id -> artifacts from the run's manifest.json
+
+    def remember(self, cache, key, value):
+        """Store an entry as most recently used and evict beyond the bound"""
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.max_cached_runs:
+            cache.popitem(last=False)
+
+    def invalidate(self, run_id=None):
+        """Forget cached listings for one run, or for everything"""
+        with self.lock:
+            if run_id is None:
+                self.run_ids = None
+                self.artifact_cache.clear()
+                self.manifests.clear()
+            else:
+                self.artifact_cache.pop(run_id, None)
+                self.manifests.pop(run_id, None)
+
+    def runs(self):
+        """Return run ids, newest first"""
+        with self.lock:
+            now = time.time()
+            if self.run_ids is not None and now - self.root_checked_at < self.check_interval:
+                return list(self.run_ids)
+            try:
+                mtime = os.stat(self.output_dir).st_mtime
+            except FileNotFoundError:
+                self.run_ids, self.root_mtime, self.root_checked_at = [], None, now
+                return []
+            if self.run_ids is None or mtime != self.root_mtime:
+                self.run_ids = sorted(
+                    (
+                        entry.name
+                        for entry in os.scandir(self.output_dir)
+                        if RUN_DIR_PATTERN.match(entry.name) and entry.is_dir()
+                    ),
+                    reverse=True
+                )
+                self.root_mtime = mtime
+            self.root_checked_at = now
+            return list(self.run_ids)
+
+    def latest_run(self):
+        runs = self.runs()
+        return runs[0] if runs else None
+
+    def artifacts(self, run_id=None):
+        """Return the files of a run (or of the output root when run_id is None)
+
+        Each artifact is a dict with ``path`` (relative to the output root,
+        using '/'), ``name``, ``size``, ``mtime`` and ``kind``; artifacts
+        read from a manifest also carry their ``sha256``.
+        """
+        key = run_id or ''
+        root = os.path.join(self.output_dir, run_id) if run_id else self.output_dir
+        with self.lock:
+            if key in self.manifests:
+                self.manifests.move_to_end(key)
+                return list(self.manifests[key])
+            now = time.time()
+            cached = self.artifact_cache.get(key)
+            if cached and now - cached[1] < self.check_interval:
+                self.artifact_cache.move_to_end(key)
+                return list(cached[2])
+            manifest = read_manifest(self.output_dir, run_id) if run_id else None
+            if manifest is not None:
+                self.remember(self.manifests, key, manifest['artifacts'])
+                self.artifact_cache.pop(key, None)
+                return list(manifest['artifacts'])
+            try:
+                mtime = os.stat(root).st_mtime
+            except FileNotFoundError:
+                self.artifact_cache.pop(key, None)
+                return []
+            if cached and cached[0] == mtime:
+                self.remember(self.artifact_cache, key, (mtime, now, cached[2]))
+                return list(cached[2])
+            artifacts = self.scan(root)
+            self.remember(self.artifact_cache, key, (mtime, now, artifacts))
+            return list(artifacts)
+
+    def scan(self, root):
+        artifacts = []
+        for dirpath, dirnames, filenames in os.walk(root):
+            # Job persistence and the artifact store live under the output
+            # root but are not reports
+            dirnames[:] = [d for d in dirnames if d not in ('.jobs', '.artifacts')]
+            for fname in filenames:
+                if dirpath == root and fname in (MANIFEST_NAME, MANIFEST_NAME + '.tmp'):
+                    continue
+                full_path = os.path.join(dirpath, fname)
+                try:
+                    stat = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                rel_path = os.path.relpath(full_path, self.output_dir).replace(os.sep, '/')
+                artifacts.append({
+                    'path': rel_path,
+                    'name': fname,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime,
+                    'kind': artifact_kind(rel_path)
+                })
+        artifacts.sort(key=lambda a: a['path'])
+        return artifacts
+
+    def find_artifact(self, rel_path):
+        """Return the indexed entry of a file under a run folder, or None"""
+        run_id = rel_path.split('/', 1)[0]
+        if not RUN_DIR_PATTERN.match(run_id):
+            return None
+        for artifact in self.artifacts(run_id):
+            if artifact['path'] == rel_path:
+                return artifact
+        return None
+
+    def summary(self, run_id):
+        """Return the artifact count and total size of a run"""
+        artifacts = self.artifacts(run_id)
+        return {
+            'run_id': run_id,
+            'artifact_count': len(artifacts),
+            'total_bytes': sum(a['size'] for a in artifacts)
+        }
+
+    def page(self, cursor=None, limit=20):
+        """Return one page of run summaries, newest first, and the next cursor
+
+        ``cursor`` is the id of the last run of the previous page; run ids
+        sort by their timestamp, so pages stay stable while new runs arrive.
+        The page is cut from the cached folder names first, so only the runs
+        on it are ever listed or read.
+        """
+        runs = self.runs()
+        start = 0
+        if cursor:
+            # runs is newest first: every id below the cursor sits at the end
+            start = len(runs) - bisect_left(runs[::-1], cursor)
+        page_ids = runs[start:start + limit]
+        next_cursor = page_ids[-1] if start + limit < len(runs) else None
+        return [self.summary(run_id) for run_id in page_ids], next_cursor
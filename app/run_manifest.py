@@ -0,0 +1,113 @@
+"""Per-run manifest of the artifacts an ARI run produced."""
+import hashlib
+import json
+import os
+from datetime import datetime
+from functools import lru_cache
+
+
+MANIFEST_NAME = 'manifest.json'
+CACHE_DIRS = ('ReportCache', 'DiagramCache')
+
+
+def artifact_kind(rel_path):
+    """Classify an artifact as report, diagram, cache or other"""
+    parts = rel_path.split('/')
+    name = parts[-1].lower()
+    if any(part in CACHE_DIRS for part in parts[:-1]):
+        return 'cache'
+    if name.endswith('.xlsx'):
+        return 'report'
+    if name.endswith(('.xml', '.drawio')):
+        return 'diagram'
+    return 'other'
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest()
+
+
+@lru_cache(maxsize=1024)
+def cached_sha256(path, size, mtime_ns):
+    """SHA-256 of a file, hashed once per (path, size, mtime) seen"""
+    return file_sha256(path)
+
+
+def matches_manifest(path, artifact):
+    """Return True when ``path`` still holds the content a manifest entry describes
+
+    Compares the size and then the SHA-256 recorded in the manifest. The
+    mtime only keys the digest cache, so a file is re-hashed after it is
+    touched but a changed or restored mtime alone never decides validity.
+    """
+    if not artifact.get('sha256'):
+        return False
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != artifact.get('size'):
+        return False
+    return cached_sha256(path, stat.st_size, stat.st_mtime_ns) == artifact['sha256']
+
+
+def build_manifest(output_dir, run_id):
+    """Walk a finished run folder once and describe every file in it
+
+    Artifact paths are relative to ``output_dir`` and use '/', matching the
+    paths served by /download.
+    """
+    run_dir = os.path.join(output_dir, run_id)
+    artifacts = []
+    for dirpath, _, filenames in os.walk(run_dir):
+        for fname in filenames:
+            full_path = os.path.join(dirpath, fname)
+            if full_path == os.path.join(run_dir, MANIFEST_NAME):
+                continue
+            stat = os.stat(full_path)
+            rel_path = os.path.relpath(full_path, output_dir).replace(os.sep, '/')
+            artifacts.append({
+                'path': rel_path,
+                'name': fname,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha256': file_sha256(full_path),
+                'kind': artifact_kind(rel_path)
+            })
+    artifacts.sort(key=lambda a: a['path'])
+    return {
+        'run_id': run_id,
+        'generated_at': datetime.now().isoformat(),
+        'artifacts': artifacts
+    }
+
+
+def write_manifest(output_dir, run_id, manifest=None):
+    """Atomically write ``<run_id>/manifest.json`` (built now unless given)"""
+    if manifest is None:
+        manifest = build_manifest(output_dir, run_id)
+    path = os.path.join(output_dir, run_id, MANIFEST_NAME)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def read_manifest(output_dir, run_id):
+    """Return the manifest of a run, or None if it has none (or it is unreadable)"""
+    try:
+        with open(os.path.join(output_dir, run_id, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('artifacts'), list):
+        return None
+    return manifest
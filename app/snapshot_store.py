@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Columnar, compressed on-disk snapshots of extracted inventory.
+
+Layout of a snapshot directory::
+
+    index.json                 columns, and per resource type its partition
+                               directory, row count and the row range of
+                               every subscription
+    t0001/<column>.json.gz     one gzip-compressed JSON array per column
+
+Rows are partitioned by resource type and sorted by subscription inside a
+partition, so a reader that needs a few types, subscriptions or columns
+decompresses only those column files and slices the subscription ranges.
+
+    python3 /app/app/snapshot_store.py write --from resources.ndjson --out DIR
+    python3 /app/app/snapshot_store.py read DIR [--type T ...] [--subscription S ...] [--column C ...]
+
+This is an offline tool: jobs started from the web UI do not write
+snapshots, only incremental_inventory.py --columnar and the write command do.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+
+INDEX_FILE = 'index.json'
+SNAPSHOT_VERSION = 1
+
+
+def column_file(column):
+    """File name of a column: readable prefix plus a hash of the exact name
+
+    The hash keeps names that sanitize alike ("properties.sku" and
+    "properties_sku") or differ only in case (on SMB shares) apart.
+    Readers look the name up in index.json rather than recomputing it.
+    """
+    readable = ''.join(c if c.isalnum() or c in '-_' else '_' for c in column)[:64]
+    digest = hashlib.sha1(column.encode('utf-8')).hexdigest()[:8]
+    return f"{readable}-{digest}.json.gz"
+
+
+def write_snapshot(rows, path, compresslevel=6):
+    """Write ``rows`` (dicts with ``type`` and ``subscriptionId``) as a snapshot
+
+    The snapshot is built next to ``path`` and swapped in at the end, so
+    readers never see a half-written snapshot. Returns the index.
+    """
+    partitions = {}
+    columns = []
+    seen_columns = set()
+    for row in rows:
+        partitions.setdefault((row.get('type') or '').lower(), []).append(row)
+        for column in row:
+            if column not in seen_columns:
+                seen_columns.add(column)
+                columns.append(column)
+
+    tmp_path = path.rstrip('/\\') + '.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    index = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'rows': 0,
+        'columns': {column: column_file(column) for column in columns},
+        'types': {}
+    }
+    for number, resource_type in enumerate(sorted(partitions), start=1):
+        part_rows = sorted(partitions[resource_type], key=lambda r: ((r.get('subscriptionId') or '').lower(), r.get('id') or ''))
+        directory = f"t{number:04d}"
+        os.makedirs(os.path.join(tmp_path, directory))
+        ranges = {}
+        for position, row in enumerate(part_rows):
+            subscription = (row.get('subscriptionId') or '').lower()
+            start, _ = ranges.get(subscription, (position, position))
+            ranges[subscription] = (start, position + 1)
+        part_columns = [column for column in columns if any(column in row for row in part_rows)]
+        for column in part_columns:
+            values = [row.get(column) for row in part_rows]
+            with open(os.path.join(tmp_path, directory, column_file(column)), 'wb') as f:
+                f.write(gzip.compress(json.dumps(values, separators=(',', ':')).encode('utf-8'), compresslevel))
+        index['types'][resource_type] = {
+            'path': directory,
+            'rows': len(part_rows),
+            'columns': part_columns,
+            'subscriptions': {s: list(r) for s, r in ranges.items()}
+        }
+        index['rows'] += len(part_rows)
+    with open(os.path.join(tmp_path, INDEX_FILE), 'w') as f:
+        json.dump(index, f, indent=1)
+
+    old_path = path.rstrip('/\\') + '.old'
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return index
+
+
+class SnapshotReader:
+    """Read selected types, subscriptions and columns of a snapshot"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            self.index = json.load(f)
+
+    def types(self):
+        return sorted(self.index['types'])
+
+    def subscriptions(self):
+        return sorted({s for part in self.index['types'].values() for s in part['subscriptions']})
+
+    def count(self, types=None, subscriptions=None):
+        total = 0
+        for _, part, ranges in self.select(types, subscriptions):
+            total += sum(end - start for start, end in ranges)
+        return total
+
+    def select(self, types=None, subscriptions=None):
+        """Yield (type, partition, row ranges) matching the filters"""
+        wanted_types = {t.lower() for t in types} if types else None
+        wanted_subs = {s.lower() for s in subscriptions} if subscriptions else None
+        for resource_type, part in sorted(self.index['types'].items()):
+            if wanted_types is not None and resource_type not in wanted_types:
+                continue
+            if wanted_subs is None:
+                ranges = [(0, part['rows'])]
+            else:
+                ranges = sorted(tuple(r) for s, r in part['subscriptions'].items() if s in wanted_subs)
+            if ranges:
+                yield resource_type, part, ranges
+
+    def read_column(self, part, column):
+        if column not in part['columns']:
+            return [None] * part['rows']
+        with open(os.path.join(self.path, part['path'], self.index['columns'][column]), 'rb') as f:
+            return json.loads(gzip.decompress(f.read()))
+
+    def read_columns(self, columns=None, types=None, subscriptions=None):
+        """Return the selected data column-wise: {column: [values...]}"""
+        columns = list(columns or self.index['columns'])
+        result = {column: [] for column in columns}
+        for _, part, ranges in self.select(types, subscriptions):
+            for column in columns:
+                values = self.read_column(part, column)
+                for start, end in ranges:
+                    result[column].extend(values[start:end])
+        return result
+
+    def rows(self, columns=None, types=None, subscriptions=None):
+        """Yield the selected data row by row, one partition in memory at a time"""
+        columns = list(columns or self.index['columns'])
+        for _, part, ranges in self.select(types, subscriptions):
+            values = {column: self.read_column(part, column) for column in columns if column in part['columns']}
+            for start, end in ranges:
+                for position in range(start, end):
+                    yield {column: column_values[position] for column, column_values in values.items()}
+
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write or read columnar inventory snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+    write = commands.add_parser('write', help="Convert NDJSON resources into a snapshot")
+    write.add_argument('--from', dest='source', required=True, action='append', help="NDJSON file (repeatable)")
+    write.add_argument('--out', required=True, help="Snapshot directory")
+    read = commands.add_parser('read', help="Print selected rows of a snapshot as NDJSON")
+    read.add_argument('snapshot')
+    read.add_argument('--type', action='append', default=[])
+    read.add_argument('--subscription', action='append', default=[])
+    read.add_argument('--column', action='append', default=[])
+    read.add_argument('--count', action='store_true', help="Only print the number of matching rows")
+    args = parser.parse_args(argv)
+
+    if args.command == 'write':
+        started = time.time()
+        rows = (row for source in args.source for row in read_ndjson(source))
+        index = write_snapshot(rows, args.out)
+        print(f"Wrote {index['rows']} row(s) in {len(index['types'])} type partition(s) "
+              f"to {args.out} in {time.time() - started:.1f}s")
+        return 0
+
+    reader = SnapshotReader(args.snapshot)
+    if args.count:
+        print(reader.count(args.type or None, args.subscription or None))
+        return 0
+    for row in reader.rows(args.column or None, args.type or None, args.subscription or None):
+        sys.stdout.write(json.dumps(row, separators=(',', ':')) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
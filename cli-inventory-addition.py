@@ -41,6 +41,10 @@ def cli_resource_inventory():
           <input type="text" name="subscription" id="subscription" placeholder="Leave empty for default subscription">
         </div>
         
+        <div class="form-group">
+          <label><input type="checkbox" name="all_subscriptions" value="1" style="width: auto;"> Inventory all accessible subscriptions</label>
+        </div>
+        
         <button type="submit">Start CLI Resource Inventory</button>
         
         <div class="link">
@@ -54,24 +58,23 @@ def cli_resource_inventory():
     # POST request - start CLI resource inventory
     tenant = request.form.get("tenant", "").strip() or None
     subscription = request.form.get("subscription", "").strip() or None
+    all_subscriptions = request.form.get("all_subscriptions") == "1"
     
     job_id = str(uuid.uuid4())
     output_dir = get_output_dir()
     
     # Generate Azure CLI resource inventory script
-    cli_script = generate_cli_resource_inventory_script(output_dir, tenant, subscription)
+    cli_script = generate_cli_resource_inventory_script(output_dir, tenant, subscription, all_subscriptions)
     
     jobs[job_id] = {
-        'status': 'running',
-        'output': '',
+        'status': 'queued',
+        'output': JobOutput(),
         'created_at': datetime.now(),
         'process': None
     }
     
-    # Start CLI job
-    thread = threading.Thread(target=run_cli_job, args=(job_id, cli_script))
-    thread.daemon = True
-    thread.start()
+    # Queue CLI job behind any running inventories
+    job_scheduler.submit(job_id, run_cli_job, job_id, cli_script)
     
     return f'''<!doctype html>
 <html>
@@ -99,15 +102,22 @@ def cli_resource_inventory():
       
       <script>
         const jobId = '{job_id}';
+        let outputOffset = 0;
         function checkOutput() {{
-          fetch(`/job-status/${{jobId}}`)
+          fetch(`/job-status/${{jobId}}?offset=${{outputOffset}}`)
             .then(response => response.json())
             .then(data => {{
               const outputElement = document.getElementById('output');
-              outputElement.innerHTML = data.output || '';
-              outputElement.scrollTop = outputElement.scrollHeight;
+              if (data.reset) {{
+                outputElement.innerHTML = '';
+              }}
+              if (data.output) {{
+                outputElement.insertAdjacentHTML('beforeend', data.output);
+                outputElement.scrollTop = outputElement.scrollHeight;
+              }}
+              outputOffset = data.offset || 0;
               
-              if (data.status !== 'running') {{
+              if (data.status !== 'running' && data.status !== 'queued') {{
                 clearInterval(interval);
                 if (data.status === 'completed') {{
                   window.location.href = '/outputs';
@@ -123,8 +133,10 @@ def cli_resource_inventory():
 </html>'''
 
 
-def generate_cli_resource_inventory_script(output_dir, tenant, subscription):
+def generate_cli_resource_inventory_script(output_dir, tenant, subscription, all_subscriptions=False):
     """Generate bash script using only Azure CLI for resource inventory"""
+    # The inventory talks to ARM in-process; az is only used to sign in
+    scope = f" --subscription '{subscription}'" if subscription and not all_subscriptions else ""
     script_parts = [
         "#!/bin/bash",
         "set -e",
@@ -134,62 +146,25 @@ def generate_cli_resource_inventory_script(output_dir, tenant, subscription):
         "echo '🔧 AZURE CLI RESOURCE INVENTORY'",
         "echo '=============================='",
         "",
-        "# Ensure we're authenticated",
+        "# Pre-flight account check over the in-process ARM client (no az account show)",
         "echo 'Checking Azure CLI authentication...'",
-        "if ! az account show &>/dev/null; then",
+        f"if ! ACCOUNT_INFO=$(python3 /app/app/cli_inventory.py --check{scope}); then",
         "    echo 'Not authenticated. Starting device login...'",
         "    az login --use-device-code",
+        f"    ACCOUNT_INFO=$(python3 /app/app/cli_inventory.py --check{scope}) || {{ echo \"$ACCOUNT_INFO\"; exit 1; }}",
         "fi",
         "",
         "echo 'Authentication confirmed!'",
-        "az account show",
-        "",
-    ]
-    
-    if subscription:
-        script_parts.extend([
-            f"echo 'Setting subscription: {subscription}'",
-            f"az account set --subscription '{subscription}'"
-        ])
-    
-    script_parts.extend([
+        "echo \"$ACCOUNT_INFO\"",
         "",
-        "# Generate resource inventory using Azure CLI",
+        "# Fetch the account, resource groups and resources once, then render",
+        "# the text report, detailed JSON and CSVs locally from that one result",
         "echo 'Generating Azure Resource Inventory...'",
-        "",
-        "# Get basic account info",
-        "echo 'Account Information:' > \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "az account show >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "echo '' >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "",
-        "# List all resource groups",
-        "echo 'Resource Groups:' >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "az group list --output table >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "echo '' >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "",
-        "# List all resources",
-        "echo 'All Resources:' >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "az resource list --output table >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "echo '' >> \"$OUT_DIR/azure-resource-inventory.txt\"",
-        "",
-        "# Export detailed resource info as JSON",
-        "echo 'Exporting detailed resource information...'",
-        "az resource list --output json > \"$OUT_DIR/resources-detailed.json\"",
-        "",
-        "# Export resource groups as JSON", 
-        "az group list --output json > \"$OUT_DIR/resource-groups.json\"",
-        "",
-        "# Generate CSV for Excel compatibility",
-        "echo 'Generating CSV export...'",
-        "az resource list --query '[].{Name:name,Type:type,ResourceGroup:resourceGroup,Location:location}' --output tsv > \"$OUT_DIR/resources.csv\"",
-        "",
-        "# Add CSV headers",
-        "echo -e 'Name\\tType\\tResourceGroup\\tLocation' > \"$OUT_DIR/resources-with-headers.csv\"",
-        "cat \"$OUT_DIR/resources.csv\" >> \"$OUT_DIR/resources-with-headers.csv\"",
+        "python3 /app/app/cli_inventory.py --out \"$OUT_DIR\"" + (" --all-subscriptions" if all_subscriptions else scope),
         "",
         "echo 'Azure CLI Resource Inventory completed!'",
         "echo 'Files generated:'",
         "ls -la \"$OUT_DIR/\"",
-    ])
+    ]
     
     return "\n".join(script_parts)
\ No newline at end of file
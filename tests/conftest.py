@@ -0,0 +1,44 @@
+"""Shared pytest setup for the Python helpers in app/.
+
+The helpers are standalone scripts (they import each other with a
+``from x import`` fallback), so they are imported from the app directory
+directly instead of through the ``app`` package, which would start Flask.
+Modules that only use package-relative imports (run_index, retention, ...)
+are imported as ``ariapp.<module>``: the same directory registered as a
+bare package whose ``__init__`` is never run. The ``web`` fixture imports
+the Flask app itself for the route tests.
+"""
+import importlib
+import os
+import sys
+import types
+
+import pytest
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app')
+
+sys.path.insert(0, APP_DIR)
+
+package = types.ModuleType('ariapp')
+package.__path__ = [APP_DIR]
+sys.modules.setdefault('ariapp', package)
+
+
+@pytest.fixture(scope='session')
+def web(tmp_path_factory):
+    """The Flask app module (app.main), imported once against a scratch output directory
+
+    The output directory is read from ARI_OUTPUT_DIR on every request, so
+    the environment stays patched for the whole session.
+    """
+    output_dir = tmp_path_factory.mktemp('web') / 'AzureResourceInventory'
+    patch = pytest.MonkeyPatch()
+    patch.setenv('ARI_OUTPUT_DIR', str(output_dir))
+    patch.setenv('ARI_ARTIFACT_STORE', 'folders')
+    for name in ('ARI_JOB_DB', 'ARI_JOB_STORE', 'ARI_JOB_RESTORE'):
+        patch.delenv(name, raising=False)
+    patch.syspath_prepend(os.path.dirname(APP_DIR))
+    main = importlib.import_module('app.main')
+    main.app.config['TESTING'] = True
+    yield main
+    patch.undo()
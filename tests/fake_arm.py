@@ -0,0 +1,79 @@
+"""In-process stand-in for Azure Resource Manager / Resource Graph used by the tests."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+
+class FakeRequest:
+    def __init__(self, method, path, query, headers, body, client):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.body = body
+        self.client = client
+
+
+class FakeArm:
+    """HTTP/1.1 keep-alive server dispatching to per-path handlers
+
+    ``handlers`` maps (method, path) to a function taking a FakeRequest and
+    returning (status, JSON body, extra headers). Every request is recorded
+    together with the client address, so tests can count connections.
+    """
+
+    def __init__(self, handlers=None):
+        self.handlers = dict(handlers or {})
+        self.requests = []
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake.handle(self)
+
+            do_POST = do_GET
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}"
+
+    def handle(self, handler):
+        parts = urlsplit(handler.path)
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = json.loads(handler.rfile.read(length)) if length else None
+        request = FakeRequest(handler.command, parts.path, dict(parse_qsl(parts.query)),
+                              {k.lower(): v for k, v in handler.headers.items()}, body, handler.client_address)
+        with self.lock:
+            self.requests.append(request)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            route = self.handlers.get((handler.command, parts.path))
+            status, payload, headers = route(request) if route else (404, {'error': {'code': 'NotFound', 'message': parts.path}}, {})
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+        data = json.dumps(payload).encode()
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(data)))
+        handler.end_headers()
+        handler.wfile.write(data)
+
+    def connections(self):
+        return {request.client for request in self.requests}
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
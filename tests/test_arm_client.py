@@ -0,0 +1,151 @@
+"""Tests for app/arm_client.py against an in-process ARM stand-in."""
+import json
+import os
+import stat
+import time
+
+import pytest
+
+import arm_client
+from arm_client import ArmClient, ArmError, RateGovernor, get_arm_token
+from fake_arm import FakeArm
+
+
+@pytest.fixture
+def arm():
+    fake = FakeArm()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def fake_az(tmp_path, monkeypatch):
+    """An ``az`` on PATH that issues numbered tokens and counts its calls"""
+    calls = tmp_path / 'az-calls'
+    script = tmp_path / 'bin' / 'az'
+    script.parent.mkdir()
+    script.write_text(
+        "#!/usr/bin/env python3\n"
+        "import json, sys, time\n"
+        f"calls = {str(calls)!r}\n"
+        "with open(calls, 'a') as f:\n"
+        "    f.write(' '.join(sys.argv[1:]) + '\\n')\n"
+        "count = sum(1 for _ in open(calls))\n"
+        "print(json.dumps({'accessToken': f'token-{count}', 'expires_on': int(time.time()) + 3600}))\n"
+    )
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', f"{script.parent}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.delenv('ARI_ARM_TOKEN', raising=False)
+    return lambda: calls.read_text().count('\n') if calls.exists() else 0
+
+
+def ok(body=None, headers=None):
+    return lambda request: (200, body if body is not None else {}, headers or {})
+
+
+def test_governor_reads_quota_headers_and_spreads_the_budget():
+    now = [100.0]
+    governor = RateGovernor(reserve=1, clock=lambda: now[0])
+    governor.update(200, {'x-ms-user-quota-remaining': '5', 'x-ms-user-quota-resets-after': '00:00:02'})
+
+    assert governor.remaining == 5
+    assert governor.resets_at == pytest.approx(102.0)
+    governor.acquire()
+    # 4 requests left, 1 held in reserve: 3 spread over the remaining 2 seconds
+    assert governor.next_slot(now[0]) == pytest.approx(100.0 + 2 / 3)
+    # An older response from a concurrent request must not raise the count again
+    governor.update(200, {'x-ms-user-quota-remaining': '5', 'x-ms-user-quota-resets-after': '00:00:02'})
+    assert governor.remaining == 4
+
+
+def test_governor_waits_for_the_window_when_the_quota_is_spent():
+    now = [0.0]
+    governor = RateGovernor(reserve=1, clock=lambda: now[0])
+    governor.update(200, {'x-ms-user-quota-remaining': '1', 'x-ms-user-quota-resets-after': '00:00:05'})
+    assert governor.next_slot(0.0) == pytest.approx(5.0)
+
+
+def test_client_paces_by_quota_headers_from_the_server(arm):
+    arm.handlers[('POST', '/query')] = ok({'data': []}, {
+        'x-ms-user-quota-remaining': '3', 'x-ms-user-quota-resets-after': '00:00:01'})
+    governor = RateGovernor(reserve=1)
+    client = ArmClient(endpoint=arm.endpoint, token='t', governor=governor)
+
+    started = time.monotonic()
+    for _ in range(3):
+        client.post('/query', {})
+    # After the first answer: 2 left minus the reserve, spread over ~1 second
+    assert time.monotonic() - started >= 0.9
+    assert governor.metrics()['requests'] == 3
+    assert governor.metrics()['quota_remaining'] is not None
+
+
+def test_429_retry_after_backs_off_and_retries(arm):
+    answers = [(429, {'error': {'code': 'RateLimiting', 'message': 'slow down'}}, {'Retry-After': '1'})]
+    arm.handlers[('GET', '/subscriptions')] = lambda request: answers.pop() if answers else (200, {'value': []}, {})
+    governor = RateGovernor()
+    client = ArmClient(endpoint=arm.endpoint, token='t', governor=governor)
+
+    started = time.monotonic()
+    assert client.get('/subscriptions') == {'value': []}
+    assert time.monotonic() - started >= 1.0
+    assert governor.throttled == 1
+    assert client.retry_count == 1
+
+
+def test_non_transient_errors_raise_arm_error(arm):
+    arm.handlers[('GET', '/denied')] = lambda request: (403, {'error': {'code': 'AuthorizationFailed', 'message': 'no'}}, {})
+    client = ArmClient(endpoint=arm.endpoint, token='t')
+    with pytest.raises(ArmError) as error:
+        client.get('/denied')
+    assert error.value.status == 403 and error.value.code == 'AuthorizationFailed'
+
+
+def test_requests_reuse_keep_alive_connections(arm):
+    arm.handlers[('GET', '/ping')] = ok({'pong': True})
+    client = ArmClient(endpoint=arm.endpoint, token='t', pool_size=2)
+
+    for _ in range(20):
+        client.get('/ping')
+
+    assert len(arm.requests) == 20
+    assert len(arm.connections()) == 1
+    assert all(request.headers['authorization'] == 'Bearer t' for request in arm.requests)
+
+
+def test_token_is_cached_once_per_job(fake_az, tmp_path, monkeypatch):
+    monkeypatch.setenv('ARI_JOB_DIR', str(tmp_path))
+
+    assert get_arm_token() == 'token-1'
+    assert get_arm_token() == 'token-1'
+    assert fake_az() == 1
+    cache_file = tmp_path / 'arm_token.json'
+    assert stat.S_IMODE(cache_file.stat().st_mode) == 0o600
+
+    cached = json.loads(cache_file.read_text())
+    cached['expires_on'] = time.time() + arm_client.TOKEN_MIN_LIFETIME - 1
+    cache_file.write_text(json.dumps(cached))
+    assert get_arm_token() == 'token-2'
+    assert get_arm_token(refresh=True) == 'token-3'
+    assert fake_az() == 3
+
+
+def test_token_is_not_cached_outside_a_job(fake_az, monkeypatch):
+    monkeypatch.delenv('ARI_JOB_DIR', raising=False)
+    assert get_arm_token() == 'token-1'
+    assert get_arm_token() == 'token-2'
+
+
+def test_expired_token_is_renewed_once(arm, fake_az, tmp_path, monkeypatch):
+    monkeypatch.setenv('ARI_JOB_DIR', str(tmp_path))
+    (tmp_path / 'arm_token.json').write_text(json.dumps({
+        'resource': arm_client.DEFAULT_ENDPOINT + '/', 'accessToken': 'stale', 'expires_on': time.time() + 3600}))
+    arm.handlers[('GET', '/ping')] = lambda request: (
+        (401, {'error': {'code': 'ExpiredAuthenticationToken', 'message': 'expired'}}, {})
+        if request.headers['authorization'] == 'Bearer stale' else (200, {}, {}))
+    client = ArmClient(endpoint=arm.endpoint)
+
+    assert client.get('/ping') == {}
+    assert client.get('/ping') == {}
+    assert [r.headers['authorization'] for r in arm.requests] == ['Bearer stale', 'Bearer token-1', 'Bearer token-1']
+    assert fake_az() == 1
@@ -0,0 +1,88 @@
+"""Tests for manifest-based artifact validation and app/artifact_store.py."""
+import os
+import shutil
+
+from ariapp.artifact_store import ArtifactStore
+from ariapp.run_manifest import build_manifest, matches_manifest, write_manifest
+
+RUN_ID = '20260101_120000'
+
+
+def make_run(output_dir, files):
+    os.makedirs(output_dir / RUN_ID, exist_ok=True)
+    for name, content in files.items():
+        (output_dir / RUN_ID / name).write_bytes(content)
+    return build_manifest(str(output_dir), RUN_ID)
+
+
+def test_matches_manifest_compares_size_and_hash_not_mtime(tmp_path):
+    manifest = make_run(tmp_path, {'report.xlsx': b'original'})
+    artifact = manifest['artifacts'][0]
+    path = tmp_path / RUN_ID / 'report.xlsx'
+
+    os.utime(path, (1, 1))
+    assert matches_manifest(str(path), artifact)
+
+    path.write_bytes(b'modified')  # same size, different content
+    os.utime(path, (2, 2))
+    assert not matches_manifest(str(path), artifact)
+
+    path.write_bytes(b'longer content')
+    assert not matches_manifest(str(path), artifact)
+    assert not matches_manifest(str(tmp_path / 'missing'), artifact)
+    assert not matches_manifest(str(path), dict(artifact, sha256=None))
+
+
+def test_ingest_replaces_a_damaged_blob(tmp_path):
+    store = ArtifactStore(str(tmp_path / '.artifacts'))
+    manifest = store.mark_manifest(make_run(tmp_path, {'report.xlsx': b'report content'}))
+    artifact = manifest['artifacts'][0]
+    blob = store.blob_path(artifact['sha256'])
+    os.makedirs(os.path.dirname(blob))
+    with open(blob, 'wb') as f:
+        f.write(b'repo')  # left behind by an interrupted copy
+
+    assert store.ingest_run(str(tmp_path), manifest) == 0
+    with open(blob, 'rb') as f:
+        assert f.read() == b'report content'
+    assert not os.path.exists(tmp_path / RUN_ID / 'report.xlsx')
+
+    # A second run with the same content only adds a reference
+    second = dict(store.mark_manifest(make_run(tmp_path, {'report.xlsx': b'report content'})))
+    assert store.ingest_run(str(tmp_path), second) == len(b'report content')
+    assert store.load_refcounts()[artifact['sha256']] == 2
+
+
+def test_ingest_flags_a_file_that_disappeared(tmp_path):
+    store = ArtifactStore(str(tmp_path / '.artifacts'))
+    manifest = store.mark_manifest(make_run(tmp_path, {'a.xlsx': b'kept', 'b.xlsx': b'vanished'}))
+    os.remove(tmp_path / RUN_ID / 'b.xlsx')
+
+    store.ingest_run(str(tmp_path), manifest)
+
+    stored = {a['name']: a['stored'] for a in manifest['artifacts']}
+    assert stored == {'a.xlsx': 'blob', 'b.xlsx': 'missing'}
+    assert list(store.load_refcounts().values()) == [1]
+
+
+def test_sweep_rebuilds_refcounts_and_deletes_orphan_blobs(tmp_path):
+    store = ArtifactStore(str(tmp_path / '.artifacts'))
+    first = store.mark_manifest(make_run(tmp_path, {'shared.xlsx': b'shared', 'only.xlsx': b'only first'}))
+    write_manifest(str(tmp_path), RUN_ID, first)
+    store.ingest_run(str(tmp_path), first)
+    second_id = '20260102_120000'
+    os.makedirs(tmp_path / second_id)
+    (tmp_path / second_id / 'shared.xlsx').write_bytes(b'shared')
+    second = store.mark_manifest(build_manifest(str(tmp_path), second_id))
+    write_manifest(str(tmp_path), second_id, second)
+    store.ingest_run(str(tmp_path), second)
+
+    # The first run disappears without release(), e.g. through the share cleanup
+    shutil.rmtree(tmp_path / RUN_ID)
+    deleted, freed = store.sweep(str(tmp_path))
+
+    shared = second['artifacts'][0]['sha256']
+    assert (deleted, freed) == (1, len(b'only first'))
+    assert store.load_refcounts() == {shared: 1}
+    assert os.listdir(os.path.dirname(store.blob_path(shared))) == [shared]
+    assert store.sweep(str(tmp_path)) == (0, 0)
@@ -0,0 +1,126 @@
+"""Tests for app/cli_inventory.py, against an in-process ARM stand-in where it fetches."""
+import json
+
+import pytest
+
+from arm_client import ArmClient
+from cli_inventory import (CSV_FILE, GROUPS_FILE, HEADERED_CSV_FILE, RESOURCES_FILE, SHARDS_DIR, TEXT_FILE,
+                           fetch_inventory, main, merge_shards, render_inventory, shell_assignments)
+from fake_arm import FakeArm
+
+
+SUBSCRIPTION = '00000000-0000-0000-0000-000000000001'
+RG = f'/subscriptions/{SUBSCRIPTION}/resourceGroups'
+
+# Records as the ARM REST API returns them
+REST_RESOURCES = [
+    {'id': f'{RG}/rg-web/providers/Microsoft.Web/sites/app1', 'name': 'app1',
+     'type': 'Microsoft.Web/sites', 'kind': 'app', 'location': 'westeurope', 'tags': {'env': 'prod'}},
+    {'id': f'{RG}/rg-web/providers/Microsoft.Storage/storageAccounts/st1', 'name': 'st1',
+     'type': 'Microsoft.Storage/storageAccounts', 'kind': 'StorageV2', 'location': 'westeurope',
+     'sku': {'name': 'Standard_LRS', 'tier': 'Standard'}},
+    {'id': f'{RG}/RG-Data/providers/Microsoft.Sql/servers/sql1', 'name': 'sql1',
+     'type': 'Microsoft.Sql/servers', 'kind': 'v12.0', 'location': 'northeurope'},
+]
+
+# The same resources as ``az resource list`` prints them: resourceGroup added, nothing else
+AZ_RESOURCE_LIST = [dict(resource, resourceGroup=resource['id'].split('/')[4]) for resource in REST_RESOURCES]
+
+
+@pytest.fixture
+def arm():
+    def resources(request):
+        if 'createdTime' in request.query.get('$expand', ''):
+            raise AssertionError("the CLI path must not expand resources")
+        start = int(request.query.get('$skiptoken', 0))
+        page = {'value': REST_RESOURCES[start:start + 2]}
+        if start + 2 < len(REST_RESOURCES):
+            page['nextLink'] = (f"{fake.endpoint}/subscriptions/{SUBSCRIPTION}/resources"
+                                f"?api-version=2021-04-01&$skiptoken={start + 2}")
+        return 200, page, {}
+
+    fake = FakeArm({
+        ('GET', f'/subscriptions/{SUBSCRIPTION}'): lambda request: (200, {
+            'subscriptionId': SUBSCRIPTION, 'displayName': 'Test', 'state': 'Enabled', 'tenantId': 't'}, {}),
+        ('GET', f'/subscriptions/{SUBSCRIPTION}/resourcegroups'): lambda request: (200, {'value': [
+            {'id': f'{RG}/rg-web', 'name': 'rg-web', 'location': 'westeurope',
+             'properties': {'provisioningState': 'Succeeded'}}]}, {}),
+        ('GET', f'/subscriptions/{SUBSCRIPTION}/resources'): resources,
+    })
+    yield fake
+    fake.close()
+
+
+def test_in_process_fetch_writes_the_az_resource_list_records(arm, tmp_path):
+    client = ArmClient(endpoint=arm.endpoint, token='t')
+
+    account = fetch_inventory(client, str(tmp_path), SUBSCRIPTION)
+
+    assert account == {'id': SUBSCRIPTION, 'name': 'Test', 'state': 'Enabled', 'tenantId': 't'}
+    assert json.loads((tmp_path / RESOURCES_FILE).read_text()) == AZ_RESOURCE_LIST
+    assert [g['name'] for g in json.loads((tmp_path / GROUPS_FILE).read_text())] == ['rg-web']
+    resource_requests = [r for r in arm.requests if r.path.endswith('/resources')]
+    assert len(resource_requests) == 2
+    assert all('$expand' not in r.query for r in resource_requests)
+
+
+def test_check_prints_shell_assignments(arm, capsys, monkeypatch):
+    monkeypatch.setenv('ARI_ARM_TOKEN', 't')
+
+    assert main(['--check', '--shell', '--subscription', SUBSCRIPTION, '--endpoint', arm.endpoint]) == 0
+
+    assert capsys.readouterr().out.splitlines() == [
+        f"CURRENT_SUBSCRIPTION={SUBSCRIPTION}", "CURRENT_SUBSCRIPTION_NAME=Test", "CURRENT_TENANT=t"]
+    assert shell_assignments({'id': 'x', 'name': "it's mine; rm -rf /", 'tenantId': ''}).splitlines() == [
+        "CURRENT_SUBSCRIPTION=x", "CURRENT_SUBSCRIPTION_NAME='it'\"'\"'s mine; rm -rf /'", "CURRENT_TENANT=''"]
+
+
+def test_check_fails_when_the_subscription_cannot_be_read(arm, capsys, monkeypatch):
+    monkeypatch.setenv('ARI_ARM_TOKEN', 't')
+    assert main(['--check', '--shell', '--subscription', 'other', '--endpoint', arm.endpoint]) == 1
+    assert 'Account check failed' in capsys.readouterr().out
+
+
+def write_fetched(directory, groups, resources):
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / GROUPS_FILE).write_text(json.dumps(groups))
+    (directory / RESOURCES_FILE).write_text(json.dumps(resources, indent=2))
+
+
+def test_render_builds_the_tables_and_csvs_from_one_fetch(tmp_path):
+    write_fetched(tmp_path, [{'name': 'rg-web', 'location': 'westeurope', 'properties': {'provisioningState': 'Succeeded'}}], [
+        {'name': 'app1', 'type': 'Microsoft.Web/sites', 'resourceGroup': 'rg-web', 'location': 'westeurope'},
+        {'name': 'st1', 'type': 'Microsoft.Storage/storageAccounts', 'resourceGroup': 'rg-web', 'location': None},
+    ])
+
+    counts = render_inventory(str(tmp_path), {'name': 'Test', 'id': 'sub0'})
+
+    assert counts == (1, 2)
+    assert (tmp_path / CSV_FILE).read_text().splitlines() == [
+        'app1\tMicrosoft.Web/sites\trg-web\twesteurope', 'st1\tMicrosoft.Storage/storageAccounts\trg-web\t']
+    assert (tmp_path / HEADERED_CSV_FILE).read_text().splitlines()[0] == 'Name\tType\tResourceGroup\tLocation'
+    report = (tmp_path / TEXT_FILE).read_text()
+    assert '"name": "Test"' in report
+    assert 'rg-web  westeurope  Succeeded' in report
+    assert 'app1  rg-web         westeurope  Microsoft.Web/sites' in report
+
+
+def test_merge_adds_the_subscription_to_every_row(tmp_path):
+    shards = []
+    for sub, names in (('sub0', ['a', 'b']), ('sub1', ['c'])):
+        shard = tmp_path / SHARDS_DIR / sub
+        write_fetched(shard, [{'name': f'rg-{sub}'}], [
+            {'name': name, 'type': 't', 'resourceGroup': f'rg-{sub}', 'location': 'l'} for name in names])
+        render_inventory(str(shard), {'id': sub})
+        shards.append(({'id': sub, 'name': sub.upper()}, 1, len(names)))
+
+    merge_shards(str(tmp_path), shards, {'sub2': 'denied'})
+
+    assert [r['name'] for r in json.loads((tmp_path / RESOURCES_FILE).read_text())] == ['a', 'b', 'c']
+    assert [g['name'] for g in json.loads((tmp_path / GROUPS_FILE).read_text())] == ['rg-sub0', 'rg-sub1']
+    assert (tmp_path / HEADERED_CSV_FILE).read_text().splitlines() == [
+        'Name\tType\tResourceGroup\tLocation\tSubscriptionId',
+        'a\tt\trg-sub0\tl\tsub0', 'b\tt\trg-sub0\tl\tsub0', 'c\tt\trg-sub1\tl\tsub1']
+    report = (tmp_path / TEXT_FILE).read_text()
+    assert 'All Subscriptions: 2 inventoried, 1 failed' in report
+    assert 'sub2: denied' in report
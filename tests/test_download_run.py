@@ -0,0 +1,79 @@
+"""Tests for /download-run/<run_id>.zip and app/run_archive.py."""
+import io
+import os
+import zipfile
+
+import pytest
+
+from ariapp.artifact_store import ArtifactStore
+from ariapp.run_manifest import build_manifest, write_manifest
+
+RUN_ID = '20260105_093000'
+FILES = {
+    'AzureResourceInventory_Report.xlsx': b'PK\x03\x04 workbook bytes',
+    'Diagram.xml': b'<mxfile>' + b'<cell/>' * 1000 + b'</mxfile>',
+    'ReportCache/Compute.json': b'{"Compute": []}',
+}
+
+
+@pytest.fixture
+def run(web):
+    output_dir = web.get_output_dir()
+    for name, content in FILES.items():
+        path = os.path.join(output_dir, RUN_ID, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+    web.run_index.invalidate()
+    yield output_dir
+    import shutil
+    shutil.rmtree(os.path.join(output_dir, RUN_ID), ignore_errors=True)
+    web.run_index.invalidate()
+
+
+def download(web, run_id):
+    return web.app.test_client().get(f'/download-run/{run_id}.zip')
+
+
+def read_zip(response):
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert archive.testzip() is None
+        return {info.filename: archive.read(info) for info in archive.infolist()}, {
+            info.filename: info.compress_type for info in archive.infolist()}
+
+
+def test_zip_holds_every_file_of_the_run(web, run):
+    response = download(web, RUN_ID)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    assert f'ari-{RUN_ID}.zip' in response.headers['Content-Disposition']
+    contents, compression = read_zip(response)
+    assert contents == FILES
+    assert compression['AzureResourceInventory_Report.xlsx'] == zipfile.ZIP_STORED
+    assert compression['Diagram.xml'] == zipfile.ZIP_DEFLATED
+
+
+def test_zip_reads_blobs_of_the_artifact_store(web, run, monkeypatch, tmp_path):
+    store = ArtifactStore(str(tmp_path / '.artifacts'))
+    monkeypatch.setattr(web, 'artifact_store', store)
+    manifest = store.mark_manifest(build_manifest(run, RUN_ID))
+    write_manifest(run, RUN_ID, manifest)
+    store.ingest_run(run, manifest)
+    web.run_index.invalidate()
+    assert not os.path.exists(os.path.join(run, RUN_ID, 'Diagram.xml'))
+
+    contents, _ = read_zip(download(web, RUN_ID))
+
+    assert contents == FILES
+
+
+@pytest.mark.parametrize('run_id', ['..', '.', 'not-a-run', '20260105_0930', '20990101_000000'])
+def test_invalid_or_missing_run_ids_are_rejected(web, run, run_id):
+    assert download(web, run_id).status_code == 404
+
+
+def test_traversal_outside_the_output_directory_is_rejected(web, run):
+    client = web.app.test_client()
+    assert client.get(f'/download-run/{RUN_ID}/../{RUN_ID}.zip').status_code == 404
+    assert client.get('/download-run/%2E%2E.zip').status_code == 404
@@ -0,0 +1,211 @@
+"""Tests for app/fileshare_cleanup.py against an in-process Azure Files stand-in."""
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+import pytest
+
+import fileshare_cleanup
+from fileshare_cleanup import CleanupEngine, FileShareClient
+
+ACCOUNT = 'devstoreaccount1'
+KEY = base64.b64encode(b'test-key').decode()
+SHARE = 'ari-data'
+OLD = time.time() - 7 * 86400
+
+
+class FakeFileShare:
+    """Azure Files REST stand-in: one share, Shared Key checked on every request
+
+    Directory listings return at most ``page_size`` entries per page and
+    continue with NextMarker, like the service does for large directories.
+    """
+
+    def __init__(self, page_size=2):
+        self.page_size = page_size
+        self.entries = {}  # share-relative path -> ('file' | 'dir', last write epoch)
+        self.requests = []
+        self.bad_signatures = 0
+        self.throttle_next = 0
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake.handle(self)
+
+            do_DELETE = do_PUT = do_GET
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.endpoint = f"http://127.0.0.1:{self.server.server_port}/{ACCOUNT}"
+
+    def add(self, path, kind='file', last_write=OLD):
+        parts = path.split('/')
+        for depth in range(1, len(parts)):
+            self.entries.setdefault('/'.join(parts[:depth]), ('dir', OLD))
+        self.entries[path] = (kind, last_write)
+
+    def expected_signature(self, handler, raw_path, query):
+        headers = {name.lower(): value for name, value in handler.headers.items()}
+        content_length = headers.get('content-length', '')
+        string_to_sign = '\n'.join([
+            handler.command, '', '', '' if content_length == '0' else content_length, '',
+            headers.get('content-type', ''), '', '', '', '', '', headers.get('range', '')
+        ]) + '\n'
+        string_to_sign += ''.join(f"{name}:{headers[name]}\n" for name in sorted(headers) if name.startswith('x-ms-'))
+        string_to_sign += f"/{ACCOUNT}{raw_path}" + ''.join(f"\n{name}:{query[name]}" for name in sorted(query))
+        digest = hmac.new(base64.b64decode(KEY), string_to_sign.encode(), hashlib.sha256).digest()
+        return f"SharedKey {ACCOUNT}:{base64.b64encode(digest).decode()}"
+
+    def reply(self, handler, status, body=b'', headers=None):
+        handler.send_response(status)
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def handle(self, handler):
+        parts = urlsplit(handler.path)
+        query = dict(parse_qsl(parts.query))
+        with self.lock:
+            self.requests.append((handler.command, unquote(parts.path), query))
+            if handler.headers.get('Authorization') != self.expected_signature(handler, parts.path, query):
+                self.bad_signatures += 1
+                return self.reply(handler, 403, headers={'x-ms-error-code': 'AuthenticationFailed'})
+            if self.throttle_next:
+                self.throttle_next -= 1
+                return self.reply(handler, 503, headers={'x-ms-error-code': 'ServerBusy', 'Retry-After': '0'})
+            prefix = f"/{ACCOUNT}/{SHARE}"
+            path = unquote(parts.path)[len(prefix):].strip('/')
+            if handler.command == 'GET' and query.get('restype') == 'share':
+                return self.reply(handler, 200)
+            if handler.command == 'GET' and query.get('comp') == 'list':
+                return self.list(handler, path, query)
+            if handler.command == 'DELETE':
+                if path not in self.entries:
+                    return self.reply(handler, 404, headers={'x-ms-error-code': 'ResourceNotFound'})
+                if any(other.startswith(path + '/') for other in self.entries):
+                    return self.reply(handler, 409, headers={'x-ms-error-code': 'DirectoryNotEmpty'})
+                del self.entries[path]
+                return self.reply(handler, 202)
+            if handler.command == 'PUT':
+                if path in self.entries:
+                    return self.reply(handler, 409, headers={'x-ms-error-code': 'ResourceAlreadyExists'})
+                self.entries[path] = ('dir', time.time())
+                return self.reply(handler, 201)
+            return self.reply(handler, 400)
+
+    def list(self, handler, path, query):
+        children = sorted(
+            (name, kind, last_write) for name, (kind, last_write) in self.entries.items()
+            if (name.rsplit('/', 1)[0] if '/' in name else '') == path
+        )
+        start = int(query.get('marker', 0))
+        page = children[start:start + self.page_size]
+        xml = ['<?xml version="1.0" encoding="utf-8"?><EnumerationResults><Entries>']
+        for name, kind, last_write in page:
+            tag = 'File' if kind == 'file' else 'Directory'
+            stamp = datetime.fromtimestamp(last_write, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.1234567Z')
+            xml.append(f"<{tag}><Name>{escape(name.rsplit('/', 1)[-1])}</Name>"
+                       f"<Properties><LastWriteTime>{stamp}</LastWriteTime></Properties></{tag}>")
+        xml.append('</Entries>')
+        if start + self.page_size < len(children):
+            xml.append(f"<NextMarker>{start + self.page_size}</NextMarker>")
+        xml.append('</EnumerationResults>')
+        self.reply(handler, 200, ''.join(xml).encode(), {'Content-Type': 'application/xml'})
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def share():
+    fake = FakeFileShare()
+    yield fake
+    fake.close()
+
+
+def make_client(share):
+    return FileShareClient(ACCOUNT, KEY, SHARE, endpoint=share.endpoint, retry_delay=0)
+
+
+def test_sign_builds_shared_key_header():
+    client = FileShareClient(ACCOUNT, KEY, SHARE)
+    headers = {'x-ms-date': 'Mon, 01 Jan 2024 00:00:00 GMT', 'x-ms-version': '2021-06-08', 'content-length': '0'}
+    string_to_sign = (
+        "GET\n\n\n\n\n\n\n\n\n\n\n\n"
+        "x-ms-date:Mon, 01 Jan 2024 00:00:00 GMT\nx-ms-version:2021-06-08\n"
+        f"/{ACCOUNT}/{SHARE}/dir\ncomp:list\nrestype:directory"
+    )
+    digest = hmac.new(b'test-key', string_to_sign.encode(), hashlib.sha256).digest()
+    assert client.sign('GET', f"/{SHARE}/dir", {'restype': 'directory', 'comp': 'list'}, headers) == \
+        f"SharedKey {ACCOUNT}:{base64.b64encode(digest).decode()}"
+
+
+def test_list_directory_follows_continuation_markers(share):
+    for number in range(5):
+        share.add(f"big/file{number}.json")
+    share.add('big/sub', 'dir')
+
+    files, directories = make_client(share).list_directory('big')
+
+    assert sorted(name for name, _ in files) == [f"file{number}.json" for number in range(5)]
+    assert [name for name, _ in directories] == ['sub']
+    list_requests = [query for method, _, query in share.requests if query.get('comp') == 'list']
+    assert [query.get('marker') for query in list_requests] == [None, '2', '4']
+    assert share.bad_signatures == 0
+
+
+def test_cleanup_deletes_everything_but_protected_kept_and_recent(share, monkeypatch):
+    monkeypatch.setenv('ARI_ARTIFACT_DIR', '/data/blobs')
+    share.add('AzureResourceInventory/20240101_000000/report.xlsx')
+    share.add('AzureResourceInventory/20240101_000000/ReportCache/compute.json')
+    share.add('AzureResourceInventory/20240301_000000/started.txt')
+    share.add('AzureResourceInventory/20240302_000000/report.xlsx', last_write=time.time())
+    share.add('AzureResourceInventory/.jobs/jobs.db')
+    share.add('.artifacts/ab/abcdef')
+    share.add('.artifacts/refcounts.json')
+    share.add('blobs/cd/cdef01')
+    share.add('old/deep/nested/file.txt')
+    share.add('old/run.lock')
+    share.add('stray.csv')
+    share.throttle_next = 1
+
+    client = make_client(share)
+    engine = CleanupEngine(client, keep=['AzureResourceInventory/20240301_000000'],
+                           max_workers=4, keep_newer_than=time.time() - 60)
+    assert engine.run()
+
+    assert sorted(share.entries) == [
+        '.artifacts', '.artifacts/ab', '.artifacts/ab/abcdef', '.artifacts/refcounts.json',
+        'AzureResourceInventory', 'AzureResourceInventory/.jobs', 'AzureResourceInventory/.jobs/jobs.db',
+        'AzureResourceInventory/20240301_000000', 'AzureResourceInventory/20240301_000000/started.txt',
+        'AzureResourceInventory/20240302_000000', 'AzureResourceInventory/20240302_000000/report.xlsx',
+        'blobs', 'blobs/cd', 'blobs/cd/cdef01',
+        'old', 'old/run.lock',
+    ]
+    assert engine.stats['failed'] == 0
+    assert share.bad_signatures == 0
+    assert client.transient_errors == 1
+
+
+def test_cleanup_recreates_expected_directories(share):
+    share.add('stray.csv')
+
+    assert CleanupEngine(make_client(share), max_workers=2).run()
+
+    assert sorted(share.entries) == list(fileshare_cleanup.DIRECTORIES_TO_RECREATE)
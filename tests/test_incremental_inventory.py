@@ -0,0 +1,62 @@
+"""Tests for the change window of app/incremental_inventory.py."""
+import asyncio
+from datetime import datetime, timezone
+
+from incremental_inventory import latest_changes, load_snapshot, refresh, save_snapshot
+
+SUB = 'sub0'
+
+
+def resource(name, **fields):
+    return dict({'id': f'/subscriptions/{SUB}/resourceGroups/rg/providers/x/y/{name}', 'name': name}, **fields)
+
+
+class RecordingExtractor:
+    """Answers change queries with ``changes`` and lookups from ``current``"""
+
+    def __init__(self, changes, current):
+        self.changes = changes
+        self.current = current
+        self.queries = []
+
+    async def collect(self, query, subscriptions):
+        self.queries.append(query)
+        if query.startswith('resourcechanges'):
+            return self.changes
+        return [row for row in self.current if f"'{row['id']}'".lower() in query.lower()]
+
+
+def test_latest_changes_keeps_one_change_per_resource():
+    changes = [
+        {'targetResourceId': '/A', 'changeType': 'Create', 'changeTime': '2026-01-01T10:00:00Z'},
+        {'targetResourceId': '/a', 'changeType': 'Delete', 'changeTime': '2026-01-01T11:00:00Z'},
+        {'targetResourceId': '/b', 'changeType': 'Update', 'changeTime': '2026-01-01T09:00:00Z'},
+    ]
+    assert sorted((c['targetResourceId'], c['changeType']) for c in latest_changes(changes)) == [
+        ('/a', 'Delete'), ('/b', 'Update')]
+
+
+def test_refresh_reads_an_overlapping_window_and_dedupes(tmp_path):
+    old, gone = resource('old'), resource('gone')
+    save_snapshot(str(tmp_path), {'taken_at': '2026-01-02T12:00:00Z', 'baseline_at': '2026-01-01T00:00:00Z',
+                                  'subscriptions': [SUB], 'resources': 2},
+                  {old['id'].lower(): old, gone['id'].lower(): gone})
+    new = resource('new')
+    updated = resource('old', tags={'v': '2'})
+    extractor = RecordingExtractor([
+        {'targetResourceId': new['id'], 'changeType': 'Create', 'changeTime': '2026-01-02T11:50:00Z'},
+        {'targetResourceId': new['id'].upper(), 'changeType': 'Update', 'changeTime': '2026-01-02T12:10:00Z'},
+        {'targetResourceId': old['id'], 'changeType': 'Update', 'changeTime': '2026-01-02T12:05:00Z'},
+        {'targetResourceId': gone['id'], 'changeType': 'Delete', 'changeTime': '2026-01-02T11:45:00Z'},
+    ], [new, updated])
+
+    summary = asyncio.run(refresh(extractor, str(tmp_path), [SUB], overlap_minutes=30,
+                                  now=datetime(2026, 1, 2, 13, 0, tzinfo=timezone.utc)))
+
+    assert 'datetime(2026-01-02T11:30:00Z)' in extractor.queries[0]
+    assert summary['since'] == '2026-01-02T11:30:00Z'
+    assert (summary['changes'], summary['added'], summary['updated'], summary['deleted']) == (3, 1, 1, 1)
+    meta, resources = load_snapshot(str(tmp_path))
+    assert sorted(resources) == sorted([new['id'].lower(), old['id'].lower()])
+    assert resources[old['id'].lower()]['tags'] == {'v': '2'}
+    assert meta['taken_at'] == '2026-01-02T13:00:00Z'
@@ -0,0 +1,55 @@
+"""Tests for the eviction rules of app/job_cache.py."""
+from datetime import datetime
+
+from ariapp.job_cache import JobCache
+from ariapp.job_output import JobOutput
+from ariapp.job_store import build_metadata
+
+
+def persisted_job(status='completed', output='x' * 10):
+    job = {'status': status, 'created_at': datetime(2026, 1, 1), 'output': JobOutput(output)}
+    job['persisted_output_size'] = len(job['output'])
+    job['persisted_metadata'] = build_metadata(job)
+    return job
+
+
+def test_least_recently_used_jobs_are_evicted_beyond_max_jobs():
+    evicted = []
+    cache = JobCache(max_jobs=2, max_output_bytes=10**6, on_evict=evicted.append)
+    cache['a'] = persisted_job()
+    cache['b'] = persisted_job()
+    cache.get('a')
+    cache['c'] = persisted_job()
+
+    assert cache.keys() == ['a', 'c']
+    assert evicted == ['b']
+
+
+def test_output_budget_evicts_until_within_bytes():
+    cache = JobCache(max_jobs=10, max_output_bytes=25)
+    for job_id in 'abc':
+        cache[job_id] = persisted_job()
+    assert cache.keys() == ['b', 'c']
+    assert cache.output_bytes() == 20
+
+
+def test_running_and_unsaved_jobs_are_never_evicted():
+    cache = JobCache(max_jobs=1, max_output_bytes=10**6, pinned_statuses=('running',))
+    cache['running'] = persisted_job(status='running')
+    unsaved = persisted_job()
+    unsaved['output'].append('not flushed yet')
+    cache['unsaved'] = unsaved
+    cache['newest'] = persisted_job()
+
+    assert cache.keys() == ['running', 'unsaved', 'newest']
+
+
+def test_evicted_jobs_are_reloaded_through_the_loader():
+    store = {'a': persisted_job(output='from the store')}
+    cache = JobCache(max_jobs=1, max_output_bytes=10**6, loader=store.get)
+    cache['b'] = persisted_job()
+
+    assert str(cache['a']['output']) == 'from the store'
+    assert cache.keys() == ['a']
+    assert cache.get('missing') is None
+    assert 'a' in cache and 'b' not in cache
@@ -0,0 +1,61 @@
+"""Tests for app/job_output.py."""
+import pytest
+
+from ariapp.job_output import JobOutput
+
+
+def chunked(*parts):
+    output = JobOutput()
+    for part in parts:
+        output.append_bytes(part if isinstance(part, bytes) else part.encode('utf-8'))
+    return output
+
+
+def test_offset_reads_touch_only_the_requested_range():
+    output = chunked('line 1<br>', 'line 2<br>', 'line 3<br>')
+
+    assert len(output) == 30
+    assert output.read() == str(output) == 'line 1<br>line 2<br>line 3<br>'
+    assert output.read(10) == 'line 2<br>line 3<br>'
+    assert output.read(15, 25) == '2<br>line '
+    assert output.read(5, 5) == '' and output.read(40) == ''
+    assert output.read(-5, 4) == 'line'
+    assert output.read(25, 1000) == '3<br>'
+    assert output.read_bytes(8, 12) == b'r>li'
+    assert output.tail(9) == 'ine 3<br>'
+    assert output.tail(100) == output.read()
+
+
+def test_lines_and_characters_split_across_chunks():
+    café = 'café ✓\n'.encode('utf-8')
+    output = chunked(b'first li', b'ne\n' + café[:4], café[4:6], café[6:])
+
+    assert output.read() == 'first line\ncafé ✓\n'
+    assert output.read(11).splitlines() == ['café ✓']
+    # An offset inside a multi-byte character drops the partial character
+    assert output.read(15) == ' ✓\n'
+    assert output.read(14) == 'é ✓\n'
+
+
+def test_append_and_iadd_never_copy_earlier_chunks():
+    output = JobOutput('a')
+    first = output.chunks[0]
+    output += 'b'
+    output.append('')
+    assert output.chunks[0] is first
+    assert len(output.chunks) == 2
+    assert JobOutput.from_bytes(b'xyz').read(1) == 'yz'
+
+
+@pytest.mark.parametrize('needle, found', [
+    ('line 2', True),
+    ('1<br>line', True),  # spans the first boundary
+    ('<br>line 2<br>l', True),  # spans two boundaries
+    ('é ✓', True),
+    ('line 4', False),
+    ('', True),
+])
+def test_contains_finds_matches_across_chunk_boundaries(needle, found):
+    output = chunked('line 1<br>', 'line 2<br>', 'l', 'ine 3<br>', 'caf', 'é ✓')
+    assert (needle in output) is found
+    assert (needle in output.read()) is found
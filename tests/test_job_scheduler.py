@@ -0,0 +1,39 @@
+"""Tests for the memory admission check of app/job_scheduler.py."""
+import threading
+
+from ariapp.job_scheduler import JobScheduler
+
+
+def run_jobs(scheduler, count):
+    done = threading.Event()
+    started = []
+
+    def job(number):
+        started.append(number)
+        if len(started) == count:
+            done.set()
+
+    for number in range(count):
+        scheduler.submit(f"job{number}", job, number)
+    assert done.wait(5)
+    return started
+
+
+def test_first_job_is_checked_and_starts_with_a_warning_when_memory_is_low(capsys):
+    probes = []
+
+    def probe():
+        probes.append(1)
+        return 512
+
+    scheduler = JobScheduler(1, 2048, admission_poll_seconds=0.01, memory_probe=probe)
+    assert run_jobs(scheduler, 2) == [0, 1]
+    assert len(probes) >= 2
+    assert capsys.readouterr().out.count("WARNING: starting job") == 2
+
+
+def test_no_warning_when_memory_is_sufficient_or_the_check_is_off(capsys):
+    run_jobs(JobScheduler(1, 2048, memory_probe=lambda: 4096), 2)
+    run_jobs(JobScheduler(1, 0, memory_probe=lambda: 1), 1)
+    run_jobs(JobScheduler(1, 2048, memory_probe=lambda: None), 1)
+    assert "WARNING" not in capsys.readouterr().out
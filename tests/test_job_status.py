@@ -0,0 +1,51 @@
+"""Tests for the offset cursor of /job-status."""
+from datetime import datetime
+
+import pytest
+
+from ariapp.job_output import JobOutput
+
+
+@pytest.fixture
+def running_job(web):
+    web.jobs['status-job'] = {'status': 'running', 'output': JobOutput('hello '), 'created_at': datetime(2026, 1, 1)}
+    yield 'status-job'
+    web.jobs.pop('status-job')
+
+
+def test_offset_returns_only_new_output(web, running_job):
+    client = web.app.test_client()
+
+    first = client.get(f'/job-status/{running_job}').get_json()
+    assert (first['output'], first['offset'], first['reset']) == ('hello ', 6, True)
+    assert first['status'] == 'running'
+
+    web.append_job_output(running_job, 'world')
+    second = client.get(f"/job-status/{running_job}?offset={first['offset']}").get_json()
+    assert (second['output'], second['offset'], second['reset']) == ('world', 11, False)
+
+    idle = client.get(f"/job-status/{running_job}?offset={second['offset']}").get_json()
+    assert (idle['output'], idle['offset'], idle['reset']) == ('', 11, False)
+
+
+@pytest.mark.parametrize('offset', ['99', '-1', 'not-a-number'])
+def test_offset_past_the_end_or_invalid_resends_everything(web, running_job, offset):
+    response = web.app.test_client().get(f'/job-status/{running_job}?offset={offset}').get_json()
+    assert (response['output'], response['offset'], response['reset']) == ('hello ', 6, True)
+
+
+def test_stale_offset_after_a_restart_resets(web, running_job):
+    # A browser that kept polling across a restart holds an offset into output
+    # that is longer than what the reloaded job has
+    client = web.app.test_client()
+    web.append_job_output(running_job, 'x' * 100)
+    offset = client.get(f'/job-status/{running_job}').get_json()['offset']
+    web.jobs[running_job]['output'] = JobOutput('reloaded')
+
+    response = client.get(f'/job-status/{running_job}?offset={offset}').get_json()
+    assert (response['output'], response['offset'], response['reset']) == ('reloaded', 8, True)
+
+
+def test_unknown_job_is_reported_not_found(web):
+    response = web.app.test_client().get('/job-status/missing-job?offset=5').get_json()
+    assert response['status'] == 'not_found' and response['reset'] is True
@@ -0,0 +1,82 @@
+"""Tests for app/job_store.py."""
+import json
+import os
+from datetime import datetime, timedelta
+
+from ariapp.job_output import JobOutput
+from ariapp.job_store import (MIGRATION_MARKER, FileJobStore, SQLiteJobStore, get_job_store,
+                              migrate_file_jobs)
+
+NOW = datetime(2026, 1, 10, 12, 0)
+
+
+def new_job(status='completed', hours_old=0, output='line 1<br>'):
+    return {'status': status, 'created_at': NOW - timedelta(hours=hours_old), 'output': output,
+            'cleanup_status': 'pending', 'cleanup_error': ''}
+
+
+def test_sqlite_round_trip_appends_only_new_output(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    job = new_job(status='running')
+    store.save('job1', job)
+    job['output'] += 'line 2<br>'
+    job['status'] = 'completed'
+    store.save('job1', job)
+    store.save('job1', job)  # nothing new: no extra chunk
+
+    loaded = SQLiteJobStore(str(tmp_path / 'jobs.db')).load('job1')
+
+    assert str(loaded['output']) == 'line 1<br>line 2<br>'
+    assert isinstance(loaded['output'], JobOutput)
+    assert loaded['status'] == 'completed'
+    assert loaded['created_at'] == NOW
+    assert loaded['persisted_output_size'] == len(loaded['output'])
+    assert store.conn.execute("SELECT COUNT(*) FROM job_output").fetchone()[0] == 2
+    assert store.load('missing') is None
+
+
+def test_sqlite_listing_order_and_filters(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    store.save_many([('b', new_job(hours_old=2)), ('a', new_job(hours_old=1)),
+                     ('c', new_job(status='failed', hours_old=3))])
+
+    assert store.list_ids() == ['a', 'b', 'c']
+    assert [s['id'] for s in store.find()] == ['a', 'b', 'c']
+    assert [s['id'] for s in store.find(status='completed')] == ['a', 'b']
+    assert [s['id'] for s in store.find(created_before=NOW - timedelta(hours=1.5))] == ['b', 'c']
+    assert [s['id'] for s in store.find(limit=1)] == ['a']
+    assert store.find()[0]['output_size'] == len('line 1<br>')
+
+    store.delete('b')
+    assert store.list_ids() == ['a', 'c']
+
+
+def test_legacy_files_are_migrated_once(tmp_path):
+    jobs_dir = tmp_path / '.jobs'
+    FileJobStore(str(jobs_dir)).save('new-format', new_job(output='kept'))
+    with open(jobs_dir / 'legacy.json', 'w') as f:
+        json.dump({'status': 'completed', 'created_at': NOW.isoformat(), 'output': 'legacy output'}, f)
+
+    store = get_job_store(str(jobs_dir))
+
+    assert store.db_path == str(jobs_dir / 'jobs.db')
+    assert sorted(store.list_ids()) == ['legacy', 'new-format']
+    assert str(store.load('legacy')['output']) == 'legacy output'
+    assert str(store.load('new-format')['output']) == 'kept'
+    assert json.loads((jobs_dir / MIGRATION_MARKER).read_text())['jobs'] == 2
+
+    # A re-run copies nothing that is already in the target
+    assert migrate_file_jobs(FileJobStore(str(jobs_dir)), store) == 0
+
+
+def test_marker_on_the_share_skips_migration_into_a_new_database(tmp_path, monkeypatch):
+    jobs_dir = tmp_path / '.jobs'
+    FileJobStore(str(jobs_dir)).save('old', new_job())
+    get_job_store(str(jobs_dir))
+
+    # e.g. a database on local disk that started empty after a restart
+    monkeypatch.setenv('ARI_JOB_DB', str(tmp_path / 'local' / 'jobs.db'))
+    store = get_job_store(str(jobs_dir))
+
+    assert store.list_ids() == []
+    assert os.path.exists(tmp_path / 'local' / 'jobs.db')
@@ -0,0 +1,73 @@
+"""Tests for resuming /job-stream with Last-Event-ID."""
+import json
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from ariapp.job_output import JobOutput
+
+
+def parse_events(body):
+    events = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((fields['event'], int(fields['id']), json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def job(web):
+    output = JobOutput()
+    output.append('first line<br>')
+    output.append('second line<br>')
+    web.jobs['stream-job'] = {'status': 'completed', 'output': output, 'created_at': datetime(2026, 1, 1)}
+    yield 'stream-job'
+    web.jobs.pop('stream-job')
+
+
+def test_reconnect_with_last_event_id_skips_delivered_output(web, job):
+    client = web.app.test_client()
+    delivered = len('first line<br>')
+
+    events = parse_events(client.get(f'/job-stream/{job}', headers={'Last-Event-ID': str(delivered)}).get_data(as_text=True))
+
+    assert events[0] == ('output', delivered + len('second line<br>'), 'second line<br>')
+    assert events[-1][0] == 'status' and events[-1][2]['status'] == 'completed'
+    assert not any('first line' in json.dumps(data) for _, _, data in events)
+
+
+def test_stale_last_event_id_resends_everything_once(web, job):
+    events = parse_events(web.app.test_client().get(f'/job-stream/{job}', headers={'Last-Event-ID': '9999'})
+                          .get_data(as_text=True))
+    assert len(events) == 1
+    event, event_id, data = events[0]
+    assert event == 'status' and data['reset'] is True
+    assert data['output'] == 'first line<br>second line<br>' and event_id == len(data['output'])
+
+
+def test_live_stream_ends_when_the_job_reaches_a_terminal_state(web, job, monkeypatch):
+    monkeypatch.setattr(web, 'JOB_STREAM_HEARTBEAT_SECONDS', 0.05)
+    web.jobs[job]['status'] = 'running'
+    start = len(web.jobs[job]['output'])
+    response = web.app.test_client().get(f'/job-stream/{job}', headers={'Last-Event-ID': str(start)}, buffered=False)
+
+    def finish():
+        time.sleep(0.2)
+        web.append_job_output(job, 'third line<br>')
+        time.sleep(0.1)
+        web.set_job_status(job, 'completed')
+
+    worker = threading.Thread(target=finish)
+    worker.start()
+    started = time.monotonic()
+    body = b''.join(response.response).decode()
+    worker.join()
+
+    events = parse_events(body)
+    outputs = [data for event, _, data in events if event == 'output']
+    assert outputs == ['third line<br>']
+    assert events[-1][0] == 'status' and events[-1][2]['status'] == 'completed'
+    assert {data['status'] for event, _, data in events if event == 'status'} <= {'running', 'completed'}
+    assert time.monotonic() - started < 5
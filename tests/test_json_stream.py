@@ -0,0 +1,100 @@
+"""Tests for app/json_stream.py."""
+import json
+
+import pytest
+
+import json_stream
+from json_stream import NdjsonFile, convert_to_ndjson, index_path, iter_json
+
+ITEMS = [
+    {'id': '/a', 'value': -2.5e3, 'tags': {'k': 'v'}},
+    {'id': '/b', 'text': 'brackets ] } and "quotes", commas,', 'list': [1, [2, 3], {}]},
+    12345678901234567890,
+    'plain string',
+    None,
+    {'id': '/c', 'unicode': 'café ✓'},
+]
+
+
+def write(tmp_path, text, name='data.json'):
+    path = tmp_path / name
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 64, 1 << 16])
+def test_array_items_across_chunk_boundaries(tmp_path, chunk_size):
+    text = '\ufeff[\n  ' + ' ,\n\t '.join(json.dumps(item, ensure_ascii=False) for item in ITEMS) + '  \r\n]\n'
+    assert list(iter_json(write(tmp_path, text), chunk_size=chunk_size)) == ITEMS
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 1 << 16])
+def test_report_cache_objects_stream_key_element_pairs(tmp_path, chunk_size):
+    text = json.dumps({'Compute': [{'n': 1}, {'n': 2}], 'Empty': [], 'Meta': {'v': 2.0}, 'Network': [3]}, indent=2)
+    assert list(iter_json(write(tmp_path, text), chunk_size=chunk_size)) == [
+        ('Compute', {'n': 1}), ('Compute', {'n': 2}), ('Meta', {'v': 2.0}), ('Network', 3)]
+
+
+def test_empty_documents(tmp_path):
+    assert list(iter_json(write(tmp_path, ' [ ] '))) == []
+    assert list(iter_json(write(tmp_path, '{}'))) == []
+    assert list(iter_json(write(tmp_path, ''))) == []
+    assert list(iter_json(write(tmp_path, '42'))) == [42]
+
+
+@pytest.mark.parametrize('text', [
+    '[{"id": "/a"}, {"id": "/b"',  # truncated inside an item
+    '[{"id": "/a"},',  # truncated between items
+    '[1 2]',  # missing comma
+    '[1,,2]',
+    '{"a" [1]}',  # missing colon
+    '[1] [2]',  # data after the document
+])
+def test_truncated_or_invalid_input_raises(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(iter_json(write(tmp_path, text), chunk_size=4))
+
+
+def test_convert_to_ndjson_and_index_lookup(tmp_path):
+    source = write(tmp_path, json.dumps(ITEMS))
+    destination, count = convert_to_ndjson(source)
+
+    assert destination == str(tmp_path / 'data.ndjson') and count == len(ITEMS)
+    ndjson = NdjsonFile(destination)
+    assert len(ndjson) == len(ITEMS)
+    assert [ndjson[i] for i in range(len(ITEMS))] == ITEMS
+    assert ndjson[-1] == ITEMS[-1]
+    with pytest.raises(IndexError):
+        ndjson[len(ITEMS)]
+    assert list(ndjson) == ITEMS
+
+    ndjson.append({'id': '/d'})
+    assert len(NdjsonFile(destination)) == len(ITEMS) + 1
+    assert NdjsonFile(destination)[-1] == {'id': '/d'}
+
+
+def test_report_cache_conversion_wraps_pairs(tmp_path):
+    source = write(tmp_path, json.dumps({'Compute': [{'n': 1}]}), 'cache.json')
+    destination, _ = convert_to_ndjson(source, str(tmp_path / 'out.ndjson'))
+    assert NdjsonFile(destination)[0] == {'key': 'Compute', 'value': {'n': 1}}
+
+
+def test_index_is_reused_whatever_the_mtimes_and_rebuilt_when_stale(tmp_path, monkeypatch):
+    destination, _ = convert_to_ndjson(write(tmp_path, json.dumps(ITEMS)))
+    NdjsonFile(destination).append({'id': '/d'})
+    builds = []
+    original = json_stream.build_index
+    monkeypatch.setattr(json_stream, 'build_index', lambda path: builds.append(path) or original(path))
+
+    # The data file may look newer than its index after an append, or equal on SMB
+    for index_mtime in (0, 10**9):
+        json_stream.os.utime(index_path(destination), (index_mtime, index_mtime))
+        assert len(NdjsonFile(destination)) == len(ITEMS) + 1
+    assert builds == []
+
+    # Rewritten without the index: rebuilt once
+    with open(destination, 'a', encoding='utf-8') as f:
+        f.write('{"id": "/e"}\n\n')
+    assert NdjsonFile(destination)[-1] == {'id': '/e'}
+    assert len(NdjsonFile(destination)) == len(ITEMS) + 2
+    assert builds == [destination]
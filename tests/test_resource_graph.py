@@ -0,0 +1,111 @@
+"""Tests for app/resource_graph.py against an in-process Resource Graph stand-in."""
+import asyncio
+import json
+import time
+
+import pytest
+
+from arm_client import ArmClient
+from fake_arm import FakeArm
+from resource_graph import ARG_PATH, ResourceGraphExtractor
+
+
+def rows_for(subscription, count):
+    return [{'id': f'/subscriptions/{subscription}/resourceGroups/rg/providers/x/y/r{i}',
+             'subscriptionId': subscription} for i in range(count)]
+
+
+class FakeGraph(FakeArm):
+    """Serves ``rows`` per subscription in ``$top`` pages with numeric SkipTokens"""
+
+    def __init__(self, rows, delay=0.0):
+        super().__init__({('POST', ARG_PATH): self.query})
+        self.rows = rows
+        self.delay = delay
+
+    def query(self, request):
+        time.sleep(self.delay)
+        options = request.body['options']
+        matching = [row for sub in request.body['subscriptions'] for row in self.rows.get(sub, [])]
+        start = int(options.get('$skipToken', 0))
+        page = {'data': matching[start:start + options['$top']], 'totalRecords': len(matching)}
+        if start + options['$top'] < len(matching):
+            page['$skipToken'] = str(start + options['$top'])
+        return 200, page, {}
+
+
+@pytest.fixture
+def graph():
+    fakes = []
+
+    def make(rows, delay=0.0):
+        fakes.append(FakeGraph(rows, delay))
+        return fakes[-1]
+
+    yield make
+    for fake in fakes:
+        fake.close()
+
+
+def test_extract_follows_skip_tokens_within_each_chunk(graph, tmp_path):
+    subscriptions = [f'sub{i}' for i in range(5)]
+    fake = graph({sub: rows_for(sub, 3) for sub in subscriptions})
+    extractor = ResourceGraphExtractor(ArmClient(endpoint=fake.endpoint, token='t'), page_size=2, chunk_size=2)
+
+    counts = asyncio.run(extractor.extract({'resources': 'resources'}, subscriptions, str(tmp_path)))
+
+    assert counts == {'resources': 15}
+    ids = [json.loads(line)['id'] for line in (tmp_path / 'resources.ndjson').read_text().splitlines()]
+    assert sorted(ids) == sorted(r['id'] for sub in subscriptions for r in rows_for(sub, 3))
+    # Chunks of 2, 2 and 1 subscriptions hold 6, 6 and 3 rows: 3 + 3 + 2 pages of 2
+    chunks = [tuple(r.body['subscriptions']) for r in fake.requests]
+    assert sorted(set(chunks)) == [('sub0', 'sub1'), ('sub2', 'sub3'), ('sub4',)]
+    assert extractor.pages == len(fake.requests) == 8
+    for chunk in set(chunks):
+        tokens = [r.body['options'].get('$skipToken') for r in fake.requests if tuple(r.body['subscriptions']) == chunk]
+        assert tokens == [None, '2', '4'][:len(tokens)]
+
+
+def test_collect_follows_skip_tokens_within_each_chunk(graph):
+    subscriptions = [f'sub{i}' for i in range(5)]
+    fake = graph({sub: rows_for(sub, 3) for sub in subscriptions})
+    extractor = ResourceGraphExtractor(ArmClient(endpoint=fake.endpoint, token='t'), page_size=2, chunk_size=2)
+
+    rows = asyncio.run(extractor.collect('resources', subscriptions))
+
+    assert sorted(row['id'] for row in rows) == sorted(r['id'] for sub in subscriptions for r in rows_for(sub, 3))
+    # Chunks of 2, 2 and 1 subscriptions hold 6, 6 and 3 rows: 3 + 3 + 2 pages of 2
+    chunks = [tuple(r.body['subscriptions']) for r in fake.requests]
+    assert sorted(set(chunks)) == [('sub0', 'sub1'), ('sub2', 'sub3'), ('sub4',)]
+    assert extractor.pages == len(fake.requests) == 8
+    for chunk in set(chunks):
+        tokens = [r.body['options'].get('$skipToken') for r in fake.requests if tuple(r.body['subscriptions']) == chunk]
+        assert tokens == [None, '2', '4'][:len(tokens)]
+
+
+def test_extract_writes_one_ndjson_file_per_query(graph, tmp_path):
+    fake = graph({'sub0': rows_for('sub0', 5)})
+    extractor = ResourceGraphExtractor(ArmClient(endpoint=fake.endpoint, token='t'), page_size=2)
+
+    counts = asyncio.run(extractor.extract({'a': 'resources', 'b': 'resources'}, ['sub0'], str(tmp_path)))
+
+    assert counts == {'a': 5, 'b': 5}
+    lines = (tmp_path / 'a.ndjson').read_text().splitlines()
+    assert [json.loads(line)['id'] for line in lines] == [r['id'] for r in rows_for('sub0', 5)]
+
+
+def test_concurrency_limit_holds_across_concurrent_collects(graph):
+    subscriptions = [f'sub{i}' for i in range(4)]
+    fake = graph({sub: rows_for(sub, 2) for sub in subscriptions}, delay=0.05)
+    client = ArmClient(endpoint=fake.endpoint, token='t', pool_size=8)
+    extractor = ResourceGraphExtractor(client, max_concurrency=2, page_size=1, chunk_size=1)
+
+    async def run():
+        return await asyncio.gather(*(extractor.collect('resources', subscriptions) for _ in range(3)))
+
+    results = asyncio.run(run())
+
+    assert [len(rows) for rows in results] == [8, 8, 8]
+    assert fake.max_in_flight == 2
+    # A second event loop gets its own semaphore
+    assert len(asyncio.run(extractor.collect('resources', subscriptions))) == 8
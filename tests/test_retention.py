@@ -0,0 +1,82 @@
+"""Tests for app/retention.py and job store compaction."""
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from ariapp.artifact_store import ArtifactStore
+from ariapp.job_store import SQLiteJobStore
+from ariapp.retention import RetentionEngine, select_expired_jobs, select_expired_runs
+from ariapp.run_index import RunIndex
+from ariapp.run_manifest import build_manifest, write_manifest
+
+NOW = datetime(2026, 1, 10, 12, 0)
+ACTIVE = ('queued', 'running')
+
+
+def job(job_id, status, days_old):
+    return {'id': job_id, 'status': status, 'created_at': NOW - timedelta(days=days_old)}
+
+
+def test_active_jobs_do_not_count_towards_keep_last():
+    summaries = [job('r1', 'running', 0), job('q1', 'queued', 0), job('c1', 'completed', 1),
+                 job('c2', 'failed', 2), job('c3', 'completed', 3)]
+
+    assert select_expired_jobs(summaries, ACTIVE, keep_last=2, now=NOW) == ['c3']
+    assert select_expired_jobs(summaries, ACTIVE, max_age_days=1.5, now=NOW) == ['c2', 'c3']
+
+
+def test_runs_and_jobs_have_separate_keep_counts_and_the_store_is_compacted(tmp_path):
+    output_dir = tmp_path / 'out'
+    for day in range(1, 4):
+        os.makedirs(output_dir / f"202601{day:02d}_120000")
+    store = SQLiteJobStore(str(tmp_path / 'jobs.db'))
+    for number in range(6):
+        store.save(f"job{number}", {'status': 'completed', 'created_at': NOW - timedelta(hours=number),
+                                    'output': 'x' * 200000})
+    pages_before = store.conn.execute("PRAGMA page_count").fetchone()[0]
+
+    engine = RetentionEngine(str(output_dir), RunIndex(str(output_dir)), store,
+                             keep_last_runs=2, keep_last_jobs=1, active_statuses=ACTIVE)
+    report = engine.run_once()
+
+    assert report['errors'] == []
+    assert report['runs_deleted'] == ['20260101_120000']
+    assert report['jobs_deleted'] == 5
+    assert store.list_ids() == ['job0']
+    assert engine.policy()['keep_last_runs'] == 2 and engine.policy()['keep_last_jobs'] == 1
+    assert store.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert store.conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    assert store.conn.execute("PRAGMA page_count").fetchone()[0] < pages_before / 2
+
+
+def test_each_pass_sweeps_blobs_of_runs_deleted_elsewhere(tmp_path):
+    output_dir = tmp_path / 'out'
+    os.makedirs(output_dir / '20260101_120000')
+    (output_dir / '20260101_120000' / 'report.xlsx').write_bytes(b'report')
+    store = ArtifactStore(str(output_dir / '.artifacts'))
+    manifest = store.mark_manifest(build_manifest(str(output_dir), '20260101_120000'))
+    write_manifest(str(output_dir), '20260101_120000', manifest)
+    store.ingest_run(str(output_dir), manifest)
+    shutil.rmtree(output_dir / '20260101_120000')
+
+    engine = RetentionEngine(str(output_dir), RunIndex(str(output_dir)), SQLiteJobStore(str(tmp_path / 'jobs.db')),
+                             max_age_days=30, artifact_store=store, active_statuses=ACTIVE)
+    report = engine.run_once()
+
+    assert report['bytes_reclaimed'] == len(b'report')
+    assert not os.path.exists(store.blob_path(manifest['artifacts'][0]['sha256']))
+
+
+def test_quota_counts_shared_blobs_once():
+    def run(run_id, local_bytes, blobs):
+        return {'run_id': run_id, 'total_bytes': local_bytes + sum(blobs.values()),
+                'local_bytes': local_bytes, 'blobs': blobs}
+
+    # Three runs with the same 100-byte workbook and 10 bytes of their own each
+    summaries = [run(f"2026010{day}_120000", 10, {'a' * 64: 100}) for day in (3, 2, 1)]
+    assert select_expired_runs(summaries, max_total_bytes=130, now=NOW) == []
+    assert select_expired_runs(summaries, max_total_bytes=125, now=NOW) == ['20260101_120000']
+
+    # Without blob details every run counts its logical size
+    logical = [{'run_id': s['run_id'], 'total_bytes': s['total_bytes']} for s in summaries]
+    assert select_expired_runs(logical, max_total_bytes=130, now=NOW) == ['20260102_120000', '20260101_120000']
@@ -0,0 +1,67 @@
+"""Tests for app/run_index.py."""
+import os
+
+import pytest
+
+from ariapp import run_index as run_index_module
+from ariapp.run_index import RunIndex
+
+RUNS = [f"202601{day:02d}_120000" for day in range(1, 11)]
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    for run_id in RUNS:
+        os.makedirs(tmp_path / run_id)
+        (tmp_path / run_id / 'report.xlsx').write_bytes(b'x' * 10)
+    (tmp_path / 'not-a-run').mkdir()
+    return tmp_path
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    scanned = []
+    original = RunIndex.scan
+
+    def counting_scan(self, root):
+        scanned.append(os.path.basename(root))
+        return original(self, root)
+
+    monkeypatch.setattr(RunIndex, 'scan', counting_scan)
+    return scanned
+
+
+def test_page_only_scans_the_runs_on_the_page(output_dir, scans):
+    index = RunIndex(str(output_dir))
+
+    first, cursor = index.page(limit=3)
+    assert [s['run_id'] for s in first] == RUNS[::-1][:3]
+    assert cursor == RUNS[-3]
+    assert sorted(scans) == sorted(RUNS[-3:])
+
+    second, cursor = index.page(cursor, limit=3)
+    assert [s['run_id'] for s in second] == RUNS[::-1][3:6]
+    assert second[0] == {'run_id': RUNS[-4], 'artifact_count': 1, 'total_bytes': 10}
+    assert len(scans) == 6
+
+    last, cursor = index.page(RUNS[1], limit=3)
+    assert [s['run_id'] for s in last] == [RUNS[0]] and cursor is None
+    assert index.page('20250101_000000') == ([], None)
+
+
+def test_caches_keep_only_the_most_recently_used_runs(output_dir, scans, monkeypatch):
+    index = RunIndex(str(output_dir), check_interval=3600, max_cached_runs=3)
+    for run_id in RUNS[:4]:
+        index.artifacts(run_id)
+    assert list(index.artifact_cache) == RUNS[1:4]
+
+    index.artifacts(RUNS[1])
+    index.artifacts(RUNS[4])
+    assert list(index.artifact_cache) == [RUNS[3], RUNS[1], RUNS[4]]
+    assert scans == RUNS[:5]
+
+    manifest = {'artifacts': [{'path': 'x', 'size': 1}]}
+    monkeypatch.setattr(run_index_module, 'read_manifest', lambda output_dir, run_id: manifest)
+    for run_id in RUNS[5:]:
+        index.artifacts(run_id)
+    assert list(index.manifests) == RUNS[-3:]
@@ -0,0 +1,43 @@
+"""Tests for app/snapshot_store.py."""
+import os
+
+from snapshot_store import SnapshotReader, column_file, write_snapshot
+
+
+def test_columns_that_sanitize_alike_get_separate_files(tmp_path):
+    rows = [
+        {'id': '/a', 'type': 'T', 'subscriptionId': 's1', 'properties.sku': 'dotted', 'properties_sku': 'underscored',
+         'Name': 'upper', 'name': 'lower'},
+        {'id': '/b', 'type': 'T', 'subscriptionId': 's2', 'properties.sku': 'dotted2', 'name': 'lower2'},
+    ]
+    index = write_snapshot(rows, str(tmp_path / 'snap'))
+
+    files = list(index['columns'].values())
+    assert len({name.lower() for name in files}) == len(files) == 7
+    assert column_file('properties.sku') != column_file('properties_sku')
+    assert len(os.listdir(tmp_path / 'snap' / index['types']['t']['path'])) == 7
+
+    reader = SnapshotReader(str(tmp_path / 'snap'))
+    assert list(reader.rows(['properties.sku', 'properties_sku', 'Name', 'name'])) == [
+        {'properties.sku': 'dotted', 'properties_sku': 'underscored', 'Name': 'upper', 'name': 'lower'},
+        {'properties.sku': 'dotted2', 'properties_sku': None, 'Name': None, 'name': 'lower2'},
+    ]
+    assert reader.read_columns(['name'], subscriptions=['S2']) == {'name': ['lower2']}
+
+
+def test_reader_selects_types_subscriptions_and_columns(tmp_path):
+    rows = [{'id': f'/{sub}/{kind}/{i}', 'type': kind, 'subscriptionId': sub, 'location': f'l{i}'}
+            for kind in ('Microsoft.Web/sites', 'Microsoft.Sql/servers')
+            for sub in ('s2', 's1') for i in range(3)]
+    write_snapshot(rows, str(tmp_path / 'snap'))
+
+    reader = SnapshotReader(str(tmp_path / 'snap'))
+
+    assert reader.types() == ['microsoft.sql/servers', 'microsoft.web/sites']
+    assert reader.subscriptions() == ['s1', 's2']
+    assert reader.count() == 12
+    assert reader.count(types=['Microsoft.Web/sites'], subscriptions=['s1']) == 3
+    assert reader.read_columns(['id'], types=['microsoft.web/sites'], subscriptions=['s1']) == {
+        'id': ['/s1/Microsoft.Web/sites/0', '/s1/Microsoft.Web/sites/1', '/s1/Microsoft.Web/sites/2']}
+    assert sorted(tuple(sorted(row.items())) for row in reader.rows()) == sorted(
+        tuple(sorted(row.items())) for row in rows)